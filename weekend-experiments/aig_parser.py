@@ -1,21 +1,114 @@
+import mmap
+
 from collections import defaultdict
 
 
+# Binary AIGER stores every and gate as two deltas, each one encoded
+# as a 7-bit little-endian varint, high bit set on all bytes but the last.
+def decode_delta(buf, pos):
+    x = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        x |= (byte & 0x7F) << shift
+        if byte & 0x80 == 0:
+            return x, pos
+        shift += 7
+
+
+# Yields (and_lit, left_child, right_child) straight from the buffer,
+# `pos` points to the first byte after the outputs section.
+def iter_binary_ands(buf, pos, first_var, n_ands):
+    for and_id in range(n_ands):
+        and_lit = 2 * (first_var + and_id + 1)
+        delta_0, pos = decode_delta(buf, pos)
+        delta_1, pos = decode_delta(buf, pos)
+        left_child = and_lit - delta_0
+        right_child = left_child - delta_1
+        assert 0 <= right_child <= left_child < and_lit, "Malformed binary and gate"
+        yield and_lit, left_child, right_child
+
+
+# AIGER literal 0 is constant false, literal 1 is constant true
+CONST_LIT = 0
+
+
+# Value of `left & right` if it does not need a gate, None otherwise
+def simplify_and(left, right):
+    if left == 0 or right == 0 or left == right ^ 1:
+        return 0
+    if left == 1:
+        return right
+    if right == 1 or left == right:
+        return left
+    return None
+
+
+def resolve_lit(alias, lit):
+    var = lit >> 1
+    if var in alias:
+        return alias[var] ^ (lit & 1)
+    return lit
+
+
+# Folds constants and trivial gates (x & 0, x & 1, x & x, x & !x) through
+# the and network. Returns the remaining gates with substituted children,
+# children always before parents, plus `alias`: var -> literal it equals to,
+# for every gate that was folded away. Works on unordered files too, but
+# needs every gate at hand; ordered gates are folded on the fly by
+# `Parser.add_folded_ands`.
+def propagate_constants(ands):
+    definition = {and_lit >> 1: (left, right) for and_lit, left, right in ands}
+    alias = dict()
+    done = set()
+    kept = list()
+
+    for and_lit, _, _ in ands:
+        stack = [and_lit >> 1]
+        while len(stack) > 0:
+            var = stack[-1]
+            if var in done:
+                stack.pop()
+                continue
+            left, right = definition[var]
+            pending = [
+                child >> 1
+                for child in (left, right)
+                if (child >> 1) in definition and (child >> 1) not in done
+            ]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            done.add(var)
+            left, right = resolve_lit(alias, left), resolve_lit(alias, right)
+            simplified = simplify_and(left, right)
+            if simplified is None:
+                kept.append((2 * var, left, right))
+            else:
+                alias[var] = simplified
+
+    return kept, alias
+
+
 class Parser:
     def __init__(self):
         self.input_to_lit = list()
         self.output_to_lit = list()
         self.lit_parents = defaultdict(list)
         self.lit_children = defaultdict(list)
+        self.n_folded_ands = 0
 
-    def parse_header(self, header_line):
+    def parse_header(self, header_line, magic="aag"):
         header = header_line.strip().split(" ")
         assert len(header) == 6, "Failed to parse header"
         aag, m, i, l, o, a = header
         m, i, l, o, a = list(map(int, [m, i, l, o, a]))
 
         assert l == 0, "Latches not supported"
-        assert aag == "aag", "Wrong header, `aag` expected"
+        assert aag == magic, f"Wrong header, `{magic}` expected"
         assert m == i + a, "Maximum index looks off"
         return m, i, l, o, a
 
@@ -45,16 +138,56 @@ class Parser:
             self.add_edge(child, parent)
             self.add_edge(child - 1, child)
 
-    def parse_ands(self,  and_lines):
+    def add_and(self, and_lit, left_child, right_child):
+        self.maybe_add_negation(left_child, and_lit)
+        self.maybe_add_negation(right_child, and_lit)
+
+    def read_ands(self,  and_lines):
+        ands = list()
         for and_line in and_lines:
             and_line_split = and_line.split(" ")
             assert len(and_line_split) == 3, f"Wrong and gate string: {and_line}"
-            and_lit, left_child, right_child = map(int, and_line_split)
+            ands.append(tuple(map(int, and_line_split)))
+        return ands
+
+    # Same folding as `propagate_constants` for gates that come after their
+    # children, one gate at a time: kept gates are added right away, only
+    # folded ones are remembered. Returns `alias` of the folded gates.
+    def add_folded_ands(self, ands):
+        alias = dict()
+        for and_lit, left_child, right_child in ands:
+            left_child = resolve_lit(alias, left_child)
+            right_child = resolve_lit(alias, right_child)
+            simplified = simplify_and(left_child, right_child)
+            if simplified is None:
+                self.add_and(and_lit, left_child, right_child)
+            else:
+                alias[and_lit >> 1] = simplified
+        self.n_folded_ands = len(alias)
+        return alias
 
-            self.maybe_add_negation(left_child, and_lit)
-            self.maybe_add_negation(right_child, and_lit)
+    # Outputs are only known after the gates are folded. Their inverters go
+    # first among the parents of their child, where `parse_outputs` would
+    # have put them before any gate, so the topsort does not change. The
+    # only constant node that survives is one an output is tied to.
+    def add_folded_outputs(self, output_lits, alias):
+        for output_lit in output_lits:
+            output_lit = resolve_lit(alias, output_lit)
+            if output_lit % 2 == 1:
+                child = output_lit - 1
+                if output_lit in self.lit_parents[child]:
+                    self.lit_parents[child].remove(output_lit)
+                self.lit_parents[child].insert(0, output_lit)
+                if child not in self.lit_children[output_lit]:
+                    self.lit_children[output_lit].append(child)
+            self.output_to_lit.append(output_lit)
 
     def parse(self, filename):
+        with open(filename, 'rb') as f:
+            magic = f.read(3)
+        if magic == b"aig":
+            return self.parse_binary(filename)
+
         with open(filename, 'r') as f:
             lines = f.readlines()
 
@@ -63,8 +196,34 @@ class Parser:
         input_end = input_start + i
         self.parse_inputs(lines[input_start:input_end])
         output_end = input_end + o
-        self.parse_outputs(lines[input_end:output_end])
+        output_lits = list(map(int, lines[input_end:output_end]))
         and_end = output_end + a
-        self.parse_ands(lines[output_end:and_end])
+        # ASCII gates may come in any order, and the lines are in memory
+        # anyway
+        ands, alias = propagate_constants(self.read_ands(lines[output_end:and_end]))
+        self.n_folded_ands = len(alias)
+        for and_lit, left_child, right_child in ands:
+            self.add_and(and_lit, left_child, right_child)
+        self.add_folded_outputs(output_lits, alias)
+
+        return self.lit_parents, self.lit_children, self.input_to_lit, self.output_to_lit
+
+    # Binary AIGER: inputs are implicit (2, 4, ..., 2i), outputs are still
+    # ASCII lines, and gates are delta-encoded, decoded from a memory map and
+    # folded as they come, so the and section is never held in Python
+    # objects beyond the graph itself.
+    def parse_binary(self, filename):
+        with open(filename, 'rb') as f:
+            m, i, l, o, a = self.parse_header(f.readline().decode(), magic="aig")
+            self.parse_inputs(range(2, 2 * i + 1, 2))
+            output_lits = [int(f.readline()) for _ in range(o)]
+
+            alias = dict()
+            if a > 0:
+                ands_start = f.tell()
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    ands = iter_binary_ands(buf, ands_start, i + l, a)
+                    alias = self.add_folded_ands(ands)
+            self.add_folded_outputs(output_lits, alias)
 
         return self.lit_parents, self.lit_children, self.input_to_lit, self.output_to_lit
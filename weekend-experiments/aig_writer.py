@@ -0,0 +1,169 @@
+import numpy as np
+
+import compact_graph as CG
+import cones as C
+
+# AIGER writer, ASCII (`aag`) and binary (`aig`).
+#
+# Works on the arrays of a `CompactGraph`: inputs keep their ids, and gates
+# are numbered densely in topological order (what the binary format demands),
+# inverters become the complemented literal of their child and the constant
+# node becomes literal 0. Gate rows and varints are formatted with numpy a
+# chunk at a time and written as raw bytes, no per-line strings are built.
+
+# Gates formatted per write call
+CHUNK_ROWS = 1 << 16
+
+ZERO = ord("0")
+SPACE = ord(" ")
+NEWLINE = ord("\n")
+
+
+# AIGER literal of every node, plus the ids of and gates that get written
+def node_literals(cg, node_mask=None):
+    lits = np.zeros(cg.n_nodes, dtype=np.int64)
+
+    input_ids = cg.node_ids(CG.INPUT)
+    lits[input_ids] = 2 * (cg.type_index[input_ids].astype(np.int64) + 1)
+
+    and_ids = cg.node_ids(CG.AND)
+    if node_mask is not None:
+        and_ids = and_ids[node_mask[and_ids]]
+    lits[and_ids] = 2 * (cg.n_inputs + 1 + np.arange(len(and_ids), dtype=np.int64))
+
+    # inverters over inverters only appear in hand-built graphs, one pass
+    # per level of such chains
+    not_ids = cg.node_ids(CG.NOT)
+    not_children = cg.fanin[cg.fanin_offsets[not_ids]]
+    while True:
+        not_lits = lits[not_children] ^ 1
+        if np.array_equal(lits[not_ids], not_lits):
+            break
+        lits[not_ids] = not_lits
+
+    return lits, and_ids
+
+
+# Rows of (and_lit, larger child lit, smaller child lit)
+def and_rows(cg, lits, and_ids):
+    starts = cg.fanin_offsets[and_ids]
+    left = lits[cg.fanin[starts]]
+    right = lits[cg.fanin[starts + 1]]
+    return np.stack(
+        [lits[and_ids], np.maximum(left, right), np.minimum(left, right)], axis=1
+    )
+
+
+# Space separated decimal rows, one per line
+def format_rows(rows):
+    n_rows, n_cols = rows.shape
+    width = len(str(int(rows.max()))) if rows.size > 0 else 1
+
+    n_digits = np.ones(rows.shape, dtype=np.int64)
+    for power in range(1, width):
+        n_digits += rows >= 10 ** power
+
+    # every number gets `width` digit slots, right aligned, plus a separator
+    cells = np.empty((n_rows, n_cols, width + 1), dtype=np.uint8)
+    keep = np.empty(cells.shape, dtype=bool)
+    rest = rows.copy()
+    for slot in range(width - 1, -1, -1):
+        cells[:, :, slot] = ZERO + rest % 10
+        rest //= 10
+        keep[:, :, slot] = slot >= width - n_digits
+    cells[:, :, width] = SPACE
+    cells[:, -1, width] = NEWLINE
+    keep[:, :, width] = True
+
+    return cells[keep].tobytes()
+
+
+# Binary AIGER varints: 7 bits per byte, least significant first, high bit
+# set on every byte but the last
+def encode_varints(values):
+    values = values.astype(np.uint64)
+    n_bytes = np.ones(len(values), dtype=np.int64)
+    max_bytes = 1
+    while np.any(values >> np.uint64(7 * max_bytes)):
+        n_bytes += (values >> np.uint64(7 * max_bytes)) > 0
+        max_bytes += 1
+
+    cells = np.empty((len(values), max_bytes), dtype=np.uint8)
+    keep = np.empty(cells.shape, dtype=bool)
+    for byte_id in range(max_bytes):
+        low_bits = (values >> np.uint64(7 * byte_id)) & np.uint64(0x7F)
+        more = byte_id < n_bytes - 1
+        cells[:, byte_id] = low_bits | (more.astype(np.uint64) << np.uint64(7))
+        keep[:, byte_id] = byte_id < n_bytes
+
+    return cells[keep].tobytes()
+
+
+def write_symbols(f, input_names, output_names):
+    if input_names is not None:
+        f.write(
+            "".join(f"i{k} {name}\n" for k, name in enumerate(input_names)).encode()
+        )
+    if output_names is not None:
+        f.write(
+            "".join(f"o{k} {name}\n" for k, name in enumerate(output_names)).encode()
+        )
+
+
+# Writes `g` (`Graph` or `CompactGraph`) as AIGER, binary if `binary` is set
+# or the file name ends with `.aig`. With `output_ids` only these outputs
+# and their fan-in cones are written, inputs are always kept. Symbols default
+# to the names the graphs use (`v3`, `o7`), pass `symbols=False` to skip the
+# table.
+def write_aiger(
+    g,
+    filename,
+    binary=None,
+    output_ids=None,
+    symbols=True,
+    input_names=None,
+    output_names=None,
+    comment=None,
+):
+    cg = CG.as_compact(g)
+    if binary is None:
+        binary = filename.endswith(".aig")
+    if output_ids is None:
+        output_ids = list(range(cg.n_outputs))
+        node_mask = None
+    else:
+        output_ids = list(output_ids)
+        node_mask = C.output_cone_mask(cg, output_ids)
+
+    lits, and_ids = node_literals(cg, node_mask)
+    output_lits = lits[cg.outputs[output_ids]]
+    n_ands = len(and_ids)
+
+    if symbols:
+        if input_names is None:
+            input_names = [f"v{k}" for k in range(cg.n_inputs)]
+        if output_names is None:
+            output_names = [f"o{output_id}" for output_id in output_ids]
+    else:
+        input_names = output_names = None
+
+    magic = "aig" if binary else "aag"
+    m = cg.n_inputs + n_ands
+    with open(filename, "wb") as f:
+        f.write(f"{magic} {m} {cg.n_inputs} 0 {len(output_ids)} {n_ands}\n".encode())
+        if not binary:
+            inputs = 2 * np.arange(1, cg.n_inputs + 1, dtype=np.int64)
+            f.write(format_rows(inputs.reshape(-1, 1)))
+        f.write(format_rows(output_lits.reshape(-1, 1)))
+
+        for start in range(0, n_ands, CHUNK_ROWS):
+            rows = and_rows(cg, lits, and_ids[start : start + CHUNK_ROWS])
+            if binary:
+                deltas = np.stack([rows[:, 0] - rows[:, 1], rows[:, 1] - rows[:, 2]])
+                f.write(encode_varints(deltas.T.reshape(-1)))
+            else:
+                f.write(format_rows(rows))
+
+        write_symbols(f, input_names, output_names)
+        if comment is not None:
+            f.write(f"c\n{comment}\n".encode())
@@ -0,0 +1,169 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+import compact_graph as CG
+import flat_cnf as F
+import formula_builder as FB
+import graph_cache as GC
+import hyperparameters as H
+import variable_order as VO
+
+# Tseitin encoding of one graph, numbered on its own and reusable in any
+# miter.
+#
+# A fragment's clauses use local variables: inputs are 1..n_inputs, gates
+# follow in the order of `gate_ids`. Placing a fragment into a pool only
+# rewrites literals through a lookup table: inputs are bound to the pool's
+# shared input variables, gates are shifted to a fresh block. Nothing is
+# re-encoded, so a graph that takes part in several miters (BubbleSort in
+# BvP and in SvB) is encoded once per process, and with H.CACHE_FRAGMENTS
+# once per machine: fragments are then stored next to the graph cache,
+# keyed by the graph's structure.
+#
+# Fragments only cover the full gate-by-gate encoding in a per-graph
+# variable order (`VO.PER_GRAPH_ORDERS`); polarity aware, LUT and jointly
+# numbered encodings depend on more than the graph and are built in place.
+
+# Bump when the layout of a fragment changes
+FRAGMENT_VERSION = 1
+
+FRAGMENT_ARRAYS = ["lits", "offsets", "gate_ids", "node_lits", "output_lits"]
+
+# Fragments kept in memory, most recently used last
+MEMORY_FRAGMENTS = 8
+fragments = OrderedDict()
+
+
+class Fragment:
+    def __init__(self, cnf, n_inputs, gate_ids, node_lits, output_lits):
+        self.cnf = cnf
+        self.n_inputs = n_inputs
+        # node id of every gate variable, in variable order
+        self.gate_ids = gate_ids
+        # local literal of every node and every output, negative for folded
+        # inverters
+        self.node_lits = node_lits
+        self.output_lits = output_lits
+
+    @property
+    def n_gates(self):
+        return len(self.gate_ids)
+
+    @property
+    def n_vars(self):
+        return self.n_inputs + self.n_gates
+
+    def input_range(self):
+        return 1, self.n_inputs
+
+    def gate_range(self):
+        return self.n_inputs + 1, self.n_vars
+
+    # (clauses, literal of every node) with inputs on `input_vars` and gates
+    # on `first_var`, `first_var + 1`, ...
+    def place(self, input_vars, first_var):
+        table = np.zeros(self.n_vars + 1, dtype=np.int64)
+        table[1 : self.n_inputs + 1] = input_vars
+        table[self.n_inputs + 1 :] = first_var + np.arange(self.n_gates)
+        cnf = F.FlatCNF(
+            shift_literals(self.cnf.lits, table).astype(np.int32),
+            np.array(self.cnf.offsets),
+        )
+        return cnf, shift_literals(self.node_lits, table)
+
+
+def shift_literals(lits, table):
+    lits = np.asarray(lits, dtype=np.int64)
+    return np.sign(lits) * table[np.abs(lits)]
+
+
+def encode_fragment(g, fold_inverters, order):
+    cg = CG.as_compact(g)
+    pool = FB.NodePool(fold_inverters=fold_inverters, order=order)
+    cnf = FB.make_flat_formula(cg, pool).flush()
+    _, _, _, gate_ids = pool.blocks[0]
+    node_lits = pool.graphs[cg.tag][1]
+    return Fragment(cnf, cg.n_inputs, gate_ids, node_lits, node_lits[cg.outputs])
+
+
+# Content hash of the graph structure, the tag and the name do not matter
+def structure_hash(cg):
+    h = hashlib.sha256()
+    arrays = [cg.node_type, cg.type_index, cg.fanin_offsets, cg.fanin, cg.outputs]
+    for array in arrays:
+        h.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def fragment_dir(key, cache_dir):
+    digest, fold_inverters, order = key
+    folded = "_folded" if fold_inverters else ""
+    return os.path.join(cache_dir, f"{digest}_fragment_{order}{folded}")
+
+
+def save_fragment(fragment, path):
+    arrays = {
+        "lits": fragment.cnf.lits,
+        "offsets": fragment.cnf.offsets,
+        "gate_ids": fragment.gate_ids,
+        "node_lits": fragment.node_lits,
+        "output_lits": fragment.output_lits,
+    }
+    meta = {"version": FRAGMENT_VERSION, "n_inputs": fragment.n_inputs}
+    GC.save_arrays(arrays, meta, path)
+
+
+def load_fragment(path):
+    loaded = GC.load_arrays(path, FRAGMENT_ARRAYS, FRAGMENT_VERSION)
+    if loaded is None:
+        return None
+    arrays, meta = loaded
+    cnf = F.FlatCNF(arrays["lits"], arrays["offsets"])
+    return Fragment(
+        cnf,
+        meta["n_inputs"],
+        arrays["gate_ids"],
+        arrays["node_lits"],
+        arrays["output_lits"],
+    )
+
+
+# Fragment of `g` from memory, the disk cache or a fresh encoding
+def graph_fragment(g, fold_inverters=None, order=None, cache_dir=None):
+    if fold_inverters is None:
+        fold_inverters = H.FOLD_INVERTERS
+    if order is None:
+        order = H.VARIABLE_ORDER
+    assert order in VO.PER_GRAPH_ORDERS, f"{order} numbers graphs jointly"
+
+    cg = CG.as_compact(g)
+    key = (structure_hash(cg), fold_inverters, order)
+    if key in fragments:
+        fragments.move_to_end(key)
+        return fragments[key]
+
+    if H.CACHE_FRAGMENTS or cache_dir is not None:
+        path = fragment_dir(key, GC.CACHE_DIR if cache_dir is None else cache_dir)
+        fragment = load_fragment(path)
+        if fragment is None:
+            fragment = encode_fragment(cg, fold_inverters, order)
+            save_fragment(fragment, path)
+    else:
+        fragment = encode_fragment(cg, fold_inverters, order)
+
+    fragments[key] = fragment
+    if len(fragments) > MEMORY_FRAGMENTS:
+        fragments.popitem(last=False)
+    return fragment
+
+
+# Drop-in for `FB.make_flat_formula(g, pool)` that goes through a fragment
+# whenever the pool can take one
+def make_fragment_formula(g, pool):
+    cg = CG.as_compact(g)
+    if cg.tag in pool.graphs or pool.order not in VO.PER_GRAPH_ORDERS:
+        return FB.make_flat_formula(cg, pool)
+    return pool.add_fragment(cg, graph_fragment(cg, pool.fold_inverters, pool.order))
@@ -0,0 +1,421 @@
+from collections import defaultdict
+
+import numpy as np
+
+import flat_cnf as F
+
+# In-process CNF preprocessing: unit propagation, equivalent literal
+# substitution, subsumption with self-subsuming resolution and bounded
+# variable elimination, a few rounds until nothing changes.
+#
+# Frozen variables (bucket gates, outputs, miter xors) are never
+# eliminated, so assumptions over them mean the same on the simplified
+# formula. Everything that survives is renumbered densely; `remap` sends an
+# original variable to its literal in the simplified formula, 0 if it is
+# gone. Two frozen variables found equivalent share one variable, the remap
+# of one of them is then the (maybe negated) literal of the other. The
+# reconstruction stack turns a model of the simplified formula back into a
+# model of the original one.
+
+ROUNDS = 3
+# Clauses whose rarest variable occurs more often are not used to subsume
+SUBSUMPTION_OCC_LIMIT = 1000
+# Variables occurring more often are never eliminated
+ELIMINATION_OCC_LIMIT = 16
+RESOLVENT_LENGTH_LIMIT = 16
+
+
+class SimplifiedCNF:
+    def __init__(self, cnf, remap, stack, pool=None):
+        self.cnf = cnf
+        self.remap = remap
+        self.stack = stack
+        self.pool = pool
+
+    @property
+    def n_vars(self):
+        return int(np.abs(self.remap).max()) if len(self.remap) > 0 else 0
+
+    # Literal of the simplified formula for an original literal
+    def literal(self, lit):
+        var = abs(lit)
+        new = int(self.remap[var]) if var < len(self.remap) else 0
+        assert new != 0, f"Variable {var} was simplified away, freeze it"
+        return new if lit > 0 else -new
+
+    # Name to literal, like the pool the original formula was numbered with,
+    # so assumption code takes either
+    def v_to_id(self, name):
+        return self.literal(self.pool.v_to_id(name))
+
+    # Model (list of literals) of the simplified formula to a model of the
+    # original one, as a list of literals over 1..n original variables
+    def extend_model(self, model):
+        new_value = {abs(lit): lit > 0 for lit in model}
+        value = dict()
+        for var in range(1, len(self.remap)):
+            new = int(self.remap[var])
+            if new != 0:
+                value[var] = new_value.get(abs(new), False) == (new > 0)
+
+        def lit_true(lit):
+            return value.get(abs(lit), False) == (lit > 0)
+
+        # units hold in every model, the other steps depend on later ones
+        for step in self.stack:
+            if step[0] == "unit":
+                value[abs(step[1])] = step[1] > 0
+        for step in reversed(self.stack):
+            if step[0] == "unit":
+                continue
+            elif step[0] == "equiv":
+                _, var, lit = step
+                value[var] = lit_true(lit)
+            else:
+                _, var, clauses = step
+                value[var] = False
+                for clause in clauses:
+                    if var in clause and not any(
+                        lit_true(lit) for lit in clause if abs(lit) != var
+                    ):
+                        value[var] = True
+                        break
+        return [
+            var if value.get(var, False) else -var for var in range(1, len(self.remap))
+        ]
+
+
+class Simplifier:
+    def __init__(self, clauses, frozen):
+        self.frozen = set(int(var) for var in frozen)
+        self.clauses = list()
+        self.occurs = defaultdict(set)
+        self.fixed = dict()
+        self.queue = list()
+        self.replaced = dict()
+        self.eliminated = set()
+        self.stack = list()
+        self.unsat = False
+
+        self.n_vars = max(self.frozen, default=0)
+        for clause in clauses:
+            if len(clause) > 0:
+                self.n_vars = max(self.n_vars, max(abs(lit) for lit in clause))
+            self.add_clause(clause)
+
+    def lit_value(self, lit):
+        value = self.fixed.get(abs(lit))
+        if value is None:
+            return None
+        return value == (lit > 0)
+
+    def add_clause(self, clause):
+        lits = set()
+        for lit in clause:
+            value = self.lit_value(lit)
+            if value is True or -lit in lits:
+                return
+            if value is None:
+                lits.add(lit)
+        if len(lits) == 0:
+            self.unsat = True
+        elif len(lits) == 1:
+            self.assign(lits.pop())
+        else:
+            cid = len(self.clauses)
+            self.clauses.append(sorted(lits))
+            for lit in lits:
+                self.occurs[lit].add(cid)
+
+    def remove_clause(self, cid):
+        for lit in self.clauses[cid]:
+            self.occurs[lit].discard(cid)
+        self.clauses[cid] = None
+
+    def assign(self, lit):
+        value = self.lit_value(lit)
+        if value is False:
+            self.unsat = True
+        elif value is None:
+            self.fixed[abs(lit)] = lit > 0
+            self.stack.append(("unit", lit))
+            self.queue.append(lit)
+
+    def propagate(self):
+        while self.queue and not self.unsat:
+            lit = self.queue.pop()
+            for cid in list(self.occurs[lit]):
+                self.remove_clause(cid)
+            for cid in list(self.occurs[-lit]):
+                self.remove_literal(cid, -lit)
+
+    def remove_literal(self, cid, lit):
+        clause = self.clauses[cid]
+        self.occurs[lit].discard(cid)
+        clause.remove(lit)
+        if len(clause) == 1:
+            self.remove_clause(cid)
+            self.assign(clause[0])
+
+    def live_ids(self):
+        return [cid for cid, clause in enumerate(self.clauses) if clause is not None]
+
+    # Literals in one strongly connected component of the binary implication
+    # graph are equivalent, every variable of a component is replaced by
+    # the component's representative (a frozen one if there is any)
+    def substitute_equivalences(self):
+        graph = defaultdict(list)
+        for clause in self.clauses:
+            if clause is not None and len(clause) == 2:
+                a, b = clause
+                graph[-a].append(b)
+                graph[-b].append(a)
+
+        changed = False
+        for component in strongly_connected_components(graph):
+            if len(component) < 2:
+                continue
+            lits = set(component)
+            if any(-lit in lits for lit in lits):
+                self.unsat = True
+                return True
+            frozen = [lit for lit in component if abs(lit) in self.frozen]
+            rep = min(frozen or component, key=abs)
+            # the mirrored component is the same equivalence, skip it
+            if rep < 0:
+                continue
+            for lit in component:
+                if lit == rep:
+                    continue
+                self.replace(abs(lit), rep if lit > 0 else -rep)
+                changed = True
+        return changed
+
+    def replace(self, var, lit):
+        self.replaced[var] = lit
+        self.stack.append(("equiv", var, lit))
+        # fixed while this round's components were being replaced
+        if var in self.fixed:
+            self.assign(lit if self.fixed[var] else -lit)
+        for cid in list(self.occurs[var] | self.occurs[-var]):
+            clause = self.clauses[cid]
+            self.remove_clause(cid)
+            self.add_clause(
+                [
+                    (lit if old > 0 else -lit) if abs(old) == var else old
+                    for old in clause
+                ]
+            )
+
+    # Backward subsumption and self-subsuming resolution: every clause
+    # removes the clauses it subsumes and strengthens the ones it subsumes
+    # with one literal flipped
+    def subsume(self):
+        changed = False
+        worklist = sorted(self.live_ids(), key=lambda cid: -len(self.clauses[cid]))
+        while worklist and not self.unsat:
+            cid = worklist.pop()
+            clause = self.clauses[cid]
+            if clause is None:
+                continue
+            var = min(
+                (abs(lit) for lit in clause),
+                key=lambda v: len(self.occurs[v]) + len(self.occurs[-v]),
+            )
+            candidates = self.occurs[var] | self.occurs[-var]
+            if len(candidates) > SUBSUMPTION_OCC_LIMIT:
+                continue
+            for other_id in candidates:
+                other = self.clauses[other_id]
+                if other_id == cid or other is None or len(other) < len(clause):
+                    continue
+                flipped = subsumption(clause, set(other))
+                if flipped is None:
+                    continue
+                changed = True
+                if flipped == 0:
+                    self.remove_clause(other_id)
+                else:
+                    self.remove_literal(other_id, flipped)
+                    if self.clauses[other_id] is not None:
+                        worklist.append(other_id)
+            self.propagate()
+        return changed
+
+    # Resolves away non-frozen variables whose resolvents take no more
+    # clauses than they replace
+    def eliminate(self):
+        changed = False
+        candidates = [
+            var
+            for var in range(1, self.n_vars + 1)
+            if var not in self.frozen
+            and var not in self.fixed
+            and var not in self.replaced
+            and var not in self.eliminated
+        ]
+        candidates.sort(key=lambda v: len(self.occurs[v]) + len(self.occurs[-v]))
+        for var in candidates:
+            if self.unsat:
+                break
+            if var in self.fixed:
+                continue
+            positive = [self.clauses[cid] for cid in self.occurs[var]]
+            negative = [self.clauses[cid] for cid in self.occurs[-var]]
+            n_old = len(positive) + len(negative)
+            if n_old == 0 or n_old > ELIMINATION_OCC_LIMIT:
+                continue
+            resolvents = resolve_all(var, positive, negative, n_old)
+            if resolvents is None:
+                continue
+
+            self.stack.append(("elim", var, [list(c) for c in positive + negative]))
+            self.eliminated.add(var)
+            for cid in list(self.occurs[var] | self.occurs[-var]):
+                self.remove_clause(cid)
+            for resolvent in resolvents:
+                self.add_clause(resolvent)
+            self.propagate()
+            changed = True
+        return changed
+
+    def run(self, rounds=ROUNDS):
+        self.propagate()
+        for _ in range(rounds):
+            if self.unsat:
+                break
+            changed = self.substitute_equivalences()
+            self.propagate()
+            changed |= self.subsume()
+            changed |= self.eliminate()
+            if not changed:
+                break
+
+    def final_literal(self, lit):
+        while abs(lit) in self.replaced:
+            replacement = self.replaced[abs(lit)]
+            lit = replacement if lit > 0 else -replacement
+        return lit
+
+    def result(self, pool=None):
+        if self.unsat:
+            # a contradictory unit pair rather than an empty clause: a zero
+            # separated buffer or a DIMACS body has no way to spell the latter
+            var = min(self.frozen - self.replaced.keys(), default=1)
+            clauses = [[var], [-var]]
+        else:
+            clauses = [clause for clause in self.clauses if clause is not None]
+            # fixed frozen variables keep their value as a unit clause
+            fixed_frozen = self.frozen & self.fixed.keys() - self.replaced.keys()
+            clauses += [
+                [var if self.fixed[var] else -var] for var in sorted(fixed_frozen)
+            ]
+
+        kept = set(abs(lit) for clause in clauses for lit in clause)
+        kept |= set(var for var in self.frozen if var not in self.replaced)
+        remap = np.zeros(max(kept | {self.n_vars}) + 1, dtype=np.int64)
+        for new, var in enumerate(sorted(kept)):
+            remap[var] = new + 1
+        for var in self.frozen & self.replaced.keys():
+            lit = self.final_literal(var)
+            remap[var] = remap[abs(lit)] if lit > 0 else -remap[abs(lit)]
+
+        renumbered = [
+            [int(remap[lit]) if lit > 0 else -int(remap[-lit]) for lit in clause]
+            for clause in clauses
+        ]
+        cnf = F.FlatCNF.from_clauses(renumbered)
+        return SimplifiedCNF(cnf, remap, self.stack, pool)
+
+
+# None if `clause` does not subsume `other` even with one literal flipped,
+# 0 if it subsumes `other`, else the literal of `other` to remove
+def subsumption(clause, other):
+    flipped = 0
+    for lit in clause:
+        if lit in other:
+            continue
+        if flipped == 0 and -lit in other:
+            flipped = -lit
+            continue
+        return None
+    return flipped
+
+
+# Non-tautological resolvents on `var`, None if there are more than
+# `max_resolvents` or one is too long
+def resolve_all(var, positive, negative, max_resolvents):
+    resolvents = list()
+    for pos in positive:
+        rest = set(lit for lit in pos if lit != var)
+        for neg in negative:
+            resolvent = set(rest)
+            tautology = False
+            for lit in neg:
+                if lit == -var:
+                    continue
+                if -lit in resolvent:
+                    tautology = True
+                    break
+                resolvent.add(lit)
+            if tautology:
+                continue
+            if len(resolvent) > RESOLVENT_LENGTH_LIMIT:
+                return None
+            resolvents.append(sorted(resolvent))
+            if len(resolvents) > max_resolvents:
+                return None
+    return resolvents
+
+
+# Tarjan's algorithm without recursion, `graph` maps a literal to the
+# literals it implies
+def strongly_connected_components(graph):
+    index = dict()
+    low = dict()
+    on_stack = set()
+    stack = list()
+    components = list()
+    counter = 0
+
+    for root in list(graph.keys()):
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, child_id = work.pop()
+            if child_id == 0:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+            children = graph.get(node, [])
+            if child_id < len(children):
+                work.append((node, child_id + 1))
+                child = children[child_id]
+                if child not in index:
+                    work.append((child, 0))
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+                continue
+            if low[node] == index[node]:
+                component = list()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+    return components
+
+
+# `cnf` is a `FlatCNF` or a list of clauses, `frozen` the variables
+# assumptions may use, `pool` the pool the formula was numbered with
+def simplify(cnf, frozen, pool=None, rounds=ROUNDS):
+    simplifier = Simplifier(cnf, frozen)
+    simplifier.run(rounds)
+    return simplifier.result(pool)
@@ -0,0 +1,134 @@
+import gzip
+import itertools
+import lzma
+
+import numpy as np
+
+# Streaming DIMACS (`p cnf`) and iCNF (`p inccnf`) writer.
+#
+# Clauses come straight from the arrays of a `flat_cnf.FlatCNF`, cubes from
+# any iterable of literal lists (e.g. a generator over basket pairs). Both
+# are formatted with numpy a chunk at a time and written as raw bytes to a
+# buffered file, so memory stays bounded by one chunk however large the
+# output gets. Files ending in `.gz` / `.xz` are compressed on the fly.
+
+# Literals formatted per write call
+CHUNK_LITS = 1 << 20
+# Cubes formatted per write call
+CHUNK_CUBES = 1 << 14
+
+BUFFER_SIZE = 1 << 20
+GZIP_LEVEL = 6
+
+ZERO = ord("0")
+MINUS = ord("-")
+SPACE = ord(" ")
+NEWLINE = ord("\n")
+
+COMPRESSIONS = {".gz": "gzip", ".xz": "xz"}
+
+
+# Binary file for writing, `compression` is None, "gzip" or "xz" and is
+# taken from the file name if not given
+def open_output(filename, compression=None):
+    if compression is None:
+        for suffix, name in COMPRESSIONS.items():
+            if filename.endswith(suffix):
+                compression = name
+    if compression == "gzip":
+        return gzip.open(filename, "wb", compresslevel=GZIP_LEVEL)
+    if compression == "xz":
+        return lzma.open(filename, "wb")
+    assert compression is None, f"Unknown compression {compression}"
+    return open(filename, "wb", buffering=BUFFER_SIZE)
+
+
+# Signed decimal ints, space separated, a line break after every line of
+# `line_lengths` values, `prefix` at the start of every line
+def format_lines(values, line_lengths, prefix=b""):
+    values = np.asarray(values, dtype=np.int64)
+    magnitudes = np.abs(values)
+    width = len(str(int(magnitudes.max()))) if len(values) > 0 else 1
+
+    n_digits = np.ones(len(values), dtype=np.int64)
+    for power in range(1, width):
+        n_digits += magnitudes >= 10 ** power
+
+    # every number gets a sign slot, `width` digit slots and a separator
+    cells = np.empty((len(values), width + 2), dtype=np.uint8)
+    keep = np.empty(cells.shape, dtype=bool)
+    cells[:, 0] = MINUS
+    keep[:, 0] = values < 0
+    rest = magnitudes.copy()
+    for slot in range(width, 0, -1):
+        cells[:, slot] = ZERO + rest % 10
+        rest //= 10
+        keep[:, slot] = slot > width - n_digits
+    line_ends = np.cumsum(line_lengths) - 1
+    cells[:, -1] = SPACE
+    cells[line_ends, -1] = NEWLINE
+    keep[:, -1] = True
+
+    out = cells[keep]
+    if len(prefix) > 0:
+        value_bytes = keep.sum(axis=1)
+        line_starts = (np.cumsum(value_bytes) - value_bytes)[
+            line_ends - np.asarray(line_lengths) + 1
+        ]
+        out = np.insert(
+            out,
+            np.repeat(line_starts, len(prefix)),
+            np.tile(np.frombuffer(prefix, dtype=np.uint8), len(line_starts)),
+        )
+    return out.tobytes()
+
+
+def write_clauses(f, cnf):
+    cnf.flush()
+    n_clauses = len(cnf.offsets) - 1
+    start = 0
+    while start < n_clauses:
+        # whole clauses, about CHUNK_LITS literals
+        end = int(np.searchsorted(cnf.offsets, cnf.offsets[start] + CHUNK_LITS))
+        end = min(max(end, start + 1), n_clauses)
+        chunk = cnf.offsets[start : end + 1]
+        lengths = np.diff(chunk)
+        lits = cnf.lits[chunk[0] : chunk[-1]]
+        values = np.zeros(len(lits) + len(lengths), dtype=np.int64)
+        values[np.arange(len(lits)) + np.repeat(np.arange(len(lengths)), lengths)] = (
+            lits
+        )
+        f.write(format_lines(values, lengths + 1))
+        start = end
+
+
+def write_cubes(f, cubes):
+    cubes = iter(cubes)
+    while True:
+        chunk = list(itertools.islice(cubes, CHUNK_CUBES))
+        if len(chunk) == 0:
+            break
+        lengths = np.array([len(cube) + 1 for cube in chunk], dtype=np.int64)
+        values = np.fromiter(
+            itertools.chain.from_iterable(list(cube) + [0] for cube in chunk),
+            dtype=np.int64,
+            count=int(lengths.sum()),
+        )
+        f.write(format_lines(values, lengths, prefix=b"a "))
+
+
+# `n_vars` defaults to the largest variable in the clauses
+def write_dimacs(cnf, filename, n_vars=None, compression=None):
+    if n_vars is None:
+        n_vars = cnf.n_vars
+    with open_output(filename, compression) as f:
+        f.write(f"p cnf {n_vars} {len(cnf)}\n".encode())
+        write_clauses(f, cnf)
+
+
+# Clauses, then one `a ... 0` line per cube, cubes are consumed lazily
+def write_icnf(cnf, cubes, filename, compression=None):
+    with open_output(filename, compression) as f:
+        f.write(b"p inccnf\n")
+        write_clauses(f, cnf)
+        write_cubes(f, cubes)
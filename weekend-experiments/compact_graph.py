@@ -0,0 +1,304 @@
+from functools import cached_property
+
+import numpy as np
+
+import aig_parser as P
+import graph as G
+
+# Node types, chosen to coincide with the number of children of a node,
+# except for the constant false node, which exists only if an output is
+# tied to a constant
+INPUT = 0
+NOT = 1
+AND = 2
+CONST = 3
+
+TYPE_PREFIXES = {INPUT: "v", NOT: "i", AND: "a", CONST: "c"}
+PREFIX_TYPES = {prefix: node_type for node_type, prefix in TYPE_PREFIXES.items()}
+
+
+# Array-backed twin of `graph.Graph`.
+#
+# Nodes are contiguous ints in the same topological order as `Graph.node_names`
+# (inputs first), so node `k` of a compact graph and `g.node_names[k]` are the
+# same gate. Edges live in CSR form: children of node `k` are
+# `fanin[fanin_offsets[k]:fanin_offsets[k + 1]]`, parents similarly in
+# `fanout`. String names (`v3`, `i7L`, `a123L`) are never stored, they are
+# produced from (type, type_index) on demand.
+#
+# Everything derived from the fanin (fanout, depth, level) can be passed in
+# precomputed, e.g. when loading from `graph_cache`.
+class CompactGraph:
+    def __init__(
+        self,
+        tag,
+        name,
+        node_type,
+        type_index,
+        fanin_offsets,
+        fanin,
+        outputs,
+        source_lits=None,
+        fanout_offsets=None,
+        fanout=None,
+        depth=None,
+        level=None,
+    ):
+        self.tag = tag
+        self.name = name
+
+        self.node_type = node_type
+        self.type_index = type_index
+        self.fanin_offsets = fanin_offsets
+        self.fanin = fanin
+        self.outputs = outputs
+        # AIGER literal every node came from, if known
+        self.source_lits = source_lits
+
+        self.n_nodes = len(node_type)
+        self.n_inputs = int(np.count_nonzero(node_type == INPUT))
+        self.n_outputs = len(outputs)
+
+        if fanout is None:
+            fanout_offsets, fanout = self.make_fanout()
+        self.fanout_offsets, self.fanout = fanout_offsets, fanout
+
+        if depth is None:
+            depth, level = self.make_depth_and_level()
+        self.depth, self.level = depth, level
+
+        self.ids_of_type = dict()
+
+    @classmethod
+    def from_file(cls, filename, tag):
+        parsed = P.Parser().parse(filename)
+        return cls.from_parsed(*parsed, tag=tag, name=filename)
+
+    @classmethod
+    def from_parsed(cls, lit_parents, lit_children, lit_inputs, lit_outputs, tag, name):
+        topsort = G.make_topsort(lit_parents, lit_children, lit_inputs, lit_outputs)
+
+        n = len(topsort)
+        node_type = np.empty(n, dtype=np.int8)
+        type_index = np.empty(n, dtype=np.int32)
+        fanin_offsets = np.zeros(n + 1, dtype=np.int64)
+        fanin = list()
+
+        lit_to_id = dict()
+        last_of_type = [0, 0, 0, 0]
+
+        for node_id, lit in enumerate(topsort):
+            children = lit_children[lit]
+            t = len(children)
+            assert t <= AND, "Graph node has wrong number of children"
+            if lit == P.CONST_LIT:
+                t = CONST
+
+            node_type[node_id] = t
+            type_index[node_id] = last_of_type[t]
+            last_of_type[t] += 1
+
+            for child in children:
+                fanin.append(lit_to_id[child])
+            fanin_offsets[node_id + 1] = len(fanin)
+            lit_to_id[lit] = node_id
+
+        outputs = np.array([lit_to_id[lit] for lit in lit_outputs], dtype=np.int32)
+
+        return cls(
+            tag,
+            name,
+            node_type,
+            type_index,
+            fanin_offsets,
+            np.array(fanin, dtype=np.int32),
+            outputs,
+            source_lits=np.array(topsort, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_graph(cls, g):
+        n = len(g.node_names)
+        name_to_id = {name: node_id for node_id, name in enumerate(g.node_names)}
+
+        node_type = np.empty(n, dtype=np.int8)
+        type_index = np.empty(n, dtype=np.int32)
+        fanin_offsets = np.zeros(n + 1, dtype=np.int64)
+        fanin = list()
+
+        for node_id, name in enumerate(g.node_names):
+            node_type[node_id] = PREFIX_TYPES[name[0]]
+            type_index[node_id] = int(g.get_number_from_name(name))
+            for child in g.children[name]:
+                fanin.append(name_to_id[child])
+            fanin_offsets[node_id + 1] = len(fanin)
+
+        outputs = np.array(
+            [
+                name_to_id[g.output_name_to_node_name[f"o{output_id}"]]
+                for output_id in range(g.n_outputs)
+            ],
+            dtype=np.int32,
+        )
+
+        return cls(
+            g.tag,
+            g.name,
+            node_type,
+            type_index,
+            fanin_offsets,
+            np.array(fanin, dtype=np.int32),
+            outputs,
+            source_lits=np.array(
+                [g.source_name_to_lit[name] for name in g.node_names], dtype=np.int64
+            ),
+        )
+
+    def make_fanout(self):
+        n_children = np.diff(self.fanin_offsets)
+        edge_parent = np.repeat(np.arange(self.n_nodes, dtype=np.int32), n_children)
+        # stable sort keeps parents of every node in topological order,
+        # same as `Graph.parents`
+        order = np.argsort(self.fanin, kind="stable")
+
+        fanout_offsets = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.fanin, minlength=self.n_nodes), out=fanout_offsets[1:]
+        )
+        return fanout_offsets, edge_parent[order]
+
+    def make_depth_and_level(self):
+        depth = [0] * self.n_nodes
+        level = [0] * self.n_nodes
+        fanin = self.fanin.tolist()
+        offsets = self.fanin_offsets.tolist()
+
+        for node_id in range(self.n_nodes):
+            children = fanin[offsets[node_id] : offsets[node_id + 1]]
+            if len(children) == 0:
+                continue
+            depth[node_id] = max(depth[child] for child in children) + 1
+            level[node_id] = min(level[child] for child in children) + 1
+
+        return np.array(depth, dtype=np.int32), np.array(level, dtype=np.int32)
+
+    def children_of(self, node_id):
+        return self.fanin[self.fanin_offsets[node_id] : self.fanin_offsets[node_id + 1]]
+
+    def parents_of(self, node_id):
+        return self.fanout[
+            self.fanout_offsets[node_id] : self.fanout_offsets[node_id + 1]
+        ]
+
+    def node_ids(self, node_type):
+        if node_type not in self.ids_of_type:
+            self.ids_of_type[node_type] = np.flatnonzero(self.node_type == node_type)
+        return self.ids_of_type[node_type]
+
+    def node_name(self, node_id):
+        t = int(self.node_type[node_id])
+        name = f"{TYPE_PREFIXES[t]}{self.type_index[node_id]}"
+        if t == INPUT:
+            return name
+        return name + self.tag
+
+    def node_id(self, name):
+        t = PREFIX_TYPES[name[0]]
+        if t == INPUT:
+            index = int(name[1:])
+        else:
+            assert name.endswith(self.tag), f"{name} does not belong to {self.tag}"
+            index = int(name[1 : len(name) - len(self.tag)])
+        return int(self.node_ids(t)[index])
+
+    # Everything below mirrors the `graph.Graph` interface, so that code written
+    # against string names keeps working on a compact graph. The arrays never
+    # change after construction, so each name view is built on first access
+    # and kept: loops over `node_names` or `children[name]` stay linear.
+
+    @cached_property
+    def node_names(self):
+        return [self.node_name(node_id) for node_id in range(self.n_nodes)]
+
+    @cached_property
+    def children(self):
+        return NamedNeighbours(self, self.children_of)
+
+    @cached_property
+    def parents(self):
+        return NamedNeighbours(self, self.parents_of)
+
+    @cached_property
+    def output_name_to_node_name(self):
+        return {
+            f"o{output_id}": self.node_name(node_id)
+            for output_id, node_id in enumerate(self.outputs)
+        }
+
+    @cached_property
+    def source_name_to_lit(self):
+        if self.source_lits is None:
+            return dict()
+        return dict(zip(self.node_names, self.source_lits.tolist()))
+
+    def shortname(self):
+        if "/" not in self.name:
+            return self.name
+        return self.name.split("/")[-1]
+
+    def input_var_to_cnf_var(self, input, pool):
+        return pool.v_to_id(input)
+
+    def output_var_to_cnf_var(self, output, pool):
+        output_id = int(output[1:])
+        return pool.v_to_id(self.node_name(self.outputs[output_id]))
+
+    # Same as `Graph.calculate_schema_on_inputs`, but returns a list of bools
+    # indexed by node id.
+    def simulate_ids(self, inputs):
+        assert inputs < 2 ** self.n_inputs
+
+        result = [False] * self.n_nodes
+        node_type = self.node_type.tolist()
+        type_index = self.type_index.tolist()
+        fanin = self.fanin.tolist()
+        offsets = self.fanin_offsets.tolist()
+
+        for node_id in range(self.n_nodes):
+            t = node_type[node_id]
+            if t == INPUT:
+                result[node_id] = (inputs & (1 << type_index[node_id])) > 0
+            elif t == CONST:
+                result[node_id] = False
+            elif t == NOT:
+                result[node_id] = not result[fanin[offsets[node_id]]]
+            else:
+                left = fanin[offsets[node_id]]
+                right = fanin[offsets[node_id] + 1]
+                result[node_id] = result[left] and result[right]
+
+        return result
+
+    def calculate_schema_on_inputs(self, inputs):
+        values = self.simulate_ids(inputs)
+        return {self.node_name(node_id): value for node_id, value in enumerate(values)}
+
+
+# Read-only `name -> [name]` view over a CSR adjacency of a compact graph,
+# stands in for `Graph.children` and `Graph.parents`.
+class NamedNeighbours:
+    def __init__(self, g, neighbours_of):
+        self.g = g
+        self.neighbours_of = neighbours_of
+
+    def __getitem__(self, name):
+        node_id = self.g.node_id(name)
+        return [self.g.node_name(other) for other in self.neighbours_of(node_id)]
+
+
+def as_compact(g):
+    if isinstance(g, CompactGraph):
+        return g
+    if g.compact_graph is None:
+        g.compact_graph = CompactGraph.from_graph(g)
+    return g.compact_graph
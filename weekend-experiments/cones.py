@@ -0,0 +1,68 @@
+import numpy as np
+
+import compact_graph as CG
+
+# Transitive fan-in cones.
+#
+# A cone is a boolean mask over node ids of the compact graph (node ids are
+# the positions in `g.node_names`), `cone_ids` turns it into a sorted index
+# array, which is also a topological order of the cone. The sweep goes one
+# depth layer at a time with numpy gathers over the CSR fanin, so a cone costs
+# O(its size) array work plus one numpy round per layer.
+
+
+def to_node_ids(g, nodes):
+    cg = CG.as_compact(g)
+    return np.array(
+        [cg.node_id(node) if isinstance(node, str) else int(node) for node in nodes],
+        dtype=np.int64,
+    )
+
+
+# Children of every node in `frontier`, concatenated
+def gather_children(cg, frontier):
+    starts = cg.fanin_offsets[frontier]
+    counts = cg.fanin_offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # position of every gathered edge inside the fanin array
+    shifts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return cg.fanin[shifts + np.arange(total)]
+
+
+# `nodes` are node ids or node names, any mix of outputs and inner gates
+def cone_mask(g, nodes):
+    cg = CG.as_compact(g)
+    mask = np.zeros(cg.n_nodes, dtype=bool)
+
+    frontier = np.unique(to_node_ids(cg, nodes))
+    mask[frontier] = True
+    while len(frontier) > 0:
+        children = np.unique(gather_children(cg, frontier))
+        frontier = children[~mask[children]]
+        mask[frontier] = True
+
+    return mask
+
+
+def cone_ids(g, nodes):
+    return np.flatnonzero(cone_mask(g, nodes))
+
+
+def output_cone_mask(g, output_ids):
+    cg = CG.as_compact(g)
+    return cone_mask(cg, cg.outputs[list(output_ids)])
+
+
+def output_cone_ids(g, output_ids):
+    return np.flatnonzero(output_cone_mask(g, output_ids))
+
+
+# Consecutive outputs usually share most of their logic, so groups are
+# contiguous ranges of output ids
+def output_groups(n_outputs, group_size):
+    return [
+        list(range(start, min(start + group_size, n_outputs)))
+        for start in range(0, n_outputs, group_size)
+    ]
@@ -1,46 +1,54 @@
+import concurrent.futures
 import random
+import time
 
-from collections import defaultdict
+import numpy as np
 from tqdm import tqdm
 
 from pysat.solvers import Maplesat as PysatSolver
 
+import cnf_fragment as FR
+import compact_graph as CG
 import formula_builder as FB
+import lut_mapping as LM
+import pair_compatibility as PC
+import polarity as PG
+import simulation as S
 
 import hyperparameters as H
 
 
 def find_unbalancedness_for_graph_nodes(g):
-    print("Random sampling unbalanced nodes, {} samples".format(H.RANDOM_SAMPLE_SIZE))
-
-    random.seed(42)
-    complete_input_range = range(2 ** g.n_inputs)
-    random_sample_size =  min(len(complete_input_range), H.RANDOM_SAMPLE_SIZE)
-    random_sample = random.sample(complete_input_range, random_sample_size)
-
-    had_true_on_node = defaultdict(int)
-
-    for i, input in enumerate(
-        tqdm(random_sample, desc="Random sampling unbalanced nodes")
-    ):
-        gate_values_on_input = g.calculate_schema_on_inputs(input)
-        for name, value in gate_values_on_input.items():
-            if value:
-                had_true_on_node[name] += 1
-
+    cg = CG.as_compact(g)
+
+    if S.fits_exhaustive(cg):
+        # small schema, saturations are exact
+        random_sample_size = 2 ** g.n_inputs
+        print("Exact saturations on all {} inputs".format(random_sample_size))
+        had_true_on_node = S.popcounts(S.truth_tables(cg))
+    else:
+        print(
+            "Random sampling unbalanced nodes, {} samples".format(
+                H.RANDOM_SAMPLE_SIZE
+            )
+        )
+        random.seed(42)
+        random_sample = S.sample_inputs(g.n_inputs, H.RANDOM_SAMPLE_SIZE)
+        random_sample_size = len(random_sample)
 
+        # all samples are simulated at once, packed 64 per machine word
+        had_true_on_node = S.count_true_on_inputs(cg, random_sample)
 
     # map each gate to its saturation
     # fractions : [(disbalance, gate_name)]
-    fractions = list(
-        map(
-            lambda name_cnt: (name_cnt[1] / random_sample_size, name_cnt[0]),
-            had_true_on_node.items(),
-        )
-    )
-
-    return list(filter(lambda item: not item[1].startswith("i"), fractions))
+    # nodes that never were true are skipped, same as before
+    fractions = [
+        (int(cnt) / random_sample_size, cg.node_name(node_id))
+        for node_id, cnt in enumerate(had_true_on_node)
+        if cnt > 0 and cg.node_type[node_id] != CG.NOT
+    ]
 
+    return fractions
 
 
 # Returns names of nodes that are unbalanced enough, based on DISBALANCE_THRESHOLD.
@@ -55,6 +63,9 @@ def find_unbalanced_gates(g):
 
     unbalanced_gates = list(map(lambda p: p[1], unbalanced))
 
+    if H.BUCKET_FORMATION == "correlated":
+        return correlated_buckets(g, unbalanced_gates)
+
     buckets = [
         unbalanced_gates[x : x + H.BUCKET_SIZE]
         for x in range(0, len(unbalanced_gates), H.BUCKET_SIZE)
@@ -63,31 +74,105 @@ def find_unbalanced_gates(g):
     return buckets
 
 
-# Calculates a list of tuples:
-# (saturation, bucket, domain, tag)
-# saturation - value (0-1]
-# bucket - list of node names, of which the bucket consists
-# domain - list of positive ints, every int is a bitvector of length len(bucket)
-# tag - either L or R for the left or right half of a miter schema, accordingly
-def calculate_domain_saturations(g, buckets, tag, start_from):
-    print("Total buckets selected for {} schema: {}".format(tag, len(buckets)))
+# Joint bitvectors a bucket takes after adding each candidate gate: the
+# bucket's bitvectors (`codes`, numbered 0..n-1 per pattern) plus one for
+# every bitvector the candidate's `bits` (0/1 per pattern) split in two
+def joint_counts(codes, bits):
+    n_codes = int(codes.max()) + 1
+    members = np.zeros((len(codes), n_codes), dtype=np.float32)
+    members[np.arange(len(codes)), codes] = 1
+    totals = members.sum(axis=0)
+    ones = bits @ members
+    return n_codes + ((ones > 0) & (ones < totals)).sum(axis=1)
+
+
+# Buckets of `gates` (most unbalanced first) with few joint bitvectors.
+# The number of distinct bitvectors a bucket takes on random patterns
+# estimates its domain, and a domain is what every later cartesian product
+# multiplies. A bucket starts with the most unbalanced gate left, then
+# repeatedly takes, among the next H.BUCKET_CANDIDATES gates left, the one
+# that adds the fewest new joint bitvectors: equal, complementary or
+# implied gates add none. Ties go to the more unbalanced gate, so without
+# correlations the buckets are the sorted slices.
+def correlated_buckets(g, gates, bucket_size=None):
+    if bucket_size is None:
+        bucket_size = H.BUCKET_SIZE
+    cg = CG.as_compact(g)
+    n_patterns = H.BUCKET_SIGNATURE_PATTERNS
+    patterns = S.random_patterns(cg.n_inputs, n_patterns)
+    signatures = S.simulate(cg, patterns)[[cg.node_id(gate) for gate in gates]]
+
+    def pattern_bits(positions):
+        bits = np.unpackbits(
+            np.ascontiguousarray(signatures[positions]).view(np.uint8),
+            axis=1,
+            bitorder="little",
+        )
+        return bits[:, :n_patterns].astype(np.float32)
+
+    # the most unbalanced gates left, in order; every gate from `following`
+    # on is left as well
+    window = list(range(min(H.BUCKET_CANDIDATES, len(gates))))
+    following = len(window)
+
+    def take(window_position):
+        nonlocal following
+        if following < len(gates):
+            window.append(following)
+            following += 1
+        return window.pop(window_position)
+
+    buckets = list()
+    while len(window) > 0:
+        bucket = [take(0)]
+        codes = pattern_bits(bucket)[0].astype(np.int64)
+        while len(bucket) < bucket_size and len(window) > 0:
+            bits = pattern_bits(window)
+            best = int(np.argmin(joint_counts(codes, bits)))
+            _, codes = np.unique(2 * codes + bits[best], return_inverse=True)
+            bucket.append(take(best))
+        buckets.append([gates[position] for position in bucket])
+    return buckets
 
-    domains = list()
 
-    pool = FB.TPoolHolder(start_from=start_from)
-    formula = FB.make_formula_from_my_graph(g, pool)
+# A bitvector is in the domain iff some input makes the bucket gates take
+# exactly these values, so the truth tables answer every SAT call at once.
+def calculate_exhaustive_domains(g, buckets, stats=None):
+    cg = CG.as_compact(g)
+    tables = S.truth_tables(cg)
+    n_patterns = 2 ** cg.n_inputs
+
+    domains = list()
+    for bucket in tqdm(buckets, desc="Calculating exact domain for bucket"):
+        t_start = time.time()
+        rows = tables[[cg.node_id(gate_name) for gate_name in bucket]]
+        domains.append((bucket, S.observed_bitvectors(rows, n_patterns)))
+        add_bucket_stats(stats, domains[-1], 0, time.time() - t_start)
+    return domains
+
+
+# Every engine below appends one record per bucket to `stats` if given
+def add_bucket_stats(stats, bucket_domain, n_calls, seconds):
+    if stats is None:
+        return
+    bucket, domain = bucket_domain
+    stats.append(
+        {
+            "bucket_size": len(bucket),
+            "domain_size": len(domain),
+            "solver_calls": n_calls,
+            "time": seconds,
+        }
+    )
 
-    shift = -1
-    for clause in formula.clauses:
-        for var in clause:
-            shift = max(shift, abs(var))
 
-    # bucket : [gate_name]
-    # domains : [(bucket, [bit_vector])]
-    with PysatSolver(bootstrap_with=formula.clauses) as solver:
+def calculate_domains_with_solver(formula, pool, buckets, stats=None):
+    domains = list()
+    with PysatSolver(bootstrap_with=formula) as solver:
         for bucket_id, bucket in enumerate(
             tqdm(buckets, desc="Calculating saturation for bucket")
         ):
+            t_start = time.time()
             domain = list()
 
             cur_bucket_size = len(bucket)
@@ -104,6 +189,348 @@ def calculate_domain_saturations(g, buckets, tag, start_from):
                     domain.append(i)
 
             domains.append((bucket, domain))
+            add_bucket_stats(
+                stats, domains[-1], 2 ** cur_bucket_size, time.time() - t_start
+            )
+    return domains
+
+
+# Bitvectors every bucket takes on random patterns, one boolean mask of
+# length 2 ** len(bucket) per bucket, several passes for big schemas
+def simulated_domains(cg, bucket_ids, n_patterns):
+    schedule = S.make_schedule(cg)
+    step = S.patterns_per_pass(cg)
+    seen = [np.zeros(2 ** len(ids), dtype=bool) for ids in bucket_ids]
+    for start in range(0, n_patterns, step):
+        n_pass = min(step, n_patterns - start)
+        patterns = S.random_patterns(cg.n_inputs, n_pass, seed=42 + start)
+        signatures = S.simulate(cg, patterns, schedule)
+        for mask, ids in zip(seen, bucket_ids):
+            mask[S.observed_bitvectors(signatures[ids], n_pass)] = True
+    return seen
+
+
+# (literals, bit weights) of the gates of every bucket
+def bucket_literals(pool, buckets):
+    lits = [
+        np.array([pool.v_to_id(gate_name) for gate_name in bucket], dtype=np.int64)
+        for bucket in buckets
+    ]
+    weights = [
+        np.int64(1) << np.arange(len(bucket), dtype=np.int64) for bucket in buckets
+    ]
+    return lits, weights
+
+
+# Bitvector a model (`values[var - 1]` is the value of `var`) takes on a
+# bucket, None if some bucket variable is not in the model
+def model_bitvector(values, lits, weights):
+    if np.abs(lits).max() > len(values):
+        return None
+    bits = values[np.abs(lits) - 1] == (lits > 0)
+    return int(weights[bits].sum())
+
+
+def assumption_literals(lits, bitvector):
+    return [
+        lit if (bitvector >> gate_in_bucket_id) & 1 else -lit
+        for gate_in_bucket_id, lit in enumerate(lits)
+    ]
+
+
+# Completes the `seen` mask of one bucket (literals `lits`, bit weights
+# `weights`) and returns the number of solver calls. Bitvectors already
+# seen need no call, every UNSAT core rules out all bitvectors that agree
+# with it, every SAT model also marks the bitvector it realizes in `later`,
+# a list of (lits, weights, seen) of buckets still to come.
+def pruned_domain(solver, lits, weights, seen, later=()):
+    n_calls = 0
+    lits = lits.tolist()
+    bitvectors = np.arange(len(seen), dtype=np.int64)
+    refuted = np.zeros(len(seen), dtype=bool)
+    for i in np.flatnonzero(~seen).tolist():
+        if seen[i] or refuted[i]:
+            # settled by a model or a core found meanwhile
+            continue
+        assumptions = assumption_literals(lits, i)
+        n_calls += 1
+        if not solver.solve(assumptions=assumptions):
+            # the core fixes some bits, everything with these bits fails
+            core = set(solver.get_core())
+            in_core = np.array([lit in core for lit in assumptions])
+            core_mask = int(weights[in_core].sum())
+            refuted |= (bitvectors & core_mask) == (i & core_mask)
+            continue
+        seen[i] = True
+        values = np.array(solver.get_model(), dtype=np.int64) > 0
+        for other_lits, other_weights, other_seen in later:
+            bitvector = model_bitvector(values, other_lits, other_weights)
+            if bitvector is not None:
+                other_seen[bitvector] = True
+    return n_calls
+
+
+# Enumerates the domain of one bucket into the set `found` and returns the
+# number of solver calls, `guard` is a variable no clause uses yet. Models
+# also go into `later`, a list of (lits, weights, found) of buckets still
+# to come.
+def allsat_domain(solver, lits, weights, guard, found, later=()):
+    n_calls = 0
+    lits = np.asarray(lits)
+
+    def block(bitvector):
+        blocked = assumption_literals(lits.tolist(), bitvector)
+        solver.add_clause([-guard] + [-lit for lit in blocked])
+
+    for bitvector in found:
+        block(bitvector)
+    while True:
+        n_calls += 1
+        if not solver.solve(assumptions=[guard]):
+            break
+        values = np.array(solver.get_model(), dtype=np.int64) > 0
+        for other_lits, other_weights, other_found in later:
+            bitvector = model_bitvector(values, other_lits, other_weights)
+            if bitvector is not None:
+                other_found.add(bitvector)
+        bitvector = model_bitvector(values, lits, weights)
+        found.add(bitvector)
+        block(bitvector)
+    solver.add_clause([-guard])
+    return n_calls
+
+
+# Guards of the AllSAT blocking clauses, `first + bucket_id` per bucket,
+# come after every variable so models cover all bucket gates
+def first_guard(formula, bucket_lits):
+    return 1 + max([formula.n_vars] + [int(np.abs(lits).max()) for lits in bucket_lits])
+
+
+# Same domains as `calculate_domains_with_solver` in far fewer SAT calls.
+# Bitvectors seen in simulation need no call at all, the rest goes through
+# `pruned_domain`, so a bucket takes a handful of calls instead of
+# 2 ** len(bucket).
+def calculate_domains_with_simulation(
+    g, formula, pool, buckets, n_patterns=None, stats=None
+):
+    if n_patterns is None:
+        n_patterns = H.DOMAIN_SIMULATION_PATTERNS
+    cg = CG.as_compact(g)
+    bucket_ids = [[cg.node_id(gate_name) for gate_name in bucket] for bucket in buckets]
+    seen = simulated_domains(cg, bucket_ids, n_patterns)
+    bucket_lits, weights = bucket_literals(pool, buckets)
+
+    domains = list()
+    with PysatSolver(bootstrap_with=formula) as solver:
+        for bucket_id, bucket in enumerate(
+            tqdm(buckets, desc="Calculating saturation for bucket")
+        ):
+            t_start = time.time()
+            later = list(zip(bucket_lits, weights, seen))[bucket_id + 1 :]
+            n_calls = pruned_domain(
+                solver,
+                bucket_lits[bucket_id],
+                weights[bucket_id],
+                seen[bucket_id],
+                later,
+            )
+            domains.append((bucket, np.flatnonzero(seen[bucket_id]).tolist()))
+            add_bucket_stats(stats, domains[-1], n_calls, time.time() - t_start)
+    return domains
+
+
+# Domains as a projected AllSAT over the bucket literals: while the formula
+# has a model, take the bitvector it gives the bucket and block it with a
+# clause over the bucket literals. Calls grow with the domain, not with
+# 2 ** len(bucket), and nothing of size 2 ** len(bucket) is allocated, so
+# buckets well past 15 gates stay cheap as long as they are unbalanced.
+#
+# Blocking clauses of a bucket carry a fresh guard literal, assumed while
+# the bucket is enumerated and set false afterwards. Models are read back
+# for the later buckets too, their bitvectors are blocked upfront.
+def calculate_domains_with_allsat(formula, pool, buckets, stats=None):
+    bucket_lits, weights = bucket_literals(pool, buckets)
+    found = [set() for _ in buckets]
+    guard = first_guard(formula, bucket_lits)
+
+    domains = list()
+    with PysatSolver(bootstrap_with=formula) as solver:
+        for bucket_id, bucket in enumerate(
+            tqdm(buckets, desc="Enumerating domain for bucket")
+        ):
+            t_start = time.time()
+            later = list(zip(bucket_lits, weights, found))[bucket_id + 1 :]
+            n_calls = allsat_domain(
+                solver,
+                bucket_lits[bucket_id],
+                weights[bucket_id],
+                guard + bucket_id,
+                found[bucket_id],
+                later,
+            )
+            domains.append((bucket, sorted(found[bucket_id])))
+            add_bucket_stats(stats, domains[-1], n_calls, time.time() - t_start)
+    return domains
+
+
+# Solver of the running parallel domain computation, loaded once per worker
+# process: (solver, strategy, first guard)
+domain_worker = None
+
+
+def init_domain_worker(formula, strategy, guard):
+    global domain_worker
+    domain_worker = (PysatSolver(bootstrap_with=formula), strategy, guard)
+
+
+# (bucket id, domain, solver calls, seconds) of one bucket on the solver of
+# the worker, `seen` is the simulation mask of the bucket for "simulation"
+def bucket_domain(bucket_id, lits, weights, seen):
+    solver, strategy, guard = domain_worker
+    t_start = time.time()
+    if strategy == "assumptions":
+        n_calls = 2 ** len(lits)
+        domain = [
+            i
+            for i in range(n_calls)
+            if solver.solve(assumptions=assumption_literals(lits.tolist(), i))
+        ]
+    elif strategy == "simulation":
+        n_calls = pruned_domain(solver, lits, weights, seen)
+        domain = np.flatnonzero(seen).tolist()
+    else:
+        found = set()
+        n_calls = allsat_domain(solver, lits, weights, guard + bucket_id, found)
+        domain = sorted(found)
+    return bucket_id, domain, n_calls, time.time() - t_start
+
+
+# Buckets are independent: every worker process loads `formula` into a
+# solver once and then takes the next bucket whenever it is idle. Domains
+# are exact, so they never depend on the number of workers or on which
+# worker got which bucket; solver call counts may, models are not shared
+# between buckets here.
+def calculate_domains_in_parallel(
+    g, formula, pool, buckets, strategy, workers, stats=None
+):
+    bucket_lits, weights = bucket_literals(pool, buckets)
+    seen = [None] * len(buckets)
+    if strategy == "simulation":
+        cg = CG.as_compact(g)
+        bucket_ids = [
+            [cg.node_id(gate_name) for gate_name in bucket] for bucket in buckets
+        ]
+        seen = simulated_domains(cg, bucket_ids, H.DOMAIN_SIMULATION_PATTERNS)
+
+    results = [None] * len(buckets)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_domain_worker,
+        initargs=(formula.flush(), strategy, first_guard(formula, bucket_lits)),
+    ) as executor:
+        futures = [
+            executor.submit(
+                bucket_domain,
+                bucket_id,
+                bucket_lits[bucket_id],
+                weights[bucket_id],
+                seen[bucket_id],
+            )
+            for bucket_id in range(len(buckets))
+        ]
+        for future in tqdm(
+            concurrent.futures.as_completed(futures),
+            total=len(futures),
+            desc="Calculating saturation for bucket",
+        ):
+            bucket_id, domain, n_calls, seconds = future.result()
+            results[bucket_id] = (domain, n_calls, seconds)
+
+    domains = list()
+    for bucket, (domain, n_calls, seconds) in zip(buckets, results):
+        domains.append((bucket, domain))
+        add_bucket_stats(stats, domains[-1], n_calls, seconds)
+    return domains
+
+
+DOMAIN_STRATEGIES = ["assumptions", "simulation", "allsat"]
+
+
+# Domains of `buckets` over `formula`, `strategy` is one of
+# DOMAIN_STRATEGIES (H.DOMAIN_STRATEGY by default): "assumptions" asks the
+# solver about every bitvector, "simulation" and "allsat" are the engines
+# above. With more than one of `workers` (H.DOMAIN_WORKERS by default)
+# buckets are spread over processes.
+def calculate_domains(
+    g, formula, pool, buckets, strategy=None, stats=None, workers=None
+):
+    if strategy is None:
+        strategy = H.DOMAIN_STRATEGY
+    if workers is None:
+        workers = H.DOMAIN_WORKERS
+    assert strategy in DOMAIN_STRATEGIES, f"Unknown domain strategy {strategy}"
+    if workers > 1 and len(buckets) > 1:
+        return calculate_domains_in_parallel(
+            g, formula, pool, buckets, strategy, workers, stats
+        )
+    if strategy == "assumptions":
+        return calculate_domains_with_solver(formula, pool, buckets, stats)
+    if strategy == "simulation":
+        return calculate_domains_with_simulation(
+            g, formula, pool, buckets, stats=stats
+        )
+    return calculate_domains_with_allsat(formula, pool, buckets, stats)
+
+
+# Calculates a list of tuples:
+# (saturation, bucket, domain, tag)
+# saturation - value (0-1]
+# bucket - list of node names, of which the bucket consists
+# domain - list of positive ints, every int is a bitvector of length len(bucket)
+# tag - either L or R for the left or right half of a miter schema, accordingly
+# With a `miter_instance.MiterInstance` its encoding of `g` is reused and
+# `start_from` is ignored. With a `stats` list, a record per bucket is
+# appended to it (see `add_bucket_stats`), tagged with `tag`.
+def calculate_domain_saturations(
+    g, buckets, tag, start_from, miter=None, stats=None
+):
+    print("Total buckets selected for {} schema: {}".format(tag, len(buckets)))
+
+    domains = list()
+
+    polarity = None
+    if miter is None:
+        pool = FB.NodePool(start_from=start_from)
+        # only bucket gates are ever assumed, nothing else needs clauses
+        gates = [gate for bucket in buckets for gate in bucket]
+        if H.GRAPH_ENCODING == "lut":
+            formula = LM.make_lut_formula(g, pool, gates, include_outputs=False)
+        else:
+            if H.POLARITY_AWARE_ENCODING:
+                polarity = PG.node_polarities(g, gates, False)
+                formula = FB.make_flat_formula(g, pool, polarity=polarity)
+            else:
+                formula = FR.make_fragment_formula(g, pool)
+    else:
+        formula, pool = miter.side_formula(tag)
+
+    shift = formula.n_vars if len(formula) > 0 else -1
+    if miter is None and (polarity is not None or H.GRAPH_ENCODING == "lut"):
+        # nodes without clauses may still own variables
+        shift = pool.n_vars
+
+    # bucket : [gate_name]
+    # domains : [(bucket, [bit_vector])]
+    bucket_stats = list()
+    if S.fits_exhaustive(g):
+        domains = calculate_exhaustive_domains(g, buckets, bucket_stats)
+    else:
+        domains = calculate_domains(g, formula, pool, buckets, stats=bucket_stats)
+    n_calls = sum(record["solver_calls"] for record in bucket_stats)
+    n_bitvectors = sum(2 ** len(bucket) for bucket in buckets)
+    print("Solver calls for domains: {} of {}".format(n_calls, n_bitvectors))
+    if stats is not None:
+        stats += [dict(record, tag=tag) for record in bucket_stats]
 
     # calculate saturation for each domain
     # domains : [(saturation, bucket, [bit_vector], tag)]
@@ -113,41 +540,7 @@ def calculate_domain_saturations(g, buckets, tag, start_from):
     return domains_with_saturation, shift
 
 
-def find_incompatible_nodes(g1, g2):
-    random.seed(42)
-    complete_input_size = range(2 ** g1.n_inputs)
-    random_sample = random.sample(
-        complete_input_size, min(len(complete_input_size), 10)
-    )
-
-    incompatible_pairs = list()
-    incompatible_pairs.append(list())
-    incompatible_pairs.append(list())
-    incompatible_pairs[0].append(set())
-    incompatible_pairs[0].append(set())
-    incompatible_pairs[1].append(set())
-    incompatible_pairs[1].append(set())
-
-    for i, input in enumerate(
-        tqdm(random_sample, desc="Random sampling unbalanced nodes")
-    ):
-        results_1 = g1.calculate_schema_on_inputs(input)
-        results_2 = g2.calculate_schema_on_inputs(input)
-
-        for name_1 in g1.node_names:
-            for name_2 in g2.node_names:
-                conj = [results_1[name_1], results_2[name_2]]
-
-                if conj == [False, False]:
-                    incompatible_pairs[0][0].add((name_1, name_2))
-                elif conj == [False, True]:
-                    incompatible_pairs[0][1].add((name_1, name_2))
-                elif conj == [True, False]:
-                    incompatible_pairs[1][0].add((name_1, name_2))
-                elif conj == [True, True]:
-                    incompatible_pairs[1][1].add((name_1, name_2))
-
-                # if results_1[name_1] != results_2[name_2]:
-                #     incompatible_pairs.add((name_1, name_2))
-
-    return incompatible_pairs
+# Value pairs of L and R gates never seen together on random patterns, see
+# `pair_compatibility`
+def find_incompatible_nodes(g1, g2, n_patterns=None):
+    return PC.find_pair_compatibility(g1, g2, n_patterns)
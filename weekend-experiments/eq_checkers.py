@@ -1,21 +1,27 @@
-import pysat
 import time
+import concurrent.futures
 
-from pycryptosat import Solver
 from pysat.solvers import Maplesat as PysatSolver
 
 
-import utils as U
+import cnf_writer as W
+import cones as C
+import miter_instance as MI
+import compact_graph as CG
 import formula_builder as FB
+import hyperparameters as H
+import simulation as S
 
 
-def validate_naively(g1, g2, metainfo=None, cnf_file=None):
-    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
-    final_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
+# Every `validate_*` takes an optional `miter_instance.MiterInstance` of
+# (g1, g2) to reuse, one is built otherwise.
+def validate_naively(g1, g2, metainfo=None, cnf_file=None, miter=None):
+    if miter is None:
+        miter = MI.MiterInstance(g1, g2)
     if cnf_file:
-        pysat.formula.CNF(from_clauses=final_cnf).to_file(cnf_file)
+        W.write_dimacs(miter.miter_cnf(), cnf_file)
 
-    with PysatSolver(bootstrap_with=final_cnf) as solver:
+    with miter.solver() as solver:
         print("Using pysat solver")
         t1 = time.time()
         result = solver.solve()
@@ -34,14 +40,14 @@ def validate_naively(g1, g2, metainfo=None, cnf_file=None):
     return not result
 
 
-def validate_naively_stairs(g1, g2, metainfo=None, cnf_file=None):
-    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
-    final_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2, mode="stairs")
+def validate_naively_stairs(g1, g2, metainfo=None, cnf_file=None, miter=None):
+    if miter is None:
+        miter = MI.MiterInstance(g1, g2)
+    final_cnf = miter.miter_cnf(mode="stairs")
     if cnf_file:
-        pysat.formula.CNF(from_clauses=final_cnf).to_file(cnf_file)
+        W.write_dimacs(final_cnf, cnf_file)
 
-    solver = Solver()
-    solver.add_clauses(final_cnf)
+    solver = miter.cryptosat_solver(mode="stairs")
 
     t1 = time.time()
     result, solution = solver.solve()
@@ -52,17 +58,34 @@ def validate_naively_stairs(g1, g2, metainfo=None, cnf_file=None):
     return not result
 
 
-def validate_with_open_xors(g1, g2, metainfo=None):
-    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
+# Output xors go to CryptoMiniSat as native xor constraints, no Tseitin
+# clauses for them
+def validate_with_native_xors(g1, g2, metainfo=None, miter=None):
+    if miter is None:
+        miter = MI.MiterInstance(g1, g2)
 
-    solver = Solver()
-    solver.add_clauses(shared_cnf)
+    solver = miter.cryptosat_solver(mode="xor-native")
+
+    t1 = time.time()
+    result, solution = solver.solve()
+    t2 = time.time()
+
+    if metainfo:
+        metainfo["solver_only_time_no_preparation"] = t2 - t1
+    return not result
+
+
+def validate_with_open_xors(g1, g2, metainfo=None, miter=None):
+    if miter is None:
+        miter = MI.MiterInstance(g1, g2)
+
+    solver = miter.cryptosat_solver(mode=None)
 
     assert g1.n_outputs == g2.n_outputs
     for output_id in range(g1.n_outputs):
-        output_name = f"o{output_id}"
-        output_var_1 = g1.output_var_to_cnf_var(output_name, pool)
-        output_var_2 = g2.output_var_to_cnf_var(output_name, pool)
+        output_var_1, output_var_2 = [
+            miter.solver_literal(lit, mode=None) for lit in miter.output_lits[output_id]
+        ]
 
         conj_table = list()
         one_xor_runtime = list()
@@ -87,3 +110,111 @@ def validate_with_open_xors(g1, g2, metainfo=None):
             return False
 
     return True
+
+
+# Compares output truth tables over every input, for schemas that fit
+# `H.EXHAUSTIVE_MEMORY_BUDGET`. No solver involved.
+def validate_exhaustively(g1, g2, metainfo=None):
+    assert g1.n_inputs == g2.n_inputs
+    assert g1.n_outputs == g2.n_outputs
+
+    t1 = time.time()
+    patterns = S.exhaustive_patterns(g1.n_inputs)
+    _, _, output_xors = S.simulate_miter(g1, g2, patterns)
+    differences = S.popcounts(output_xors)
+    t2 = time.time()
+
+    if metainfo is not None:
+        metainfo["exhaustive_simulation_time"] = t2 - t1
+        metainfo["differing_outputs"] = [
+            output_id for output_id, cnt in enumerate(differences) if cnt > 0
+        ]
+    return bool(differences.sum() == 0)
+
+
+# Graphs of the running cone check, set once per worker process
+sub_miter_graphs = None
+
+
+def init_sub_miter_worker(g1, g2):
+    global sub_miter_graphs
+    sub_miter_graphs = (g1, g2)
+
+
+def check_output_group(output_ids):
+    g1, g2 = sub_miter_graphs
+    pool = FB.NodePool()
+
+    t1 = time.time()
+    cnf = FB.generate_sub_miter(g1, g2, output_ids, pool)
+    t2 = time.time()
+    with PysatSolver(bootstrap_with=cnf) as solver:
+        result = solver.solve()
+    t3 = time.time()
+
+    return {
+        "outputs": output_ids,
+        "vars": pool.n_vars,
+        "clauses": len(cnf),
+        "encoding_time": t2 - t1,
+        "solving_time": t3 - t2,
+        "equivalent": not result,
+    }
+
+
+# Checks every group of outputs on its own sub-miter, built from the fan-in
+# cones of that group only. Groups are independent, so they are solved by
+# `workers` processes; the first non-equivalent group stops the check.
+def validate_by_output_cones(
+    g1, g2, metainfo=None, group_size=None, workers=None
+):
+    assert g1.n_inputs == g2.n_inputs
+    assert g1.n_outputs == g2.n_outputs
+    if group_size is None:
+        group_size = H.OUTPUTS_PER_SUB_MITER
+    if workers is None:
+        workers = H.SUB_MITER_WORKERS
+
+    cg1, cg2 = CG.as_compact(g1), CG.as_compact(g2)
+    groups = C.output_groups(g1.n_outputs, group_size)
+
+    records = list()
+    if workers == 1:
+        init_sub_miter_worker(cg1, cg2)
+        for output_ids in groups:
+            records.append(check_output_group(output_ids))
+            if not records[-1]["equivalent"]:
+                break
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_sub_miter_worker,
+            initargs=(cg1, cg2),
+        ) as executor:
+            futures = [
+                executor.submit(check_output_group, output_ids)
+                for output_ids in groups
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                records.append(future.result())
+                if not records[-1]["equivalent"]:
+                    for other in futures:
+                        other.cancel()
+                    break
+
+    equivalent = all(record["equivalent"] for record in records)
+    if equivalent:
+        print("All {} output groups equivalent".format(len(groups)))
+    else:
+        print("Non-equivalent outputs found")
+
+    if metainfo is not None:
+        records.sort(key=lambda record: record["outputs"])
+        metainfo["sub_miters"] = records
+        metainfo["solver_only_time_no_preparation"] = sum(
+            record["solving_time"] for record in records
+        )
+        metainfo["non_equivalent_outputs"] = [
+            record["outputs"] for record in records if not record["equivalent"]
+        ]
+    return equivalent
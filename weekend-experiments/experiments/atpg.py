@@ -12,7 +12,7 @@ current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
-from graph import Graph
+from graph_cache import load_graph
 import eq_checkers as EQ
 import formula_builder as FB
 import utils as U
@@ -33,8 +33,8 @@ def remove_and_clauses(g, pool, node, clauses):
 
 def generate_stuck_at_faults(experiment):
     aag_filename = f"./hard-instances/fraag/{experiment}"
-    g_left = Graph(aag_filename, "L")
-    g_right = Graph(aag_filename, "R")
+    g_left = load_graph(aag_filename, "L")
+    g_right = load_graph(aag_filename, "R")
 
     pool = FB.TPoolHolder()
     cnf_correct = FB.make_formula_from_my_graph(g_left, pool)
@@ -53,6 +53,7 @@ def generate_stuck_at_faults(experiment):
     difficult_negative = []
     redundant_gates = set()
     positives = 0
+    source_name_to_lit = g_right.source_name_to_lit
 
     for node in tqdm(g_right.node_names):
         if node.startswith("i") or node.startswith("v"):
@@ -73,7 +74,7 @@ def generate_stuck_at_faults(experiment):
                 if result is False:
                     redundant_gates.add(node)
 
-                aig_source_var_literal = g_right.source_name_to_lit[node]
+                aig_source_var_literal = source_name_to_lit[node]
                 result_tuple = (
                     t2 - t1,
                     aig_source_var_literal,
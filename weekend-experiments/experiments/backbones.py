@@ -8,7 +8,7 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 from formula_builder import TPoolHolder, make_formula_from_my_graph
-from graph import Graph
+from graph_cache import load_graph
 from pycryptosat import Solver
 
 
@@ -51,7 +51,7 @@ def backbones_experiment():
         for f in fnames:
             if f.endswith("aag"):
                 path = f"{dirpath}/{f}"
-                g = Graph(path, "L")
+                g = load_graph(path, "L")
                 # g.remove_identical()
                 find_backbones_in_graph(g)
 
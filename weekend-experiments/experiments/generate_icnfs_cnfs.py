@@ -8,17 +8,17 @@ current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
-from graph import Graph
+from graph_cache import load_graph
 from main import generate_inccnf
-from utils import prepare_shared_cnf_from_two_graphs
-from formula_builder import generate_miter_scheme
+from miter_instance import MiterInstance
+import cnf_writer as W
 import domain_preprocessing as DP
 import hyperparameters as H
 
 
 def generate_icnf(f1, f2, file_name):
-    g1 = Graph(f1, "L")
-    g2 = Graph(f2, "R")
+    g1 = load_graph(f1, "L")
+    g2 = load_graph(f2, "R")
 
     metainfo = dict()
 
@@ -28,28 +28,34 @@ def generate_icnf(f1, f2, file_name):
     t2 = time.time()
     metainfo["sampling_balancedness"] = t2 - t1
 
+    miter = MiterInstance(
+        g1,
+        g2,
+        assumption_gates=[
+            gate for bucket in buckets_left + buckets_right for gate in bucket
+        ],
+    )
+
     t1 = time.time()
     domains_info_left, shift = DP.calculate_domain_saturations(
-        g1, buckets_left, tag="L", start_from=1
+        g1, buckets_left, tag="L", start_from=1, miter=miter
     )
     domains_info_right, _ = DP.calculate_domain_saturations(
-        g2, buckets_right, tag="R", start_from=shift + 1
+        g2, buckets_right, tag="R", start_from=shift + 1, miter=miter
     )
     t2 = time.time()
     metainfo["calculating_saturation"] = t2 - t1
 
-    generate_inccnf(g1, g2, domains_info_left, domains_info_right, metainfo, file_name)
+    generate_inccnf(miter, domains_info_left, domains_info_right, metainfo, file_name)
 
 
 def generate_cnf(f1, f2, file_name):
-    g1 = Graph(f1, "L")
-    g2 = Graph(f2, "R")
-
-    shared_cnf, pool = prepare_shared_cnf_from_two_graphs(g1, g2)
+    g1 = load_graph(f1, "L")
+    g2 = load_graph(f2, "R")
 
-    miter_cnf = generate_miter_scheme(shared_cnf, pool, g1, g2, mode="or")
+    miter_cnf = MiterInstance(g1, g2).miter_cnf(mode="or")
 
-    pysat.formula.CNF(from_clauses=miter_cnf).to_file(file_name)
+    W.write_dimacs(miter_cnf, file_name)
 
 
 def generate_icnf_filename(type, test_size):
@@ -0,0 +1,78 @@
+import sys
+import os
+import time
+import json
+
+from pysat.solvers import Maplesat as PysatSolver
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import formula_builder as FB
+import graph_cache as GC
+import hyperparameters as H
+
+SORTS = ["Bubble", "Pancake", "Selection"]
+
+
+# Miters of every pair of sorting networks of the same size in `folder`
+def sorting_network_pairs(folder):
+    names = set(
+        fname
+        for fname in os.listdir(folder)
+        if fname.endswith(".aag") and "faulty" not in fname
+    )
+    pairs = list()
+    for fname in sorted(names):
+        for left_sort_id, left_sort in enumerate(SORTS):
+            if not fname.startswith(f"{left_sort}Sort_"):
+                continue
+            suffix = fname[len(f"{left_sort}Sort_") :]
+            for right_sort in SORTS[left_sort_id + 1 :]:
+                right_fname = f"{right_sort}Sort_{suffix}"
+                if right_fname in names:
+                    pairs.append(
+                        (os.path.join(folder, fname), os.path.join(folder, right_fname))
+                    )
+    return pairs
+
+
+def benchmark_miter(g1, g2, fold_inverters):
+    pool = FB.NodePool(fold_inverters=fold_inverters)
+
+    t1 = time.time()
+    shared_cnf = FB.make_flat_miter_from_two_graphs(g1, g2, pool)
+    final_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
+    t2 = time.time()
+    with PysatSolver(bootstrap_with=final_cnf) as solver:
+        t3 = time.time()
+        result = solver.solve()
+        t4 = time.time()
+
+    prefix = "folded" if fold_inverters else "plain"
+    return {
+        f"{prefix}_vars": pool.n_vars,
+        f"{prefix}_clauses": len(final_cnf),
+        f"{prefix}_encoding_time": t2 - t1,
+        f"{prefix}_solving_time": t4 - t3,
+        f"{prefix}_sat": result,
+    }
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./hard-instances/fraag"
+    for left_file, right_file in sorting_network_pairs(folder):
+        g1 = GC.load_graph(left_file, "L", strash=H.STRASH_SCHEMAS)
+        g2 = GC.load_graph(right_file, "R", strash=H.STRASH_SCHEMAS)
+
+        info = dict()
+        info["left_schema"] = left_file
+        info["right_schema"] = right_file
+        info.update(benchmark_miter(g1, g2, fold_inverters=False))
+        info.update(benchmark_miter(g1, g2, fold_inverters=True))
+        print(json.dumps(info))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import json
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from inverter_folding_benchmark import sorting_network_pairs
+import graph_cache as GC
+import hyperparameters as H
+import miter_instance as MI
+import utils as U
+
+# Seconds per solver call
+TIME_LIMIT = 3600
+
+# LUT sizes compared against the gate-by-gate encoding
+LUT_SIZES = [4, 5, 6]
+
+
+def benchmark_miter(g1, g2, encoding, lut_size):
+    H.LUT_SIZE = lut_size
+    t1 = time.time()
+    miter = MI.MiterInstance(g1, g2, encoding=encoding)
+    cnf = miter.cnf("or")
+    t2 = time.time()
+    with miter.solver("or") as solver:
+        t3 = time.time()
+        sat = U.solve_with_timeout(solver, [], TIME_LIMIT)
+        t4 = time.time()
+
+    return {
+        "encoding": encoding,
+        "lut_size": lut_size if encoding == "lut" else None,
+        "vars": miter.pool.n_vars,
+        "clauses": len(cnf),
+        "literals": len(cnf.flush().lits),
+        "encoding_time": t2 - t1,
+        "solving_time": t4 - t3,
+        "result": "timeout" if sat is None else ("sat" if sat else "unsat"),
+    }
+
+
+# One JSON record per (miter, encoding) line, appended to `results_file`
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./hard-instances/fraag"
+    results_file = (
+        sys.argv[2] if len(sys.argv) > 2 else "./experiments/lut_encoding.jsonl"
+    )
+    default_lut_size = H.LUT_SIZE
+    for left_file, right_file in sorting_network_pairs(folder):
+        g1 = GC.load_graph(left_file, "L", strash=H.STRASH_SCHEMAS)
+        g2 = GC.load_graph(right_file, "R", strash=H.STRASH_SCHEMAS)
+
+        runs = [("tseitin", default_lut_size)]
+        runs += [("lut", lut_size) for lut_size in LUT_SIZES]
+        for encoding, lut_size in runs:
+            record = {"left_schema": left_file, "right_schema": right_file}
+            record.update(benchmark_miter(g1, g2, encoding, lut_size))
+            print(json.dumps(record))
+            U.print_to_file(results_file, json.dumps(record))
+    H.LUT_SIZE = default_lut_size
+
+
+if __name__ == "__main__":
+    main()
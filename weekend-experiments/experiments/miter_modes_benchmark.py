@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+import json
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from inverter_folding_benchmark import sorting_network_pairs
+import graph_cache as GC
+import hyperparameters as H
+import miter_instance as MI
+import utils as U
+
+# Seconds per solver call
+TIME_LIMIT = 3600
+
+# (mode, solver) pairs compared on every miter, Maplesat has no xor
+# constraints
+RUNS = [
+    ("or", "maplesat"),
+    ("stairs", "maplesat"),
+    ("or", "cryptominisat"),
+    ("stairs", "cryptominisat"),
+    ("xor-native", "cryptominisat"),
+]
+
+
+def outcome(sat):
+    if sat is None:
+        return "timeout"
+    return "sat" if sat else "unsat"
+
+
+def solve(miter, mode, solver_name):
+    t1 = time.time()
+    if solver_name == "maplesat":
+        with miter.solver(mode) as solver:
+            t2 = time.time()
+            sat = U.solve_with_timeout(solver, [], TIME_LIMIT)
+            t3 = time.time()
+    else:
+        solver = miter.cryptosat_solver(mode, time_limit=TIME_LIMIT)
+        t2 = time.time()
+        sat, _ = solver.solve()
+        t3 = time.time()
+    return outcome(sat), t2 - t1, t3 - t2
+
+
+def benchmark_pair(left_file, right_file):
+    g1 = GC.load_graph(left_file, "L", strash=H.STRASH_SCHEMAS)
+    g2 = GC.load_graph(right_file, "R", strash=H.STRASH_SCHEMAS)
+
+    t1 = time.time()
+    miter = MI.MiterInstance(g1, g2)
+    encoding_time = time.time() - t1
+
+    records = list()
+    for mode, solver_name in RUNS:
+        result, loading_time, solving_time = solve(miter, mode, solver_name)
+        if mode == "xor-native":
+            n_clauses = len(miter.cnf(mode)) + 1
+            n_xors = len(miter.native_xor_miter()[0])
+        else:
+            n_clauses = len(miter.cnf(mode))
+            n_xors = 0
+
+        records.append(
+            {
+                "left_schema": left_file,
+                "right_schema": right_file,
+                "mode": mode,
+                "solver": solver_name,
+                "fold_inverters": miter.pool.fold_inverters,
+                "vars": miter.pool.n_vars,
+                "clauses": n_clauses,
+                "xor_constraints": n_xors,
+                "encoding_time": encoding_time,
+                "loading_time": loading_time,
+                "solving_time": solving_time,
+                "result": result,
+            }
+        )
+    return records
+
+
+# One JSON record per (miter, mode, solver) line, appended to `results_file`
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./hard-instances/fraag"
+    results_file = (
+        sys.argv[2] if len(sys.argv) > 2 else "./experiments/miter_modes.jsonl"
+    )
+    for left_file, right_file in sorting_network_pairs(folder):
+        for record in benchmark_pair(left_file, right_file):
+            print(json.dumps(record))
+            U.print_to_file(results_file, json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import sys
+import os
+import time
+import json
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from aig_parser import Parser
+
+REPEATS = 3
+
+
+def time_parse(filename):
+    runtimes = list()
+    for _ in range(REPEATS):
+        t1 = time.time()
+        Parser().parse(filename)
+        t2 = time.time()
+        runtimes.append(t2 - t1)
+    return min(runtimes)
+
+
+# Compares parse time of `x.aag` against `x.aig` for every pair found in
+# `folder`. Binary files are produced by `scripts/aag_to_aig.sh`.
+def benchmark_folder(folder):
+    results = list()
+    for fname in sorted(os.listdir(folder)):
+        if not fname.endswith(".aag"):
+            continue
+        ascii_file = os.path.join(folder, fname)
+        binary_file = ascii_file[: -len(".aag")] + ".aig"
+        if not os.path.exists(binary_file):
+            continue
+
+        ascii_time = time_parse(ascii_file)
+        binary_time = time_parse(binary_file)
+        results.append(
+            {
+                "name": fname[: -len(".aag")],
+                "ascii_size": os.path.getsize(ascii_file),
+                "binary_size": os.path.getsize(binary_file),
+                "ascii_parse_time": ascii_time,
+                "binary_parse_time": binary_time,
+            }
+        )
+        print(json.dumps(results[-1]))
+
+    return results
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./hard-instances"
+    benchmark_folder(folder)
+
+
+if __name__ == "__main__":
+    main()
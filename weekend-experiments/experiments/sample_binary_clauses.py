@@ -4,6 +4,7 @@ from tqdm import tqdm
 import json
 import time
 import pysat
+import numpy as np
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
@@ -18,9 +19,10 @@ from formula_builder import (
 
 from graph import Graph
 
-from pysat.solvers import Maplesat as Cadical
+from pysat.solvers import Maplesat as PysatSolver
 from pycryptosat import Solver
 
+import compact_graph as CG
 import utils as U
 import eq_checkers as EQ
 import domain_preprocessing as DP
@@ -28,31 +30,42 @@ import domain_preprocessing as DP
 
 def extract_info(cnf, pool, g1, g2, metainfo, test_shortname):
 
+    # only value pairs never seen together in simulation can give a clause,
+    # every other pair is satisfiable
     incompatible = DP.find_incompatible_nodes(g1, g2)
+    cg1 = CG.as_compact(g1)
+    cg2 = CG.as_compact(g2)
 
     learnt_clauses = []
 
     with PysatSolver(bootstrap_with=cnf) as solver:
-        for name_1 in tqdm(g1.node_names):
-            for name_2 in g2.node_names:
-
-                for bit_1 in [-1, 1]:
-                    for bit_2 in [-1, 1]:
-
-                        if (name_1, name_2) in incompatible[bit_1][bit_2]:
-                            continue
-
-                        cnf_var_1 = bit_1 * pool.v_to_id(name_1)
-                        cnf_var_2 = bit_2 * pool.v_to_id(name_2)
-
-                        assumptions = [cnf_var_1, cnf_var_2]
-                        would_be_learned = [-cnf_var_1, -cnf_var_2]
-
-                        # t1 = time.time()
-                        res = U.solve_with_timeout(solver, assumptions, 1)
-                        # t2 = time.time()
-                        if not res:
-                            learnt_clauses.append(would_be_learned)
+        for bit_1 in [0, 1]:
+            for bit_2 in [0, 1]:
+                # gates constant in simulation are candidates with every
+                # gate of the other side
+                left_ids, right_ids = [
+                    np.concatenate(ids)
+                    for ids in zip(
+                        incompatible.pairs(bit_1, bit_2),
+                        incompatible.constant_pairs(bit_1, bit_2),
+                    )
+                ]
+                for id_1, id_2 in tqdm(
+                    zip(left_ids.tolist(), right_ids.tolist()), total=len(left_ids)
+                ):
+                    sign_1 = 1 if bit_1 else -1
+                    sign_2 = 1 if bit_2 else -1
+                    cnf_var_1 = sign_1 * pool.v_to_id(cg1.node_name(id_1))
+                    cnf_var_2 = sign_2 * pool.v_to_id(cg2.node_name(id_2))
+
+                    assumptions = [cnf_var_1, cnf_var_2]
+                    would_be_learned = [-cnf_var_1, -cnf_var_2]
+
+                    # t1 = time.time()
+                    res = U.solve_with_timeout(solver, assumptions, 1)
+                    # t2 = time.time()
+                    if not res:
+                        learnt_clauses.append(would_be_learned)
 
     pysat.formula.CNF(from_clauses=cnf).to_file(
         f"./experiments/sample_binary_clauses/{test_shortname}.cnf"
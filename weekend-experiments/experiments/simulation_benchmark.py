@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import json
+import random
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+import compact_graph as CG
+import simulation as S
+import hyperparameters as H
+
+# The old loop is only timed on a slice of the sample and extrapolated,
+# otherwise big schemas take forever.
+SINGLE_INPUT_SLICE = 200
+
+
+def time_single_input_loop(g, sample):
+    sample = sample[:SINGLE_INPUT_SLICE]
+    t1 = time.time()
+    for input in sample:
+        g.calculate_schema_on_inputs(input)
+    t2 = time.time()
+    return (t2 - t1) / len(sample)
+
+
+def time_packed(g, sample):
+    t1 = time.time()
+    S.count_true_on_inputs(g, sample)
+    t2 = time.time()
+    return t2 - t1
+
+
+def benchmark_file(filename, sample_sizes):
+    g = Graph(filename, "L")
+    CG.as_compact(g)
+
+    info = dict()
+    info["name"] = filename
+    info["nodes"] = len(g.node_names)
+
+    per_input = None
+    for sample_size in sample_sizes:
+        random.seed(42)
+        sample = S.sample_inputs(g.n_inputs, sample_size)
+        sample_size = len(sample)
+        if per_input is None:
+            per_input = time_single_input_loop(g, sample)
+
+        packed_time = time_packed(g, sample)
+        info[f"single_input_{sample_size}"] = per_input * sample_size
+        info[f"packed_{sample_size}"] = packed_time
+        info[f"speedup_{sample_size}"] = per_input * sample_size / packed_time
+
+    return info
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./hard-instances/fraag"
+    sample_sizes = [H.RANDOM_SAMPLE_SIZE, 100000, 1000000]
+    for fname in sorted(os.listdir(folder)):
+        if fname.endswith(".aag") or fname.endswith(".aig"):
+            info = benchmark_file(os.path.join(folder, fname), sample_sizes)
+            print(json.dumps(info))
+
+
+if __name__ == "__main__":
+    main()
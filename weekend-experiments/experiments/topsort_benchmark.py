@@ -0,0 +1,86 @@
+import sys
+import os
+import copy
+import time
+import json
+
+from collections import defaultdict
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+import graph as G
+from aig_parser import Parser
+
+
+# The quadratic topsort `Graph` used before the Kahn sort, kept verbatim
+# to have something to compare against.
+def legacy_make_topsort(lit_parents, lit_children, lit_inputs, *args):
+    topsort = list()
+
+    visited = set()
+    children_visited = defaultdict(int)
+    q = copy.deepcopy(lit_inputs)
+
+    while len(q) > 0:
+        v = q.pop(0)
+        visited.add(v)
+        topsort.append(v)
+        for to in lit_parents[v]:
+            children_visited[to] += 1
+            if to in visited:
+                continue
+            if children_visited[to] < len(lit_children[to]):
+                continue
+            q.append(to)
+
+    return topsort
+
+
+def time_it(f):
+    t1 = time.time()
+    f()
+    t2 = time.time()
+    return t2 - t1
+
+
+def benchmark_file(filename):
+    parser = Parser()
+    lit_parents, lit_children, lit_inputs, lit_outputs = parser.parse(filename)
+
+    info = dict()
+    info["name"] = filename
+    info["ands"] = sum(len(children) == 2 for children in lit_children.values())
+    info["topsort_legacy"] = time_it(
+        lambda: legacy_make_topsort(lit_parents, lit_children, lit_inputs)
+    )
+    info["topsort_kahn"] = time_it(
+        lambda: G.make_topsort_kahn(lit_parents, lit_children, lit_inputs)
+    )
+    # gate names come from the order, it has to stay the same
+    info["same_order"] = legacy_make_topsort(
+        lit_parents, lit_children, lit_inputs
+    ) == G.make_topsort_kahn(lit_parents, lit_children, lit_inputs)
+
+    info["graph_construction_after"] = time_it(lambda: G.Graph(filename, "L"))
+
+    current_make_topsort = G.make_topsort
+    G.make_topsort = legacy_make_topsort
+    try:
+        info["graph_construction_before"] = time_it(lambda: G.Graph(filename, "L"))
+    finally:
+        G.make_topsort = current_make_topsort
+
+    return info
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./hard-instances/fraag"
+    for fname in sorted(os.listdir(folder)):
+        if fname.endswith(".aag") or fname.endswith(".aig"):
+            print(json.dumps(benchmark_file(os.path.join(folder, fname))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import json
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from inverter_folding_benchmark import sorting_network_pairs
+import formula_builder as FB
+import graph_cache as GC
+import hyperparameters as H
+import miter_instance as MI
+import utils as U
+import variable_order as VO
+
+# Seconds per solver call
+TIME_LIMIT = 3600
+
+
+def benchmark_miter(g1, g2, order):
+    t1 = time.time()
+    miter = MI.MiterInstance(g1, g2, FB.NodePool(order=order))
+    cnf = miter.cnf("or")
+    t2 = time.time()
+    with miter.solver("or") as solver:
+        t3 = time.time()
+        sat = U.solve_with_timeout(solver, [], TIME_LIMIT)
+        t4 = time.time()
+
+    return {
+        "order": order,
+        "vars": miter.pool.n_vars,
+        "clauses": len(cnf),
+        # mean distance between the variables of a clause, what the
+        # orders try to shrink
+        "mean_clause_span": clause_span(cnf),
+        "encoding_time": t2 - t1,
+        "solving_time": t4 - t3,
+        "result": "timeout" if sat is None else ("sat" if sat else "unsat"),
+    }
+
+
+def clause_span(cnf):
+    cnf.flush()
+    spans = [
+        max(abs(lit) for lit in clause) - min(abs(lit) for lit in clause)
+        for clause in cnf.clauses()
+    ]
+    return sum(spans) / max(1, len(spans))
+
+
+# One JSON record per (miter, order) line, appended to `results_file`
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./hard-instances/fraag"
+    results_file = (
+        sys.argv[2] if len(sys.argv) > 2 else "./experiments/variable_order.jsonl"
+    )
+    for left_file, right_file in sorting_network_pairs(folder):
+        g1 = GC.load_graph(left_file, "L", strash=H.STRASH_SCHEMAS)
+        g2 = GC.load_graph(right_file, "R", strash=H.STRASH_SCHEMAS)
+        for order in VO.ORDERS:
+            record = {"left_schema": left_file, "right_schema": right_file}
+            record.update(benchmark_miter(g1, g2, order))
+            print(json.dumps(record))
+            U.print_to_file(results_file, json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
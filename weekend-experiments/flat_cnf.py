@@ -0,0 +1,103 @@
+import numpy as np
+
+# Clauses stored flat: literals of all clauses back to back in one int32
+# array, clause `k` is `lits[offsets[k]:offsets[k + 1]]`.
+#
+# Iterating yields plain lists, so a flat CNF goes anywhere a list of
+# clauses did (`bootstrap_with=`, `pysat.formula.CNF(from_clauses=...)`).
+# A few clauses appended one by one (miter xors) are kept aside and merged
+# into the arrays on first bulk access.
+
+
+class FlatCNF:
+    def __init__(self, lits=None, offsets=None):
+        if lits is None:
+            lits = np.empty(0, dtype=np.int32)
+            offsets = np.zeros(1, dtype=np.int64)
+        self.lits = lits
+        self.offsets = offsets
+        self.pending = list()
+
+    @classmethod
+    def from_clauses(cls, clauses):
+        clauses = [list(clause) for clause in clauses]
+        lengths = [len(clause) for clause in clauses]
+        offsets = np.zeros(len(clauses) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        lits = np.fromiter(
+            (lit for clause in clauses for lit in clause),
+            dtype=np.int32,
+            count=int(offsets[-1]),
+        )
+        return cls(lits, offsets)
+
+    @classmethod
+    def concatenate(cls, parts):
+        parts = [part.flush() for part in parts]
+        if len(parts) == 0:
+            return cls()
+        lits = np.concatenate([part.lits for part in parts])
+        shifts = np.cumsum([0] + [len(part.lits) for part in parts[:-1]])
+        offsets = np.concatenate(
+            [np.zeros(1, dtype=np.int64)]
+            + [part.offsets[1:] + shift for part, shift in zip(parts, shifts)]
+        )
+        return cls(lits, offsets)
+
+    def append(self, clause):
+        self.pending.append(list(clause))
+
+    def extend(self, clauses):
+        for clause in clauses:
+            self.append(clause)
+
+    def flush(self):
+        if len(self.pending) > 0:
+            tail = FlatCNF.from_clauses(self.pending)
+            self.pending = list()
+            merged = FlatCNF.concatenate([self, tail])
+            self.lits, self.offsets = merged.lits, merged.offsets
+        return self
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.pending)
+
+    def __iter__(self):
+        self.flush()
+        lits = self.lits.tolist()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield lits[start:end]
+
+    def clauses(self):
+        return list(self)
+
+    @property
+    def n_vars(self):
+        self.flush()
+        if len(self.lits) == 0:
+            return 0
+        return int(np.abs(self.lits).max())
+
+    # DIMACS body layout: every clause terminated by a zero
+    def zero_separated(self):
+        self.flush()
+        n_clauses = len(self.offsets) - 1
+        lengths = np.diff(self.offsets)
+        out = np.zeros(len(self.lits) + n_clauses, dtype=np.int32)
+        out[np.arange(len(self.lits)) + np.repeat(np.arange(n_clauses), lengths)] = (
+            self.lits
+        )
+        return out
+
+    # One bulk call for CryptoMiniSat, which takes a zero separated buffer;
+    # pysat solvers have no bulk entry point and get the clauses one by one.
+    # An empty clause vanishes in a zero separated buffer, so it is added on
+    # its own.
+    def add_to_solver(self, solver):
+        if hasattr(solver, "add_clauses"):
+            solver.add_clauses(self.zero_separated())
+            if np.any(np.diff(self.offsets) == 0):
+                solver.add_clause([])
+        else:
+            solver.append_formula(self)
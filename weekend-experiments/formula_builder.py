@@ -1,6 +1,14 @@
+import numpy as np
 import pysat
 from pysat.solvers import Minisat22
 
+import compact_graph as CG
+import cones as C
+import flat_cnf as F
+import hyperparameters as H
+import polarity as PG
+import variable_order as VO
+
 
 class TPoolHolder():
     def __init__(self, start_from=1):
@@ -33,6 +41,162 @@ class PicklablePool:
         return self.id_to_v_dict[id]
 
 
+# Pool for the flat encoder. Variables are assigned per graph in bulk, not
+# per name: inputs (shared by all graphs) get one contiguous block, then the
+# gates of every added graph get the next block, in node id order unless
+# `order` says otherwise (see `variable_order`). Names are only parsed when
+# someone asks for them, e.g. to build assumptions. Any other name (`xor_3`)
+# gets a fresh variable on first use, like in `PicklablePool`.
+#
+# With `fold_inverters` an inverter gets no variable and no clauses, its name
+# maps to the negated literal of its child. Everything that turns names into
+# literals (miter outputs, bucket assumptions) goes through `v_to_id`, so it
+# keeps working unchanged, `v_to_id` just may return a negative literal.
+class NodePool:
+    def __init__(self, start_from=1, fold_inverters=None, order=None):
+        if fold_inverters is None:
+            fold_inverters = H.FOLD_INVERTERS
+        if order is None:
+            order = H.VARIABLE_ORDER
+        self.fold_inverters = fold_inverters
+        self.order = order
+        self.next_var = start_from
+        self.input_vars = None
+        # tag -> (compact graph, literal of every node, 0 if not encoded)
+        self.graphs = dict()
+        # (first var, compact graphs, graph index, node id) for every block
+        # of gate vars, one entry of the arrays per var
+        self.blocks = list()
+        self.extra_v_to_id = dict()
+        self.extra_id_to_v = dict()
+
+    @property
+    def n_vars(self):
+        return self.next_var - 1
+
+    # `node_ids` restricts the variables to a subset of nodes, e.g. a cone
+    def add_graph(self, g, node_ids=None):
+        return self.add_graphs([g], [node_ids])[0]
+
+    # Graphs added together share one block of gate vars, numbered in
+    # `self.order` (see `variable_order`), so e.g. both sides of a miter
+    # can be interleaved; `node_ids` has an entry (or None) per graph
+    def add_graphs(self, graphs, node_ids=None):
+        cgs = [CG.as_compact(g) for g in graphs]
+        node_ids = [None] * len(cgs) if node_ids is None else list(node_ids)
+        # a tag that is already taken keeps its variables
+        new = list()
+        tags = set(self.graphs)
+        for k, cg in enumerate(cgs):
+            if cg.tag not in tags:
+                new.append(k)
+                tags.add(cg.tag)
+        new_cgs = [cgs[k] for k in new]
+
+        all_gate_ids = list()
+        for k in new:
+            cg = cgs[k]
+            if self.input_vars is None:
+                self.input_vars = self.next_var + np.arange(
+                    cg.n_inputs, dtype=np.int64
+                )
+                self.next_var += cg.n_inputs
+            assert len(self.input_vars) == cg.n_inputs
+
+            ids = node_ids[k]
+            if ids is None:
+                ids = np.arange(cg.n_nodes)
+            ids = np.asarray(ids, dtype=np.int64)
+            node_ids[k] = ids
+            with_var = cg.node_type[ids] != CG.INPUT
+            if self.fold_inverters:
+                with_var &= cg.node_type[ids] != CG.NOT
+            all_gate_ids.append(ids[with_var])
+
+        if len(new) > 0:
+            graph_index, gate_ids = VO.order_gates(new_cgs, all_gate_ids, self.order)
+            block_vars = self.next_var + np.arange(len(gate_ids))
+            self.blocks.append((self.next_var, new_cgs, graph_index, gate_ids))
+            self.next_var += len(gate_ids)
+
+        for position, k in enumerate(new):
+            cg = cgs[k]
+            input_ids = cg.node_ids(CG.INPUT)
+            node_vars = np.zeros(cg.n_nodes, dtype=np.int64)
+            node_vars[input_ids] = self.input_vars[cg.type_index[input_ids]]
+            own = graph_index == position
+            node_vars[gate_ids[own]] = block_vars[own]
+            if self.fold_inverters:
+                fold_inverter_literals(cg, node_vars, node_ids[k])
+            self.graphs[cg.tag] = (cg, node_vars)
+
+        return [self.graphs[cg.tag][1] for cg in cgs]
+
+    # Takes the variables of a precomputed `cnf_fragment.Fragment` of `g`
+    # instead of numbering its nodes, returns the fragment's clauses over them
+    def add_fragment(self, g, fragment):
+        cg = CG.as_compact(g)
+        assert cg.tag not in self.graphs, f"{cg.tag} is already encoded"
+        if self.input_vars is None:
+            self.input_vars = self.next_var + np.arange(cg.n_inputs, dtype=np.int64)
+            self.next_var += cg.n_inputs
+        assert len(self.input_vars) == fragment.n_inputs
+
+        cnf, node_vars = fragment.place(self.input_vars, self.next_var)
+        graph_index = np.zeros(fragment.n_gates, dtype=np.int64)
+        self.blocks.append((self.next_var, [cg], graph_index, fragment.gate_ids))
+        self.next_var += fragment.n_gates
+        self.graphs[cg.tag] = (cg, node_vars)
+        return cnf
+
+    def node_var(self, name):
+        if name[0] == "v" and name[1:].isdigit():
+            return int(self.input_vars[int(name[1:])])
+        if name[0] not in CG.PREFIX_TYPES:
+            return None
+        for tag, (cg, node_vars) in self.graphs.items():
+            if name.endswith(tag) and name[1 : len(name) - len(tag)].isdigit():
+                var = int(node_vars[cg.node_id(name)])
+                assert var != 0, f"{name} is not encoded"
+                return var
+        return None
+
+    def v_to_id(self, name):
+        if name in self.extra_v_to_id:
+            return self.extra_v_to_id[name]
+        var = self.node_var(name)
+        if var is None:
+            var = self.next_var
+            self.next_var += 1
+            self.extra_v_to_id[name] = var
+            self.extra_id_to_v[var] = name
+        return var
+
+    def id_to_v(self, id):
+        if id in self.extra_id_to_v:
+            return self.extra_id_to_v[id]
+        first_input = int(self.input_vars[0])
+        if first_input <= id < first_input + len(self.input_vars):
+            return f"v{id - first_input}"
+        for first_var, cgs, graph_index, gate_ids in self.blocks:
+            if first_var <= id < first_var + len(gate_ids):
+                cg = cgs[graph_index[id - first_var]]
+                return cg.node_name(gate_ids[id - first_var])
+        assert False, f"Unknown variable {id}"
+
+
+# Inverters take the negated literal of their child, one pass per level of
+# inverter chains (strashed and parsed graphs have none)
+def fold_inverter_literals(cg, node_lits, node_ids):
+    not_ids = node_ids[cg.node_type[node_ids] == CG.NOT]
+    not_children = cg.fanin[cg.fanin_offsets[not_ids]]
+    while True:
+        not_lits = -node_lits[not_children]
+        if np.array_equal(node_lits[not_ids], not_lits):
+            break
+        node_lits[not_ids] = not_lits
+
+
 def skip_nots(g, node):
     modifier = 1
     while node.startswith("i"):
@@ -79,7 +243,14 @@ def encode_output_not(formula, v, child, pool):
     ])
 
 
+def encode_const(formula, v, pool):
+    formula.append([-1 * pool.v_to_id(v)])
+
+
 def process_node(formula, g, name, pool):
+    if name.startswith('c'):
+        encode_const(formula, name, pool)
+
     if name.startswith('i'):
         child = g.children[name][0]
         encode_output_not(formula, name, child, pool)
@@ -89,22 +260,162 @@ def process_node(formula, g, name, pool):
         encode_and(formula, name, l, r, g, pool)
 
 
-def make_formula_from_my_graph(g, pool):
-    formula = pysat.formula.CNF(comment_lead='c')
+# Same clauses as `process_node` over all nodes, but walks the CSR arrays of a
+# `CompactGraph`. Each node name is built and looked up in the pool once,
+# on first touch, so variable numbering matches the name-based path.
+# `node_ids` restricts the encoding to a subset closed under children, e.g. a
+# fan-in cone from `cones`, in topological order.
+def encode_compact_graph(formula, g, pool, node_ids=None):
+    node_vars = [0] * g.n_nodes
+    node_type = g.node_type.tolist()
+    fanin = g.fanin.tolist()
+    offsets = g.fanin_offsets.tolist()
+
+    def var(node_id):
+        if node_vars[node_id] == 0:
+            node_vars[node_id] = pool.v_to_id(g.node_name(node_id))
+        return node_vars[node_id]
+
+    if node_ids is None:
+        node_ids = range(g.n_nodes)
+    else:
+        node_ids = node_ids.tolist()
+
+    for node_id in node_ids:
+        t = node_type[node_id]
+        if t == CG.CONST:
+            formula.append([-1 * var(node_id)])
+        elif t == CG.NOT:
+            v = var(node_id)
+            child = var(fanin[offsets[node_id]])
+            formula.append([-1 * v, -1 * child])
+            formula.append([v, child])
+        elif t == CG.AND:
+            l_lit = var(fanin[offsets[node_id]])
+            r_lit = var(fanin[offsets[node_id] + 1])
+            and_lit = var(node_id)
+            formula.append([l_lit, -1 * and_lit])
+            formula.append([r_lit, -1 * and_lit])
+            formula.append([-1 * l_lit, -1 * r_lit, and_lit])
+
+
+def encode_graph(formula, g, pool):
+    if isinstance(g, CG.CompactGraph):
+        encode_compact_graph(formula, g, pool)
+        return
 
     for name in g.node_names:
         process_node(formula, g, name, pool)
 
+
+# Clause block of every node type, in the same order `process_node` emits
+# them, as templates over (node, first child, second child) variables: a
+# list of (source, sign), sources 0, 1, 2, the clause lengths, and the
+# polarity of the node each clause is needed for (see `polarity`). Built on
+# call, `compact_graph` may still be importing when this module is loaded.
+def clause_templates():
+    return {
+        CG.NOT: (
+            [(0, -1), (1, -1), (0, 1), (1, 1)],
+            [2, 2],
+            [PG.POSITIVE, PG.NEGATIVE],
+        ),
+        CG.AND: (
+            [(1, 1), (0, -1), (2, 1), (0, -1), (1, -1), (2, -1), (0, 1)],
+            [2, 2, 3],
+            [PG.POSITIVE, PG.POSITIVE, PG.NEGATIVE],
+        ),
+        CG.CONST: ([(0, -1)], [1], [PG.BOTH]),
+    }
+
+
+# Same clauses as `encode_compact_graph` with `node_vars` from a `NodePool`,
+# built with array operations only: per node type the clause block is one
+# template filled in for all nodes of the type at once, and scattered to
+# the positions of the nodes, so the order is still the topological one.
+# With `polarity` (from `polarity.node_polarities`) only the clauses of the
+# directions a node is needed in are kept, Plaisted-Greenbaum style.
+def encode_flat(cg, node_vars, node_ids=None, fold_inverters=False, polarity=None):
+    if node_ids is None:
+        node_ids = np.arange(cg.n_nodes)
+    types = cg.node_type[node_ids]
+    templates = clause_templates()
+    if fold_inverters:
+        # literals of inverters already carry the sign, nothing to encode
+        del templates[CG.NOT]
+
+    # inputs have no clauses
+    n_lits = np.zeros(len(node_ids), dtype=np.int64)
+    n_clauses = np.zeros(len(node_ids), dtype=np.int64)
+    for t, (template, clause_lengths, _) in templates.items():
+        n_lits[types == t] = len(template)
+        n_clauses[types == t] = len(clause_lengths)
+    lit_starts = np.cumsum(n_lits) - n_lits
+    clause_starts = np.cumsum(n_clauses) - n_clauses
+
+    lits = np.empty(int(n_lits.sum()), dtype=np.int32)
+    lengths = np.empty(int(n_clauses.sum()), dtype=np.int64)
+    needed = np.empty(int(n_clauses.sum()), dtype=bool)
+
+    for t, (template, clause_lengths, clause_polarities) in templates.items():
+        selected = types == t
+        if not np.any(selected):
+            continue
+        ids = node_ids[selected]
+        first_child = cg.fanin_offsets[ids]
+        sources = [node_vars[ids]]
+        n_children = 0 if t == CG.CONST else t
+        for child_id in range(n_children):
+            sources.append(node_vars[cg.fanin[first_child + child_id]])
+
+        block = np.stack([sign * sources[source] for source, sign in template], axis=1)
+        lits[lit_starts[selected][:, None] + np.arange(len(template))] = block
+
+        clause_positions = clause_starts[selected][:, None] + np.arange(
+            len(clause_lengths)
+        )
+        lengths[clause_positions] = clause_lengths
+        if polarity is not None:
+            needed[clause_positions] = (
+                polarity[ids][:, None] & np.array(clause_polarities, dtype=np.uint8)
+            ) != 0
+
+    if polarity is not None:
+        lits = lits[np.repeat(needed, lengths)]
+        lengths = lengths[needed]
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return F.FlatCNF(lits, offsets)
+
+
+def make_flat_formula(g, pool, node_ids=None, polarity=None):
+    cg = CG.as_compact(g)
+    node_vars = pool.add_graph(cg, node_ids)
+    return encode_flat(cg, node_vars, node_ids, pool.fold_inverters, polarity)
+
+
+# Flat counterpart of `make_united_miter_from_two_graphs`, `pool` is a
+# `NodePool`
+def make_flat_miter_from_two_graphs(g1, g2, pool):
+    return F.FlatCNF.concatenate(
+        [make_flat_formula(g1, pool), make_flat_formula(g2, pool)]
+    )
+
+
+def make_formula_from_my_graph(g, pool):
+    formula = pysat.formula.CNF(comment_lead='c')
+    encode_graph(formula, g, pool)
     return formula
 
 
-def make_united_miter_from_two_graphs(g1, g2, pool=TPoolHolder()):
+def make_united_miter_from_two_graphs(g1, g2, pool=None):
+    if pool is None:
+        pool = TPoolHolder()
     formula = pysat.formula.CNF()
 
-    for node_name in g1.node_names:
-        process_node(formula, g1, node_name, pool)
-    for node_name in g2.node_names:
-        process_node(formula, g2, node_name, pool)
+    encode_graph(formula, g1, pool)
+    encode_graph(formula, g2, pool)
 
     return formula
 
@@ -114,8 +425,15 @@ def generate_miter_without_xor(shared_cnf, pool, g1, g2):
     return shared_cnf
 
 
-def append_xor_to_miter(shared_cnf, pool, g1, g2, mode):
-    for output_id in range(g1.n_outputs):
+# With `polarity_aware` the xor and stairs gates only get the clauses that
+# let them become true: the miter asks for them to be true, never false.
+def append_xor_to_miter(
+    shared_cnf, pool, g1, g2, mode, output_ids=None, polarity_aware=False
+):
+    if output_ids is None:
+        output_ids = range(g1.n_outputs)
+
+    for output_id in output_ids:
         # Add clause for output xor gate
         xor_gate = pool.v_to_id(f"xor_{output_id}")
         output_code_name = f"o{output_id}"
@@ -126,19 +444,20 @@ def append_xor_to_miter(shared_cnf, pool, g1, g2, mode):
         # xorgate <=> left xor right
         shared_cnf.append([-1 * left_output, -1 * right_output, -1 * xor_gate])
         shared_cnf.append([left_output, right_output, -1 * xor_gate])
-        shared_cnf.append([left_output, -1 * right_output, xor_gate])
-        shared_cnf.append([-1 * left_output, right_output, xor_gate])
+        if not polarity_aware:
+            shared_cnf.append([left_output, -1 * right_output, xor_gate])
+            shared_cnf.append([-1 * left_output, right_output, xor_gate])
 
     if mode == "or":
         # OR together all new xor_ variables
         lst = []
-        for output_id in range(g1.n_outputs):
+        for output_id in output_ids:
             lst.append(pool.v_to_id(f"xor_{output_id}"))
         shared_cnf.append(lst)
     elif mode == "stairs":
         # construct a ladder-like structure from OR's
-        a = "xor_0"
-        for output_id in range(1, g1.n_outputs):
+        a = f"xor_{output_ids[0]}"
+        for output_id in output_ids[1:]:
             c = f"stairs_or_{output_id}"
             b = f"xor_{output_id}"
 
@@ -147,8 +466,9 @@ def append_xor_to_miter(shared_cnf, pool, g1, g2, mode):
             c_var = pool.v_to_id(c)
 
             shared_cnf.append([a_var, b_var, -1 * c_var])
-            shared_cnf.append([-1 * a_var, c_var])
-            shared_cnf.append([-1 * b_var, c_var])
+            if not polarity_aware:
+                shared_cnf.append([-1 * a_var, c_var])
+                shared_cnf.append([-1 * b_var, c_var])
 
             a = c
 
@@ -159,6 +479,55 @@ def append_xor_to_miter(shared_cnf, pool, g1, g2, mode):
     return shared_cnf
 
 
+# Output xors for CryptoMiniSat's native xor constraints, "xor-native" mode.
+# Returns [(vars, rhs)] for `Solver.add_xor_clause`, every entry says
+# xor_k = left_k ^ right_k, plus the clause that asks for some xor_k to be
+# true. Negative output literals (folded inverters) flip the rhs.
+def make_native_xor_miter(pool, g1, g2, output_ids=None):
+    if output_ids is None:
+        output_ids = range(g1.n_outputs)
+
+    xor_constraints = list()
+    or_clause = list()
+    for output_id in output_ids:
+        xor_gate = pool.v_to_id(f"xor_{output_id}")
+        output_code_name = f"o{output_id}"
+        left_output = g1.output_var_to_cnf_var(output_code_name, pool)
+        right_output = g2.output_var_to_cnf_var(output_code_name, pool)
+
+        # left ^ right ^ xor_gate = 0
+        rhs = (left_output < 0) != (right_output < 0)
+        xor_constraints.append(([abs(left_output), abs(right_output), xor_gate], rhs))
+        or_clause.append(xor_gate)
+
+    return xor_constraints, or_clause
+
+
+# Returns a new formula of the same kind as `shared_cnf` (`FlatCNF`, pysat
+# `CNF` or a list of clauses), `shared_cnf` is left as it was, so it can be
+# reused with another mode
 def generate_miter_scheme(shared_cnf, pool, g1, g2, mode="or"):
     generate_miter_without_xor(shared_cnf, pool, g1, g2)
-    return append_xor_to_miter(shared_cnf, pool, g1, g2, mode)
+    xor_cnf = append_xor_to_miter(F.FlatCNF(), pool, g1, g2, mode)
+    if isinstance(shared_cnf, F.FlatCNF):
+        return F.FlatCNF.concatenate([shared_cnf, xor_cnf])
+    clauses = list(shared_cnf) + xor_cnf.clauses()
+    if isinstance(shared_cnf, pysat.formula.CNF):
+        return pysat.formula.CNF(from_clauses=clauses)
+    return clauses
+
+
+# Miter over a group of outputs only: both graphs contribute just the fan-in
+# cones of these outputs, everything else never reaches the formula.
+# `pool` is a fresh `NodePool`, only cone nodes get variables.
+def generate_sub_miter(g1, g2, output_ids, pool, mode="or"):
+    assert g1.n_inputs == g2.n_inputs
+    cg1, cg2 = CG.as_compact(g1), CG.as_compact(g2)
+
+    formula = F.FlatCNF.concatenate(
+        [
+            make_flat_formula(cg1, pool, C.output_cone_ids(cg1, output_ids)),
+            make_flat_formula(cg2, pool, C.output_cone_ids(cg2, output_ids)),
+        ]
+    )
+    return append_xor_to_miter(formula, pool, cg1, cg2, mode, output_ids)
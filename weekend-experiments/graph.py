@@ -1,9 +1,46 @@
-import copy
 import aiger
 
-from collections import defaultdict
+from collections import defaultdict, deque
 import utils as U
 import aig_parser as P
+import aig_writer as W
+
+
+# O(V + E) Kahn's algorithm. Visits nodes in the same breadth-first order as
+# the original quadratic sort, so gates keep their `a*`/`i*` names and dumps,
+# cube files and learnt clauses that refer to gates by name stay valid.
+def make_topsort_kahn(lit_parents, lit_children, lit_inputs):
+    topsort = list()
+
+    children_left = dict()
+    q = deque(lit_inputs)
+
+    while len(q) > 0:
+        v = q.popleft()
+        topsort.append(v)
+        for to in lit_parents[v]:
+            left = children_left.get(to, len(lit_children[to])) - 1
+            children_left[to] = left
+            if left == 0:
+                q.append(to)
+
+    return topsort
+
+
+# Inputs, then the constant if anything refers to it (after constant
+# propagation only outputs can)
+def topsort_sources(lit_parents, lit_inputs, lit_outputs):
+    sources = list(lit_inputs)
+    if P.CONST_LIT in lit_parents or (
+        lit_outputs is not None and P.CONST_LIT in lit_outputs
+    ):
+        sources.append(P.CONST_LIT)
+    return sources
+
+
+def make_topsort(lit_parents, lit_children, lit_inputs, lit_outputs=None):
+    sources = topsort_sources(lit_parents, lit_inputs, lit_outputs)
+    return make_topsort_kahn(lit_parents, lit_children, sources)
 
 
 class Graph:
@@ -18,9 +55,10 @@ class Graph:
                 if int(latches) > 0:
                     raise ValueError
 
-        lit_parents, lit_children, lit_inputs, lit_outputs = P.Parser().parse(filename)
+        parser = P.Parser()
+        lit_parents, lit_children, lit_inputs, lit_outputs = parser.parse(filename)
 
-        topsort = self.make_topsort(lit_parents, lit_children, lit_inputs)
+        topsort = self.make_topsort(lit_parents, lit_children, lit_inputs, lit_outputs)
 
         self.children = defaultdict(list)
         self.parents = defaultdict(list)
@@ -47,31 +85,52 @@ class Graph:
 
         self.name = filename
 
+        # Array-backed twin, built on demand by `compact_graph.as_compact`
+        self.compact_graph = None
+
+    # Rebuilds the name-based structures from a `CompactGraph` (same node
+    # order, same names) without parsing or sorting anything.
+    @classmethod
+    def from_compact(cls, cg):
+        g = cls.__new__(cls)
+        g.children = defaultdict(list)
+        g.parents = defaultdict(list)
+        g.node_names = cg.node_names
+        g.tag = cg.tag
+        g.name = cg.name
+        g.n_inputs = cg.n_inputs
+        g.n_outputs = cg.n_outputs
+
+        for node_id, name in enumerate(g.node_names):
+            for child in cg.children_of(node_id).tolist():
+                g.add_edge(g.node_names[child], name)
+
+        g.node_to_depth = dict(zip(g.node_names, cg.depth.tolist()))
+        g.node_to_level = dict(zip(g.node_names, cg.level.tolist()))
+
+        g.source_name_to_lit = dict()
+        g.source_lit_to_name = dict()
+        if cg.source_lits is not None:
+            for name, lit in zip(g.node_names, cg.source_lits.tolist()):
+                g.source_name_to_lit[name] = lit
+                g.source_lit_to_name[lit] = name
+
+        g.output_name_to_node_name = dict()
+        g.output_node_names = set()
+        for output_id, node_id in enumerate(cg.outputs.tolist()):
+            g.output_name_to_node_name[f"o{output_id}"] = g.node_names[node_id]
+            g.output_node_names.add(g.node_names[node_id])
+
+        g.compact_graph = cg
+        return g
+
     def shortname(self):
         if "/" not in self.name:
             return self.name
         return self.name.split("/")[-1]
 
-    def make_topsort(self, lit_parents, lit_children, lit_inputs):
-        topsort = list()
-
-        visited = set()
-        children_visited = defaultdict(int)
-        q = copy.deepcopy(lit_inputs)
-
-        while len(q) > 0:
-            v = q.pop(0)
-            visited.add(v)
-            topsort.append(v)
-            for to in lit_parents[v]:
-                children_visited[to] += 1
-                if to in visited:
-                    continue
-                if children_visited[to] < len(lit_children[to]):
-                    continue
-                q.append(to)
-
-        return topsort
+    def make_topsort(self, lit_parents, lit_children, lit_inputs, lit_outputs=None):
+        return make_topsort(lit_parents, lit_children, lit_inputs, lit_outputs)
 
     def add_edge(self, child, parent):
         self.children[parent].append(child)
@@ -81,6 +140,7 @@ class Graph:
         last_inv = 0
         last_inp = 0
         last_and = 0
+        last_const = 0
 
         lit_to_name = dict()
         name_to_lit = dict()
@@ -89,8 +149,14 @@ class Graph:
 
         for lit in topsort:
             le = len(lit_children[lit])
+            # Constant false, only present when some output is tied to a constant
+            if lit == P.CONST_LIT:
+                name = f"c{last_const}{self.tag}"
+                self.node_to_depth[name] = 0
+                self.node_to_level[name] = 0
+                last_const += 1
             # Zero children mean simple input
-            if le == 0:
+            elif le == 0:
                 name = f"v{last_inp}"
                 self.node_to_depth[name] = 0
                 self.node_to_level[name] = 0
@@ -149,7 +215,9 @@ class Graph:
             result[name] = ith_input_var
 
         for name in self.node_names:
-            if name.startswith("i"):
+            if name.startswith("c"):
+                result[name] = False
+            elif name.startswith("i"):
                 child = self.children[name][0]
                 assert child in result
                 result[name] = not result[child]
@@ -165,49 +233,9 @@ class Graph:
 
         return result
 
-    def to_file(self, filename):
-        # No longer works because of self.name_to_lit absence
-        a = len(list(filter(lambda p: p.startswith("a"), self.node_names)))
-        m = a + self.n_inputs
-
-        name_to_lit = dict()
-
-        header = f"aag {m} {self.n_inputs} 0 {self.n_outputs} {a}\n"
-
-        input_lines = list()
-        first_free_lit = 2
-
-        for input_id in range(self.n_inputs):
-            input_lit = first_free_lit
-            input_lines.append(f"{input_lit}\n")
-            name_to_lit[f"v{input_id}"] = first_free_lit
-            first_free_lit += 2
-
-        and_lines = list()
-        for name in self.node_names:
-            if name.startswith("a"):
-                left_name, right_name = self.children[name]
-                and_lit = first_free_lit
-                left_child_lit = name_to_lit[left_name]
-                right_child_lit = name_to_lit[right_name]
-                name_to_lit[name] = and_lit
-                and_lines.append(f"{and_lit} {left_child_lit} {right_child_lit}\n")
-                first_free_lit += 2
-            elif name.startswith("i"):
-                child = self.children[name][0]
-                assert name_to_lit[child] % 2 == 0
-                name_to_lit[name] = name_to_lit[child] + 1
-
-        output_lines = list()
-        for output_id in range(self.n_outputs):
-            output_lit = name_to_lit[self.output_name_to_node_name[f"o{output_id}"]]
-            output_lines.append(f"{output_lit}\n")
-
-        with open(filename, "w") as f:
-            f.write(header)
-            f.writelines(input_lines)
-            f.writelines(output_lines)
-            f.writelines(and_lines)
+    # ASCII or binary AIGER depending on the extension, see `aig_writer`
+    def to_file(self, filename, **kwargs):
+        W.write_aiger(self, filename, **kwargs)
 
     def replace_node_with_other_node(self, to_replace, with_what, to_replace_set):
         to_replace_set.add(to_replace)
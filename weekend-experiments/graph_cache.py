@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import compact_graph as CG
+import strash as ST
+
+# On-disk cache of compiled graphs.
+#
+# An entry is a folder `<sha256 of the source file>_<tag>` with one `.npy`
+# file per `CompactGraph` array and a `meta.json`. Arrays are loaded memory
+# mapped, so a cache hit costs a few `open` calls and no parsing or topsort.
+# The key is the content hash, so an edited source file simply misses.
+# Strashed graphs are stored under their own key, next to the raw ones.
+
+# Relative to the working directory, like `hard-instances`
+CACHE_DIR = "./graph_cache"
+
+# Bump when the layout of a compact graph or what the parser produces changes
+CACHE_VERSION = 4
+
+ARRAYS = [
+    "node_type",
+    "type_index",
+    "fanin_offsets",
+    "fanin",
+    "outputs",
+    "source_lits",
+    "fanout_offsets",
+    "fanout",
+    "depth",
+    "level",
+]
+
+
+def file_hash(filename):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def entry_dir(filename, tag, cache_dir, strash=False):
+    suffix = "_strash" if strash else ""
+    return os.path.join(cache_dir, f"{file_hash(filename)}_{tag}{suffix}")
+
+
+# Folder of `.npy` files plus `meta.json`, written next to the final place
+# and renamed, so concurrent runs never observe a half-written entry
+def save_arrays(arrays, meta, path):
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_path = tempfile.mkdtemp(dir=cache_dir)
+    for array_name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{array_name}.npy"), array)
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # somebody else stored the same entry first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+# (arrays memory mapped, meta) of a `save_arrays` folder, None if missing
+# or written with another `version`
+def load_arrays(path, array_names, version):
+    meta_file = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file, "r") as f:
+        meta = json.load(f)
+    if meta["version"] != version:
+        return None
+    arrays = {
+        array_name: np.load(os.path.join(path, f"{array_name}.npy"), mmap_mode="r")
+        for array_name in array_names
+    }
+    return arrays, meta
+
+
+def save_entry(cg, path):
+    arrays = {array_name: getattr(cg, array_name) for array_name in ARRAYS}
+    save_arrays(arrays, {"version": CACHE_VERSION, "tag": cg.tag}, path)
+
+
+def load_entry(path, filename):
+    loaded = load_arrays(path, ARRAYS, CACHE_VERSION)
+    if loaded is None:
+        return None
+    arrays, meta = loaded
+    return CG.CompactGraph(meta["tag"], filename, **arrays)
+
+
+def load_compact_graph(filename, tag, cache_dir=None, strash=False):
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+
+    path = entry_dir(filename, tag, cache_dir, strash)
+    cg = load_entry(path, filename)
+    if cg is None:
+        cg = CG.CompactGraph.from_file(filename, tag)
+        if strash:
+            cg, _ = ST.strash(cg)
+        if os.path.exists(path):
+            shutil.rmtree(path, ignore_errors=True)
+        save_entry(cg, path)
+    return cg
+
+
+# Drop-in replacement for `Graph(filename, tag)` in entry points. The compact
+# graph is returned as is, it mirrors the `Graph` interface, so no string-keyed
+# structures are ever built for it.
+def load_graph(filename, tag, cache_dir=None, strash=False):
+    return load_compact_graph(filename, tag, cache_dir, strash)
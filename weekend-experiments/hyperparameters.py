@@ -3,10 +3,83 @@
 # How disbalanced a gate is allowed to be to enter any of the bucket
 DISBALANCE_THRESHOLD = 0.04
 
-# This one is best left between 10 and 15, 2 ^ BUCKET_SIZE tasks are solved
+# This one is best left between 10 and 15 with the "assumptions" domain
+# strategy, which solves 2 ^ BUCKET_SIZE tasks; "allsat" costs one solver
+# call per bitvector of the domain and handles bigger buckets
 BUCKET_SIZE = 10
 
+# How unbalanced gates are grouped into buckets: "sorted" slices them in
+# order of saturation, "correlated" groups gates whose joint values on
+# BUCKET_SIGNATURE_PATTERNS random patterns are few (see
+# `domain_preprocessing.correlated_buckets`), picking every gate among the
+# next BUCKET_CANDIDATES ones.
+BUCKET_FORMATION = "sorted"
+BUCKET_SIGNATURE_PATTERNS = 1024
+BUCKET_CANDIDATES = 40
+
 BUCKETS_FROM_LEFT = 1
 BUCKETS_FROM_RIGHT = 1
 
 RANDOM_SAMPLE_SIZE = 5000
+
+# Schemas whose truth tables (one bit per node per input assignment) fit
+# into this many bytes are processed exhaustively: exact saturations and
+# domains, no sampling and no SAT calls. Set to 0 to always sample.
+EXHAUSTIVE_MEMORY_BUDGET = 1 << 30
+# Let `main.domain_equivalence_check` answer with a truth table comparison
+# when both schemas fit the budget above, skipping domains and baskets
+# altogether (the metainfo `type` is then "exhaustive").
+EXHAUSTIVE_VERDICT = False
+
+# Random patterns simulated before domains are computed with a solver:
+# every bucket bitvector seen in simulation needs no SAT call.
+DOMAIN_SIMULATION_PATTERNS = 1 << 14
+
+# How bucket domains are computed when a schema is too big for truth
+# tables, one of `domain_preprocessing.DOMAIN_STRATEGIES`
+DOMAIN_STRATEGY = "simulation"
+# Worker processes computing bucket domains, every one keeps its own
+# loaded solver (1 computes them in the current process)
+DOMAIN_WORKERS = 1
+
+# Structurally hash schemas right after loading: merges identical gates and
+# drops double inverters and dangling logic before anything is encoded.
+# Gates are renumbered, so dumps, cube files and learnt clauses that refer
+# to gates by name only match runs with the same setting.
+STRASH_SCHEMAS = False
+
+# Cone-of-influence mode (`eq_checkers.validate_by_output_cones`): how many
+# consecutive outputs go into one sub-miter, and how many worker processes
+# solve sub-miters in parallel (1 solves them in the current process).
+OUTPUTS_PER_SUB_MITER = 1
+SUB_MITER_WORKERS = 4
+
+# Flat encoder (`formula_builder.NodePool`): give inverters no variables of
+# their own, fanouts and miter outputs use the negated literal of the
+# inverter's child instead.
+FOLD_INVERTERS = False
+
+# Plaisted-Greenbaum style encoding (see `polarity`): emit only the
+# implications the miter or the bucket assumptions can use.
+POLARITY_AWARE_ENCODING = False
+
+# How graphs are encoded: "tseitin" gives every gate a variable, "lut"
+# covers the graph with LUT_SIZE-input LUTs (see `lut_mapping`) and gives
+# variables to LUT roots, outputs and bucket gates only. CUTS_PER_NODE cuts
+# are kept per node while mapping.
+GRAPH_ENCODING = "tseitin"
+LUT_SIZE = 4
+CUTS_PER_NODE = 6
+
+# Preprocess every formula a `miter_instance.MiterInstance` hands to solvers
+# (see `cnf_simplifier`), bucket gates and outputs stay frozen.
+SIMPLIFY_CNF = False
+
+# Numbering of gate variables in a `formula_builder.NodePool`, one of
+# `variable_order.ORDERS`. Both sides of a miter are numbered together, so
+# "interleaved" and "paired" put related left and right gates side by side.
+VARIABLE_ORDER = "topological"
+
+# Store the encoding of every graph on disk next to the graph cache (see
+# `cnf_fragment`); fragments are always reused within a process.
+CACHE_FRAGMENTS = False
@@ -0,0 +1,327 @@
+from functools import lru_cache
+
+import numpy as np
+
+import compact_graph as CG
+import cones as C
+import flat_cnf as F
+import hyperparameters as H
+
+# Cut-based encoding: the graph is covered with k-input LUTs and every LUT
+# is encoded as a whole, so only LUT roots (and inputs) get variables.
+#
+# Cuts are enumerated bottom up one depth layer at a time, with array
+# operations over the whole layer (priority cuts: every node keeps its
+# trivial cut plus the `cuts_per_node - 1` cheapest ones by area flow).
+# Required nodes (outputs, bucket gates) must keep a variable, so parents
+# only see their trivial cut. Inverters are never leaves unless required,
+# a parent sees the cuts of the inverter's child instead, which absorbs
+# every inverter into the LUT above it.
+#
+# The cover is picked top down from the required nodes, the best cut of
+# every covered node adds its leaves to the cover. A LUT is encoded as
+# `root <-> f(leaves)` with prime irredundant covers of the on-set and the
+# off-set of `f`, clause templates are cached per truth table.
+
+
+# Cuts of every node: `cuts[n, c]` are the sorted leaves of cut `c`, padded
+# with `cg.n_nodes`, slot 0 is the trivial cut `[n]`
+def enumerate_cuts(cg, required, k, cuts_per_node):
+    pad = cg.n_nodes
+    cuts = np.full((cg.n_nodes, cuts_per_node, k), pad, dtype=np.int32)
+    n_cuts = np.ones(cg.n_nodes, dtype=np.int64)
+    # area flow of the best cut, plus a zero for the padding
+    flow = np.zeros(cg.n_nodes + 1, dtype=np.float64)
+    fanout = np.maximum(np.diff(cg.fanout_offsets), 1)
+
+    cuts[:, 0, 0] = np.arange(cg.n_nodes)
+    consts = cg.node_ids(CG.CONST)
+    cuts[consts, 1] = pad
+    n_cuts[consts] = 2
+
+    # cuts a parent may merge, slots [first_usable, last_usable)
+    first_usable = ((cg.node_type == CG.NOT) & ~required).astype(np.int64)
+    last_usable = np.where(required, 1, n_cuts)
+
+    order = np.argsort(cg.depth, kind="stable")
+    layer_ends = np.flatnonzero(np.diff(cg.depth[order]) != 0) + 1
+    for layer in np.split(order, layer_ends):
+        types = cg.node_type[layer]
+        layer = layer[(types == CG.AND) | (types == CG.NOT)]
+        if len(layer) == 0:
+            continue
+
+        nodes, leaves = layer_candidates(cg, cuts, first_usable, last_usable, layer)
+        n_leaves = np.count_nonzero(leaves != pad, axis=1)
+        fits = n_leaves <= k
+        nodes, leaves, n_leaves = nodes[fits], leaves[fits, :k], n_leaves[fits]
+        cost = flow[leaves].sum(axis=1)
+
+        # same leaves from different pairs
+        by_leaves = np.lexsort(np.vstack([leaves.T, nodes]))
+        same = np.zeros(len(nodes), dtype=bool)
+        same[1:] = np.all(leaves[by_leaves[1:]] == leaves[by_leaves[:-1]], axis=1) & (
+            nodes[by_leaves[1:]] == nodes[by_leaves[:-1]]
+        )
+        unique = by_leaves[~same]
+        nodes, leaves, n_leaves, cost = (
+            nodes[unique],
+            leaves[unique],
+            n_leaves[unique],
+            cost[unique],
+        )
+
+        # cheapest first, smaller cuts on ties
+        ranked = np.lexsort((n_leaves, cost, nodes))
+        nodes, leaves, cost = nodes[ranked], leaves[ranked], cost[ranked]
+        group_starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(nodes)])
+        rank = np.arange(len(nodes)) - np.repeat(group_starts, group_sizes)
+        kept = rank < cuts_per_node - 1
+
+        cuts[nodes[kept], 1 + rank[kept]] = leaves[kept]
+        n_cuts[nodes[group_starts]] = 1 + np.minimum(group_sizes, cuts_per_node - 1)
+        flow[nodes[group_starts]] = (1 + cost[group_starts]) / fanout[
+            nodes[group_starts]
+        ]
+        last_usable[layer] = np.where(required[layer], 1, n_cuts[layer])
+
+    return cuts, n_cuts
+
+
+# Candidate cuts of the gates in `layer`: usable cuts of the child of an
+# inverter, merged pairs of usable cuts of both children of an and gate.
+# Rows of leaves are sorted and deduplicated, and may hold more than `k`.
+def layer_candidates(cg, cuts, first_usable, last_usable, layer):
+    pad = cg.n_nodes
+    starts = cg.fanin_offsets[layer]
+    is_and = cg.node_type[layer] == CG.AND
+    left = cg.fanin[starts]
+    right = np.where(is_and, cg.fanin[np.where(is_and, starts + 1, starts)], -1)
+
+    n_left = last_usable[left] - first_usable[left]
+    n_right = np.where(is_and, last_usable[right] - first_usable[right], 1)
+    n_pairs = n_left * n_right
+
+    nodes = np.repeat(layer, n_pairs)
+    # pair `p` of a node is left cut `p // n_right`, right cut `p % n_right`
+    pair_starts = np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+    pair = np.arange(int(n_pairs.sum())) - pair_starts
+    rep_right = np.repeat(n_right, n_pairs)
+    left_slots = np.repeat(first_usable[left], n_pairs) + pair // rep_right
+    left_cuts = cuts[np.repeat(left, n_pairs), left_slots]
+
+    with_right = np.repeat(is_and, n_pairs)
+    right_nodes = np.repeat(right, n_pairs)[with_right]
+    right_slots = (
+        np.repeat(first_usable[np.maximum(right, 0)], n_pairs)[with_right]
+        + (pair % rep_right)[with_right]
+    )
+    right_cuts = np.full(left_cuts.shape, pad, dtype=np.int32)
+    right_cuts[with_right] = cuts[right_nodes, right_slots]
+
+    leaves = np.sort(np.concatenate([left_cuts, right_cuts], axis=1), axis=1)
+    repeated = np.zeros(leaves.shape, dtype=bool)
+    repeated[:, 1:] = leaves[:, 1:] == leaves[:, :-1]
+    leaves[repeated] = pad
+    return nodes, np.sort(leaves, axis=1)
+
+
+# Roots of the cover and the leaves of their LUTs (padded with `n_nodes`).
+# With `fold_inverters` required inverters are replaced by their children.
+def map_luts(
+    g,
+    roots=(),
+    include_outputs=True,
+    k=None,
+    cuts_per_node=None,
+    fold_inverters=False,
+):
+    if k is None:
+        k = H.LUT_SIZE
+    if cuts_per_node is None:
+        cuts_per_node = H.CUTS_PER_NODE
+    cg = CG.as_compact(g)
+    required = required_nodes(cg, roots, include_outputs, fold_inverters)
+    cuts, _ = enumerate_cuts(cg, required, k, cuts_per_node)
+
+    in_cover = required.copy()
+    order = np.argsort(cg.depth, kind="stable")[::-1]
+    layer_ends = np.flatnonzero(np.diff(cg.depth[order]) != 0) + 1
+    for layer in np.split(order, layer_ends):
+        layer = layer[in_cover[layer] & (cg.node_type[layer] != CG.INPUT)]
+        leaves = cuts[layer, 1].reshape(-1)
+        in_cover[leaves[leaves != cg.n_nodes]] = True
+
+    lut_roots = np.flatnonzero(in_cover & (cg.node_type != CG.INPUT))
+    return lut_roots, cuts[lut_roots, 1]
+
+
+def required_nodes(cg, roots, include_outputs, fold_inverters):
+    required = np.zeros(cg.n_nodes, dtype=bool)
+    required[C.to_node_ids(cg, roots)] = True
+    if include_outputs:
+        required[cg.outputs] = True
+    # a folded inverter is its child's negated literal, the child is the root
+    while fold_inverters:
+        folded = np.flatnonzero(required & (cg.node_type == CG.NOT))
+        if len(folded) == 0:
+            break
+        required[folded] = False
+        required[cg.fanin[cg.fanin_offsets[folded]]] = True
+    return required
+
+
+# Truth table of `root` over `leaves` as an int, bit `p` is the value on the
+# assignment where leaf `i` is bit `i` of `p`. Takes the arrays of a compact
+# graph as lists, it runs once per LUT.
+def lut_truth_table(node_type, fanin, fanin_offsets, root, leaves):
+    full = (1 << (1 << len(leaves))) - 1
+    values = dict(zip(leaves, leaf_tables(len(leaves))))
+
+    def value(node_id):
+        if node_id not in values:
+            t = node_type[node_id]
+            first = fanin_offsets[node_id]
+            if t == CG.CONST:
+                values[node_id] = 0
+            elif t == CG.NOT:
+                values[node_id] = full ^ value(fanin[first])
+            else:
+                values[node_id] = value(fanin[first]) & value(fanin[first + 1])
+        return values[node_id]
+
+    return value(root)
+
+
+@lru_cache(maxsize=None)
+def leaf_tables(m):
+    n_patterns = 1 << m
+    return [
+        sum(1 << p for p in range(n_patterns) if p >> i & 1) for i in range(m)
+    ]
+
+
+# Cubes (fixed bits mask, values) of a prime irredundant cover of the
+# on-set of `tt` over `m` variables
+def prime_cover(m, tt):
+    n_patterns = 1 << m
+    full_mask = (1 << m) - 1
+    cubes = {(full_mask, p) for p in range(n_patterns) if tt >> p & 1}
+    primes = set()
+    while len(cubes) > 0:
+        merged = set()
+        used = set()
+        for mask, value in cubes:
+            for i in range(m):
+                bit = 1 << i
+                if mask & bit and not value & bit and (mask, value | bit) in cubes:
+                    merged.add((mask & ~bit, value))
+                    used.add((mask, value))
+                    used.add((mask, value | bit))
+        primes |= cubes - used
+        cubes = merged
+
+    def minterms(cube):
+        mask, value = cube
+        return sum(1 << p for p in range(n_patterns) if (p & mask) == value)
+
+    # greedy cover, then drop primes the others already cover
+    covered = {cube: minterms(cube) for cube in primes}
+    chosen = list()
+    rest = tt
+    while rest:
+        best = max(
+            sorted(primes), key=lambda cube: bin(covered[cube] & rest).count("1")
+        )
+        chosen.append(best)
+        rest &= ~covered[best]
+    for cube in list(reversed(chosen)):
+        others = [other for other in chosen if other != cube]
+        if sum_cover(covered, others) & tt == tt:
+            chosen = others
+    return chosen
+
+
+def sum_cover(covered, cubes):
+    total = 0
+    for cube in cubes:
+        total |= covered[cube]
+    return total
+
+
+# Clause template of `root <-> f(leaves)` over sources 0 (root) and
+# 1..m (leaves), as a list of (source, sign) plus the clause lengths
+@lru_cache(maxsize=None)
+def lut_clause_template(m, tt):
+    full = (1 << (1 << m)) - 1
+    template = list()
+    lengths = list()
+    for root_sign, on_set in [(-1, full ^ tt), (1, tt)]:
+        # every cube of the set forces the root, clause is its negation
+        for mask, value in prime_cover(m, on_set):
+            template.append((0, root_sign))
+            for i in range(m):
+                if mask >> i & 1:
+                    template.append((i + 1, -1 if value >> i & 1 else 1))
+            lengths.append(1 + bin(mask).count("1"))
+    return template, lengths
+
+
+# (LUT roots, LUT leaves, nodes that need a variable), see `map_luts`
+def lut_cover(g, roots=(), include_outputs=True, k=None, fold_inverters=False):
+    cg = CG.as_compact(g)
+    lut_roots, lut_leaves = map_luts(
+        cg, roots, include_outputs, k, fold_inverters=fold_inverters
+    )
+
+    # required inverters keep a literal: a LUT of their own, or the negated
+    # literal of their child when the pool folds inverters
+    required = required_nodes(cg, roots, include_outputs, False)
+    node_ids = np.unique(
+        np.concatenate(
+            [
+                cg.node_ids(CG.INPUT),
+                lut_roots,
+                np.flatnonzero(required & (cg.node_type == CG.NOT)),
+            ]
+        )
+    )
+    return lut_roots, lut_leaves, node_ids
+
+
+# `cover` is a precomputed `lut_cover`, e.g. one whose nodes were already
+# added to `pool` together with another graph
+def make_lut_formula(g, pool, roots=(), include_outputs=True, k=None, cover=None):
+    cg = CG.as_compact(g)
+    if cover is None:
+        cover = lut_cover(cg, roots, include_outputs, k, pool.fold_inverters)
+    lut_roots, lut_leaves, node_ids = cover
+    node_lits = np.append(pool.add_graph(cg, node_ids), 0)
+
+    node_type = cg.node_type.tolist()
+    fanin = cg.fanin.tolist()
+    fanin_offsets = cg.fanin_offsets.tolist()
+    groups = dict()
+    for lut_id, (root, leaves) in enumerate(
+        zip(lut_roots.tolist(), lut_leaves.tolist())
+    ):
+        leaves = [leaf for leaf in leaves if leaf != cg.n_nodes]
+        tt = lut_truth_table(node_type, fanin, fanin_offsets, root, leaves)
+        groups.setdefault((len(leaves), tt), list()).append(lut_id)
+
+    # one block of clauses per distinct LUT function
+    parts = list()
+    for (m, tt), lut_ids in groups.items():
+        template, lengths = lut_clause_template(m, tt)
+        sources = np.array([source for source, _ in template], dtype=np.int64)
+        signs = np.array([sign for _, sign in template], dtype=np.int64)
+        lits = np.concatenate(
+            [node_lits[lut_roots[lut_ids]][:, None], node_lits[lut_leaves[lut_ids]]],
+            axis=1,
+        )
+        flat_lits = (lits[:, sources] * signs).astype(np.int32).reshape(-1)
+        offsets = np.zeros(len(lut_ids) * len(lengths) + 1, dtype=np.int64)
+        np.cumsum(np.tile(lengths, len(lut_ids)), out=offsets[1:])
+        parts.append(F.FlatCNF(flat_lits, offsets))
+    return F.FlatCNF.concatenate(parts)
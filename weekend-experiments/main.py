@@ -2,24 +2,21 @@ import time
 import random
 import itertools
 import json
-import pysat
 import os
 import sys
 
 from collections import defaultdict
 from tqdm import tqdm
 
-from pysat.solvers import Maplesat as PysatSolver
-from pycryptosat import Solver
-
-import formula_builder as FB
-import graph as G
+import graph_cache as GC
+import miter_instance as MI
 import utils as U
 
 import eq_checkers as EQ
 
 import hyperparameters as H
 import domain_preprocessing as DP
+import simulation as S
 import tree_decomposition as TD
 
 COMPLEX_CUBES_FILE = ""
@@ -54,13 +51,12 @@ def take_domains_until_threshold(domains_left, domains_right, metainfo):
 # then iterates over the product to make sure there is UNSAT on every possible
 # combination of domain values.
 def all_domains_at_once_equivalence(
-    g1,
-    g2,
+    miter,
     domains_info_left,
     domains_info_right,
     metainfo,
 ):
-    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
+    _, pool = miter.formula()
 
     shared_domain_info, cartesian_size = take_domains_until_threshold(
         domains_info_left, domains_info_right, metainfo
@@ -81,13 +77,10 @@ def all_domains_at_once_equivalence(
 
     metainfo["distribution"] = list(map(lambda x: len(x), shared_domains_only))
 
-    final_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
-
     runtimes = []
     equivalent = True
 
-    solver = Solver()
-    solver.add_clauses(final_cnf)
+    solver = miter.cryptosat_solver()
 
     for comb_id, combination in enumerate(
         tqdm(
@@ -100,8 +93,7 @@ def all_domains_at_once_equivalence(
         assumptions = list()
 
         for domain_id, bitvector in enumerate(combination):
-            bucket, domain, tag = shared_domain_info[domain_id]
-            print(bucket, domain, tag)
+            domain, bucket, tag = shared_domain_info[domain_id]
             assert bitvector in domain
             for gate_id, gate_name in enumerate(bucket):
                 modifier = U.get_bit_from_domain(bitvector, gate_id)
@@ -129,46 +121,45 @@ def all_domains_at_once_equivalence(
     return equivalent
 
 
-def get_one_side_domains_and_basket(g, shared_best_domains, pool):
+def get_one_side_domains_and_basket(miter, tag, shared_best_domains):
     best_domains_side = list(
-        filter(lambda domain: domain[2] == g.tag, shared_best_domains)
+        filter(lambda domain: domain[2] == tag, shared_best_domains)
     )
 
     baskets = TD.prepare_first_layer_of_baskets(best_domains_side)
 
-    with PysatSolver(bootstrap_with=FB.make_formula_from_my_graph(g, pool)) as solver:
+    _, pool = miter.side_formula(tag)
+    with miter.side_solver(tag) as solver:
         final_basket, skipped_side = TD.merge_baskets(baskets, solver, pool)
 
     return best_domains_side, final_basket
 
 
-def get_two_final_baskets(g1, g2, domains_info_left, domains_info_right, metainfo):
+def get_two_final_baskets(miter, domains_info_left, domains_info_right, metainfo):
     best_domains, cartesian_size = take_domains_until_threshold(
         domains_info_left, domains_info_right, metainfo
     )
 
-    single_schemas_pool = FB.TPoolHolder()
     best_domains_left, final_basket_left = get_one_side_domains_and_basket(
-        g1,
+        miter,
+        miter.g1.tag,
         best_domains,
-        single_schemas_pool,
     )
 
     best_domains_right, final_basket_right = get_one_side_domains_and_basket(
-        g2,
+        miter,
+        miter.g2.tag,
         best_domains,
-        single_schemas_pool,
     )
     return final_basket_left, final_basket_right
 
 
-def generate_inccnf(g1, g2, domains_info_left, domains_info_right, metainfo, file_name):
+def generate_inccnf(miter, domains_info_left, domains_info_right, metainfo, file_name):
     basket_left, basket_right = get_two_final_baskets(
-        g1, g2, domains_info_left, domains_info_right, metainfo
+        miter, domains_info_left, domains_info_right, metainfo
     )
     TD.generate_inccnf(
-        g1,
-        g2,
+        miter,
         basket_left,
         basket_right,
         metainfo,
@@ -179,26 +170,25 @@ def generate_inccnf(g1, g2, domains_info_left, domains_info_right, metainfo, fil
 
 
 def tree_based_equivalence(
-    g1, g2, domains_info_left, domains_info_right, metainfo, complex_cubes_file
+    miter, domains_info_left, domains_info_right, metainfo, complex_cubes_file
 ):
     final_basket_left, final_basket_right = get_two_final_baskets(
-        g1, g2, domains_info_left, domains_info_right, metainfo
+        miter, domains_info_left, domains_info_right, metainfo
     )
 
     TD.filter_complex_cubes(
-        g1, g2, final_basket_left, final_basket_right, complex_cubes_file
+        miter, final_basket_left, final_basket_right, complex_cubes_file
     )
 
     return True
 
     return TD.iterate_over_two_megabackets(
-        g1, g2, final_basket_left, final_basket_right
+        miter, final_basket_left, final_basket_right
     )
 
 
 def post_sampling_calculations(
-    g1,
-    g2,
+    miter,
     test_path_left,
     test_path_right,
     metainfo,
@@ -208,21 +198,32 @@ def post_sampling_calculations(
     complex_cubes_file,
 ):
 
+    metainfo["domain_strategy"] = H.DOMAIN_STRATEGY
+    metainfo["domain_stats"] = list()
     best_domains_left, shift = DP.calculate_domain_saturations(
-        g1, buckets_left, tag="L", start_from=1
+        miter.g1,
+        buckets_left,
+        tag="L",
+        start_from=1,
+        miter=miter,
+        stats=metainfo["domain_stats"],
     )
     best_domains_right, _ = DP.calculate_domain_saturations(
-        g2, buckets_right, tag="R", start_from=shift + 1
+        miter.g2,
+        buckets_right,
+        tag="R",
+        start_from=shift + 1,
+        miter=miter,
+        stats=metainfo["domain_stats"],
     )
 
     if mode == "tree-based":
         result = tree_based_equivalence(
-            g1, g2, best_domains_left, best_domains_right, metainfo, complex_cubes_file
+            miter, best_domains_left, best_domains_right, metainfo, complex_cubes_file
         )
     elif mode == "all-domains-at-once":
         result = all_domains_at_once_equivalence(
-            g1,
-            g2,
+            miter,
             best_domains_left,
             best_domains_right,
             metainfo,
@@ -239,12 +240,23 @@ def post_sampling_calculations(
 def domain_equivalence_check(
     test_path_left, test_path_right, metainfo_file, mode, complex_cubes_file=None
 ):
-    g1 = G.Graph(test_path_left, "L")
-    g2 = G.Graph(test_path_right, "R")
+    g1 = GC.load_graph(test_path_left, "L", strash=H.STRASH_SCHEMAS)
+    g2 = GC.load_graph(test_path_right, "R", strash=H.STRASH_SCHEMAS)
 
     t_start = time.time()
     metainfo = dict()
 
+    if H.EXHAUSTIVE_VERDICT and S.fits_exhaustive(g1, g2):
+        print("Schemas fit the exhaustive budget, comparing truth tables")
+        metainfo["type"] = "exhaustive"
+        metainfo["left_schema"] = test_path_left
+        metainfo["right_schema"] = test_path_right
+        result = EQ.validate_exhaustively(g1, g2, metainfo)
+        metainfo["outcome"] = result
+        metainfo["time"] = str(time.time() - t_start)
+        U.print_to_file(metainfo_file, json.dumps(metainfo, indent=4))
+        return result
+
     print("Schemas initialized, looking for unbalanced nodes in the left schema")
     buckets_left = DP.find_unbalanced_gates(g1)
     print("Looking for unbalanced nodes in the right schema")
@@ -253,9 +265,18 @@ def domain_equivalence_check(
 
     metainfo["type"] = mode
 
-    result = post_sampling_calculations(
+    # encoded once, shared by domains, baskets and the final check; bucket
+    # gates are the only gates ever assumed
+    miter = MI.MiterInstance(
         g1,
         g2,
+        assumption_gates=[
+            gate for bucket in buckets_left + buckets_right for gate in bucket
+        ],
+    )
+
+    result = post_sampling_calculations(
+        miter,
         test_path_left,
         test_path_right,
         metainfo,
@@ -275,8 +296,8 @@ def domain_equivalence_check(
 
 
 def naive_equivalence_check(test_path_left, test_path_right, metainfo_file, cnf_file):
-    g1 = G.Graph(test_path_left, "L")
-    g2 = G.Graph(test_path_right, "R")
+    g1 = GC.load_graph(test_path_left, "L", strash=H.STRASH_SCHEMAS)
+    g2 = GC.load_graph(test_path_right, "R", strash=H.STRASH_SCHEMAS)
 
     metainfo = dict()
     metainfo["left_schema"] = test_path_left
@@ -290,10 +311,26 @@ def naive_equivalence_check(test_path_left, test_path_right, metainfo_file, cnf_
     U.print_to_file(metainfo_file, json.dumps(metainfo, indent=4))
 
 
+def cone_equivalence_check(test_path_left, test_path_right, metainfo_file):
+    g1 = GC.load_graph(test_path_left, "L", strash=H.STRASH_SCHEMAS)
+    g2 = GC.load_graph(test_path_right, "R", strash=H.STRASH_SCHEMAS)
+
+    metainfo = dict()
+    metainfo["left_schema"] = test_path_left
+    metainfo["right_schema"] = test_path_right
+    metainfo["type"] = "output_cones"
+    t1 = time.time()
+    result = EQ.validate_by_output_cones(g1, g2, metainfo)
+    t2 = time.time()
+    metainfo["time"] = str(t2 - t1)
+    metainfo["outcome"] = result
+    U.print_to_file(metainfo_file, json.dumps(metainfo, indent=4))
+
+
 def check_open_xors_equivalence(test_path_left, test_path_right, metainfo_file):
     print(test_path_left, test_path_right)
-    g1 = G.Graph(test_path_left, "L")
-    g2 = G.Graph(test_path_right, "R")
+    g1 = GC.load_graph(test_path_left, "L", strash=H.STRASH_SCHEMAS)
+    g2 = GC.load_graph(test_path_right, "R", strash=H.STRASH_SCHEMAS)
 
     metainfo = dict()
     metainfo["left_schema"] = test_path_left
@@ -0,0 +1,261 @@
+from pycryptosat import Solver
+from pysat.solvers import Maplesat as PysatSolver
+
+import cnf_fragment as FR
+import cnf_simplifier as CS
+import flat_cnf as F
+import formula_builder as FB
+import hyperparameters as H
+import lut_mapping as LM
+import polarity as PG
+import variable_order as VO
+
+# Everything a (left, right) pair needs to be checked, encoded once.
+#
+# Both graphs are encoded into one `FB.NodePool` right away, the xor part
+# of the miter is added per mode on first request. Nothing handed out is
+# ever appended to, every solver gets its own copy of the clauses, so one
+# instance serves the whole pipeline: domains, baskets, cubes, final checks.
+#
+# Modes: "or" and "stairs" Tseitin-encode the output xors (see
+# `FB.append_xor_to_miter`), "xor-native" hands them to CryptoMiniSat as
+# xor constraints and exists for `cryptosat_solver` only.
+#
+# A polarity aware instance keeps only the implications the miter needs
+# (see `polarity`). Outputs are always encoded both ways, and so must be
+# every gate that will be used in assumptions: pass them as
+# `assumption_gates`, assumptions on other gates are unsound.
+#
+# With `encoding="lut"` (see `lut_mapping`) the graphs are LUT-mapped and
+# only LUT roots, outputs and `assumption_gates` get variables. Polarities
+# then only apply to the xor part.
+#
+# Both graphs are added to the pool together, numbered in the pool's
+# variable order (see `variable_order`). The full encoding of a side comes
+# from its `cnf_fragment.Fragment` whenever that order allows it.
+#
+# With `simplify` solvers load a preprocessed formula (see `cnf_simplifier`),
+# built on first request per mode or side and cached. Outputs, xor gates and
+# `assumption_gates` stay frozen. `formula` and `side_formula` hand out the
+# clauses together with the pool that turns names into their literals, code
+# building assumptions takes the pool from there, not `self.pool`.
+
+MODES = ["or", "stairs", "xor-native"]
+
+
+class MiterInstance:
+    def __init__(
+        self,
+        g1,
+        g2,
+        pool=None,
+        polarity_aware=None,
+        assumption_gates=(),
+        encoding=None,
+        simplify=None,
+    ):
+        assert g1.n_inputs == g2.n_inputs
+        assert g1.n_outputs == g2.n_outputs
+        if pool is None:
+            pool = FB.NodePool()
+        if polarity_aware is None:
+            polarity_aware = H.POLARITY_AWARE_ENCODING
+        if encoding is None:
+            encoding = H.GRAPH_ENCODING
+        if simplify is None:
+            simplify = H.SIMPLIFY_CNF
+
+        self.g1 = g1
+        self.g2 = g2
+        self.pool = pool
+        self.polarity_aware = polarity_aware
+        self.encoding = encoding
+        self.simplify = simplify
+        self.assumption_gates = list(assumption_gates)
+
+        # bucket gates and LUT cover of every graph by tag, the cover is
+        # None for Tseitin
+        gates = dict()
+        covers = dict()
+        for g in [g1, g2]:
+            gates[g.tag] = [
+                name
+                for name in assumption_gates
+                if not name.startswith("v") and name.endswith(g.tag)
+            ]
+            covers[g.tag] = None
+            if encoding == "lut":
+                covers[g.tag] = LM.lut_cover(
+                    g, gates[g.tag], fold_inverters=pool.fold_inverters
+                )
+
+        # both sides get their variables together, so the pool's variable
+        # order can interleave them; per-graph orders number them one after
+        # the other anyway, which lets the sides come from fragments
+        if pool.order not in VO.PER_GRAPH_ORDERS:
+            pool.add_graphs(
+                [g1, g2],
+                [None if covers[g.tag] is None else covers[g.tag][2] for g in [g1, g2]],
+            )
+
+        # clauses of every graph on its own, by tag; polarity of every node
+        # by tag, None means full encoding
+        self.side_cnfs = dict()
+        self.polarities = dict()
+        for g in [g1, g2]:
+            self.polarities[g.tag] = None
+            if encoding == "lut":
+                self.side_cnfs[g.tag] = LM.make_lut_formula(
+                    g, pool, gates[g.tag], cover=covers[g.tag]
+                )
+                continue
+            if not polarity_aware:
+                self.side_cnfs[g.tag] = FR.make_fragment_formula(g, pool)
+                continue
+            self.polarities[g.tag] = PG.node_polarities(g, gates[g.tag])
+            self.side_cnfs[g.tag] = FB.make_flat_formula(
+                g, pool, polarity=self.polarities[g.tag]
+            )
+        self.shared_cnf = F.FlatCNF.concatenate(
+            [self.side_cnfs[g1.tag], self.side_cnfs[g2.tag]]
+        )
+
+        # (left literal, right literal) for every output
+        self.output_lits = [
+            (
+                g1.output_var_to_cnf_var(f"o{output_id}", pool),
+                g2.output_var_to_cnf_var(f"o{output_id}", pool),
+            )
+            for output_id in range(g1.n_outputs)
+        ]
+
+        # mode -> full miter
+        self.miter_cnfs = dict()
+        self.native_xors = None
+        # mode or tag -> `CS.SimplifiedCNF`
+        self.simplified = dict()
+
+    def graph(self, tag):
+        return self.g1 if tag == self.g1.tag else self.g2
+
+    # Full miter, `mode` as in `FB.append_xor_to_miter`
+    def miter_cnf(self, mode="or"):
+        assert mode != "xor-native", "Native xors are not clauses"
+        if mode not in self.miter_cnfs:
+            xor_cnf = FB.append_xor_to_miter(
+                F.FlatCNF(),
+                self.pool,
+                self.g1,
+                self.g2,
+                mode,
+                polarity_aware=self.polarity_aware,
+            )
+            self.miter_cnfs[mode] = F.FlatCNF.concatenate([self.shared_cnf, xor_cnf])
+        return self.miter_cnfs[mode]
+
+    # (xor constraints, or clause), see `FB.make_native_xor_miter`
+    def native_xor_miter(self):
+        if self.native_xors is None:
+            self.native_xors = FB.make_native_xor_miter(self.pool, self.g1, self.g2)
+        return self.native_xors
+
+    # Variables of the output xor gates, the same in every mode
+    def xor_vars(self, mode="or"):
+        if mode == "xor-native":
+            self.native_xor_miter()
+        else:
+            self.miter_cnf(mode)
+        return [
+            self.pool.v_to_id(f"xor_{output_id}")
+            for output_id in range(self.g1.n_outputs)
+        ]
+
+    # `mode=None` gives both graphs without any xors (open xors), for
+    # "xor-native" these are the clauses that go along with the constraints
+    def cnf(self, mode="or"):
+        if mode is None or mode == "xor-native":
+            return self.shared_cnf
+        return self.miter_cnf(mode)
+
+    # Variables assumptions may use in a formula over the graphs of `tags`
+    def frozen_vars(self, tags, mode=None):
+        # bucket inputs are shared by both graphs and untagged
+        frozen = [
+            self.pool.v_to_id(name)
+            for name in self.assumption_gates
+            if name.startswith("v")
+        ]
+        for tag in tags:
+            g = self.graph(tag)
+            frozen += [
+                self.pool.v_to_id(name)
+                for name in self.assumption_gates
+                if not name.startswith("v") and name.endswith(tag)
+            ]
+            frozen += [
+                g.output_var_to_cnf_var(f"o{output_id}", self.pool)
+                for output_id in range(g.n_outputs)
+            ]
+        if mode is not None:
+            frozen += self.xor_vars(mode)
+        return [abs(var) for var in frozen]
+
+    # (clauses, pool) solvers of `mode` work with
+    def formula(self, mode="or"):
+        if not self.simplify:
+            return self.cnf(mode), self.pool
+        if mode not in self.simplified:
+            frozen = self.frozen_vars([self.g1.tag, self.g2.tag], mode)
+            self.simplified[mode] = CS.simplify(self.cnf(mode), frozen, self.pool)
+        return self.simplified[mode].cnf, self.simplified[mode]
+
+    # (clauses, pool) of one graph only, for baskets of one side
+    def side_formula(self, tag):
+        if not self.simplify:
+            return self.side_cnfs[tag], self.pool
+        if tag not in self.simplified:
+            frozen = self.frozen_vars([tag])
+            self.simplified[tag] = CS.simplify(self.side_cnfs[tag], frozen, self.pool)
+        return self.simplified[tag].cnf, self.simplified[tag]
+
+    # Literal of the formula of `mode` for a literal of `self.pool`
+    def solver_literal(self, lit, mode="or"):
+        if not self.simplify:
+            return lit
+        return self.formula(mode)[1].literal(lit)
+
+    # A fresh Maplesat with the clauses loaded, close it or use it in `with`
+    def solver(self, mode="or"):
+        assert mode != "xor-native", "Maplesat has no xor constraints"
+        solver = PysatSolver()
+        self.formula(mode)[0].add_to_solver(solver)
+        return solver
+
+    # `solver_options` go to `pycryptosat.Solver`, e.g. `time_limit`
+    def cryptosat_solver(self, mode="or", **solver_options):
+        solver = Solver(**solver_options)
+        self.formula(mode)[0].add_to_solver(solver)
+        if mode == "xor-native":
+            xor_constraints, or_clause = self.native_xor_miter()
+            for xor_vars, rhs in xor_constraints:
+                xor_lits = [self.solver_literal(var, mode) for var in xor_vars]
+                solver.add_xor_clause(*xor_over_vars(xor_lits, rhs))
+            solver.add_clause([self.solver_literal(lit, mode) for lit in or_clause])
+        return solver
+
+    # Maplesat over one graph only, for baskets of one side
+    def side_solver(self, tag):
+        solver = PysatSolver()
+        self.side_formula(tag)[0].add_to_solver(solver)
+        return solver
+
+
+# An xor over literals as an xor over variables and a right hand side:
+# negations flip the side, a variable twice cancels out
+def xor_over_vars(lits, rhs):
+    xor_vars = set()
+    for lit in lits:
+        if lit < 0:
+            rhs = not rhs
+        xor_vars ^= {abs(lit)}
+    return sorted(xor_vars), rhs
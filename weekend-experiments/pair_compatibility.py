@@ -0,0 +1,216 @@
+import numpy as np
+
+import compact_graph as CG
+import hyperparameters as H
+import simulation as S
+
+# Value combinations of a left and a right node never seen together in
+# simulation.
+#
+# Both graphs are simulated on the same random patterns. For a left node `l`
+# and a right node `r`, `popcount(l & r)` counts the patterns where both are
+# true; the other three combinations follow from it and the popcounts of `l`
+# and `r` alone (`l & ~r` is `ones(l) - both` and so on), so one AND and one
+# popcount per pair give all four. A combination with a zero count is a
+# candidate binary clause `(l != value) or (r != value)`, i.e. a candidate
+# implication `l = value -> r = not value`, that a solver can then confirm.
+#
+# Only those candidates are stored, one CSR list per combination: row = left
+# node, sorted right nodes. A node that never takes some value on its own is
+# not paired at all for that value, every right node would be a candidate;
+# such nodes are kept as `left_unseen_values` / `right_unseen_values` and
+# `constant_pairs` spells their pairs out when they are needed.
+
+# Combination index of (left value, right value)
+COMBINATIONS = [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+
+class PairCompatibility:
+    def __init__(
+        self,
+        left_ids,
+        right_ids,
+        left_ones,
+        right_ones,
+        n_patterns,
+        offsets,
+        partners,
+        n_left_nodes,
+        n_right_nodes,
+    ):
+        self.left_ids = left_ids
+        self.right_ids = right_ids
+        self.n_patterns = n_patterns
+        # per combination: CSR over rows of `left_ids`, columns of `right_ids`
+        self.offsets = offsets
+        self.partners = partners
+
+        self.left_row = np.full(n_left_nodes, -1, dtype=np.int64)
+        self.left_row[left_ids] = np.arange(len(left_ids))
+        self.right_column = np.full(n_right_nodes, -1, dtype=np.int64)
+        self.right_column[right_ids] = np.arange(len(right_ids))
+
+        # bit `v` set if the node never took value `v`
+        self.left_unseen_values = unseen_values(left_ones, n_patterns)
+        self.right_unseen_values = unseen_values(right_ones, n_patterns)
+
+    def __len__(self):
+        return sum(len(partners) for partners in self.partners)
+
+    # True if `left_id = left_value` and `right_id = right_value` never held
+    # together on a pattern; nodes that were not simulated give False
+    def never_seen(self, left_id, left_value, right_id, right_value):
+        row = self.left_row[left_id]
+        column = self.right_column[right_id]
+        if row < 0 or column < 0:
+            return False
+        if (self.left_unseen_values[row] >> left_value) & 1:
+            return True
+        if (self.right_unseen_values[column] >> right_value) & 1:
+            return True
+        k = combination(left_value, right_value)
+        return self.has_partner(row, k, column)
+
+    def row_partners(self, row, k):
+        return self.partners[k][self.offsets[k][row] : self.offsets[k][row + 1]]
+
+    def has_partner(self, row, k, column):
+        row_partners = self.row_partners(row, k)
+        position = np.searchsorted(row_partners, column)
+        return position < len(row_partners) and row_partners[position] == column
+
+    # (left node ids, right node ids) of every stored pair of a combination
+    def pairs(self, left_value, right_value):
+        k = combination(left_value, right_value)
+        rows = np.repeat(np.arange(len(self.left_ids)), np.diff(self.offsets[k]))
+        return self.left_ids[rows], self.right_ids[self.partners[k]]
+
+    # (left node ids, right node ids) of the pairs `pairs` leaves out: a
+    # node that never took its value, against every node of the other side
+    def constant_pairs(self, left_value, right_value):
+        left_rows = np.flatnonzero((self.left_unseen_values >> left_value) & 1)
+        right_columns = np.flatnonzero((self.right_unseen_values >> right_value) & 1)
+        # pairs of two such nodes only once, under the left one
+        other_rows = np.setdiff1d(np.arange(len(self.left_ids)), left_rows)
+        left_ids = np.concatenate(
+            [
+                np.repeat(self.left_ids[left_rows], len(self.right_ids)),
+                np.tile(self.left_ids[other_rows], len(right_columns)),
+            ]
+        )
+        right_ids = np.concatenate(
+            [
+                np.tile(self.right_ids, len(left_rows)),
+                np.repeat(self.right_ids[right_columns], len(other_rows)),
+            ]
+        )
+        return left_ids, right_ids
+
+    # Stored pairs among the gates of a cube: `left_ids` take `left_values`,
+    # `right_ids` take `right_values` (0/1 arrays); returns (left id, right
+    # id) arrays of the pairs whose values never appeared together
+    def cube_conflicts(self, left_ids, left_values, right_ids, right_values):
+        left_ids = np.asarray(left_ids)
+        right_ids = np.asarray(right_ids)
+        left_values = np.asarray(left_values, dtype=np.int64)
+        right_values = np.asarray(right_values, dtype=np.int64)
+        rows = self.left_row[left_ids]
+        columns = self.right_column[right_ids]
+
+        conflicts_left = list()
+        conflicts_right = list()
+        for position, row in enumerate(rows.tolist()):
+            if row < 0:
+                continue
+            for right_value in [0, 1]:
+                k = combination(int(left_values[position]), right_value)
+                row_partners = self.row_partners(row, k)
+                hit = (right_values == right_value) & (columns >= 0)
+                hit[hit] = np.isin(columns[hit], row_partners)
+                conflicts_left += [left_ids[position]] * int(hit.sum())
+                conflicts_right += right_ids[hit].tolist()
+        return np.array(conflicts_left, dtype=np.int64), np.array(
+            conflicts_right, dtype=np.int64
+        )
+
+
+def combination(left_value, right_value):
+    return 2 * left_value + right_value
+
+
+def unseen_values(ones, n_patterns):
+    return (ones == n_patterns).astype(np.uint8) | (
+        (ones == 0).astype(np.uint8) << 1
+    )
+
+
+# Default nodes of a graph: AND gates; inverters are their child negated
+# and inputs are shared by both sides
+def default_ids(cg):
+    return cg.node_ids(CG.AND)
+
+
+def find_pair_compatibility(g1, g2, n_patterns=None, left_ids=None, right_ids=None):
+    if n_patterns is None:
+        n_patterns = H.RANDOM_SAMPLE_SIZE
+    cg1 = CG.as_compact(g1)
+    cg2 = CG.as_compact(g2)
+    assert cg1.n_inputs == cg2.n_inputs
+    left_ids = default_ids(cg1) if left_ids is None else np.asarray(left_ids)
+    right_ids = default_ids(cg2) if right_ids is None else np.asarray(right_ids)
+
+    patterns = S.random_patterns(cg1.n_inputs, n_patterns)
+    left = S.mask_tail(S.simulate(cg1, patterns), n_patterns)[left_ids]
+    right = S.mask_tail(S.simulate(cg2, patterns), n_patterns)[right_ids]
+    left_ones = S.popcounts(left)
+    right_ones = S.popcounts(right)
+
+    left_values_seen = ~unseen_values(left_ones, n_patterns)
+    right_values_seen = ~unseen_values(right_ones, n_patterns)
+
+    # rows of left nodes per step, so the [rows, right, words] AND stays
+    # within the simulation memory budget
+    step = max(1, S.PASS_MEMORY_BUDGET // (8 * max(1, right.size)))
+    found_rows = [list() for _ in COMBINATIONS]
+    found_columns = [list() for _ in COMBINATIONS]
+    for start in range(0, len(left_ids), step):
+        both = S.popcounts(left[start : start + step, None, :] & right[None, :, :])
+        ones = left_ones[start : start + step, None]
+        counts = [
+            n_patterns - ones - right_ones[None, :] + both,
+            right_ones[None, :] - both,
+            ones - both,
+            both,
+        ]
+        rows_seen = left_values_seen[start : start + step]
+        for k, (left_value, right_value) in enumerate(COMBINATIONS):
+            unseen = counts[k] == 0
+            # nodes that never take the value alone are not paired for it
+            unseen &= ((rows_seen >> left_value) & 1).astype(bool)[:, None]
+            unseen &= ((right_values_seen >> right_value) & 1).astype(bool)[None, :]
+            rows, columns = np.nonzero(unseen)
+            found_rows[k].append(rows + start)
+            found_columns[k].append(columns)
+
+    offsets = list()
+    partners = list()
+    for k in range(len(COMBINATIONS)):
+        rows = np.concatenate(found_rows[k] + [np.empty(0, dtype=np.int64)])
+        columns = np.concatenate(found_columns[k] + [np.empty(0, dtype=np.int64)])
+        # `np.nonzero` is row major, rows and columns come out sorted
+        k_offsets = np.zeros(len(left_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(left_ids)), out=k_offsets[1:])
+        offsets.append(k_offsets)
+        partners.append(columns.astype(np.int64))
+
+    return PairCompatibility(
+        left_ids,
+        right_ids,
+        left_ones,
+        right_ones,
+        n_patterns,
+        offsets,
+        partners,
+        cg1.n_nodes,
+        cg2.n_nodes,
+    )
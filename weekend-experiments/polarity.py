@@ -0,0 +1,59 @@
+import numpy as np
+
+import compact_graph as CG
+import cones as C
+
+# Polarity analysis for Plaisted-Greenbaum encodings.
+#
+# A node is needed POSITIVE if the formula may force it true (then only
+# `v -> definition` clauses are needed) and NEGATIVE if it may force it
+# false (`definition -> v`). Roots get a polarity from how they are used:
+# miter outputs sit under xors and are needed both ways, so are assumption
+# gates (bucket gates), because an assumption may take either value. An and
+# gate passes its polarity to its children, an inverter passes the flipped
+# one, nodes nobody needs get 0 and no clauses at all.
+
+POSITIVE = 1
+NEGATIVE = 2
+BOTH = POSITIVE | NEGATIVE
+
+# polarity -> polarity of the child of an inverter
+FLIPPED = np.array([0, NEGATIVE, POSITIVE, BOTH], dtype=np.uint8)
+
+
+# `roots` are node ids or names, all of them get BOTH. Goes over the nodes
+# layer by layer, deepest first: all parents of a node are deeper than the
+# node itself, so a layer is final once the layers above are processed.
+def node_polarities(g, roots, include_outputs=True):
+    cg = CG.as_compact(g)
+    polarity = np.zeros(cg.n_nodes, dtype=np.uint8)
+    polarity[C.to_node_ids(cg, roots)] = BOTH
+    if include_outputs:
+        polarity[cg.outputs] = BOTH
+
+    order = np.argsort(cg.depth, kind="stable")[::-1]
+    layer_ends = np.flatnonzero(np.diff(cg.depth[order]) != 0) + 1
+    for layer in np.split(order, layer_ends):
+        # only gates pass anything down
+        types = cg.node_type[layer]
+        is_gate = (types == CG.AND) | (types == CG.NOT)
+        layer = layer[(polarity[layer] != 0) & is_gate]
+        if len(layer) == 0:
+            continue
+        own = polarity[layer]
+        own = np.where(cg.node_type[layer] == CG.NOT, FLIPPED[own], own)
+
+        n_children = cg.fanin_offsets[layer + 1] - cg.fanin_offsets[layer]
+        children = C.gather_children(cg, layer)
+        np.bitwise_or.at(polarity, children, np.repeat(own, n_children))
+
+    return polarity
+
+
+def count_polarities(polarity):
+    return {
+        "positive_only": int(np.count_nonzero(polarity == POSITIVE)),
+        "negative_only": int(np.count_nonzero(polarity == NEGATIVE)),
+        "both": int(np.count_nonzero(polarity == BOTH)),
+        "unused": int(np.count_nonzero(polarity == 0)),
+    }
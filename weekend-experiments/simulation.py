@@ -0,0 +1,232 @@
+import random
+
+import numpy as np
+
+import compact_graph as CG
+import hyperparameters as H
+
+# Bit-parallel simulation. Every node gets a signature: a row of uint64 words,
+# bit `p` of the row is the value of the node on input pattern `p`. Nodes of
+# the same depth are evaluated together with fancy indexing, so one pass costs
+# a few numpy calls per depth level no matter how many patterns are packed.
+
+WORD_BITS = 64
+WORD_MASK = (1 << WORD_BITS) - 1
+
+# Upper bound on the signature matrix of a single pass, bigger samples are
+# simulated in several passes
+PASS_MEMORY_BUDGET = 1 << 28
+
+
+def n_words_for(n_patterns):
+    return (n_patterns + WORD_BITS - 1) // WORD_BITS
+
+
+# Packs a list of ints (bit `i` of an int is the value of input `i`, as in
+# `Graph.calculate_schema_on_inputs`) into an [n_inputs, n_words] matrix.
+def pack_inputs(inputs, n_inputs):
+    n_patterns = len(inputs)
+    n_chunks = max(1, (n_inputs + WORD_BITS - 1) // WORD_BITS)
+    n_bytes = n_words_for(n_patterns) * 8
+
+    # [n_patterns, n_inputs] bit matrix, built 64 inputs at a time
+    bits = np.empty((n_patterns, n_chunks * WORD_BITS), dtype=np.uint8)
+    shifts = np.arange(WORD_BITS, dtype=np.uint64)
+    for chunk in range(n_chunks):
+        words = np.array(
+            [(x >> (chunk * WORD_BITS)) & WORD_MASK for x in inputs], dtype=np.uint64
+        )
+        bits[:, chunk * WORD_BITS : (chunk + 1) * WORD_BITS] = (
+            words[:, None] >> shifts
+        ) & np.uint64(1)
+
+    packed = np.packbits(bits[:, :n_inputs].T, axis=1, bitorder="little")
+    result = np.zeros((n_inputs, n_bytes), dtype=np.uint8)
+    result[:, : packed.shape[1]] = packed
+    return result.view(np.uint64)
+
+
+# Same draw as `random.sample(range(2 ** n_inputs), sample_size)` whenever
+# the range has a C-sized length, distinct random ints beyond that, where
+# `random.sample` overflows (crypto schemas have hundreds of inputs).
+def sample_inputs(n_inputs, sample_size):
+    if n_inputs < 63:
+        complete_input_range = range(2 ** n_inputs)
+        sample_size = min(len(complete_input_range), sample_size)
+        return random.sample(complete_input_range, sample_size)
+
+    sample = dict()
+    while len(sample) < sample_size:
+        sample[random.getrandbits(n_inputs)] = None
+    return list(sample)
+
+
+def random_patterns(n_inputs, n_patterns, seed=42):
+    rng = np.random.default_rng(seed)
+    patterns = rng.integers(
+        0, WORD_MASK, size=(n_inputs, n_words_for(n_patterns)), dtype=np.uint64,
+        endpoint=True,
+    )
+    return mask_tail(patterns, n_patterns)
+
+
+# Truth tables of the inputs: pattern `p` is the input int `p`, so bit `i`
+# of pattern `p` is `(p >> i) & 1`, same convention as `pack_inputs`.
+def exhaustive_patterns(n_inputs):
+    n_patterns = 2 ** n_inputs
+    n_words = n_words_for(n_patterns)
+    word_ids = np.arange(n_words, dtype=np.uint64)
+    patterns = np.empty((n_inputs, n_words), dtype=np.uint64)
+
+    in_word_bits = np.arange(WORD_BITS, dtype=np.uint64)
+    for input_id in range(n_inputs):
+        if input_id < 6:
+            # the pattern repeats inside every word
+            bits = (in_word_bits >> np.uint64(input_id)) & np.uint64(1)
+            patterns[input_id] = np.uint64(
+                sum(1 << p for p in range(WORD_BITS) if bits[p])
+            )
+        else:
+            set_words = (word_ids >> np.uint64(input_id - 6)) & np.uint64(1)
+            patterns[input_id] = set_words * np.uint64(WORD_MASK)
+
+    return mask_tail(patterns, n_patterns)
+
+
+def truth_table_bytes(g):
+    return CG.as_compact(g).n_nodes * n_words_for(2 ** g.n_inputs) * 8
+
+
+def fits_exhaustive(*graphs):
+    total = sum(truth_table_bytes(g) for g in graphs)
+    return total <= H.EXHAUSTIVE_MEMORY_BUDGET
+
+
+# Signatures over every input assignment, i.e. the full truth table of
+# every node, [n_nodes, n_words].
+def truth_tables(g):
+    g = CG.as_compact(g)
+    patterns = exhaustive_patterns(g.n_inputs)
+    return mask_tail(simulate(g, patterns), 2 ** g.n_inputs)
+
+
+# Every value combination the rows take together on some pattern, as sorted
+# bitvectors: bit `j` of a bitvector is the value of `rows[j]`.
+def observed_bitvectors(rows, n_patterns):
+    k = len(rows)
+    seen = np.zeros(2 ** k, dtype=bool)
+    weights = (np.int64(1) << np.arange(k, dtype=np.int64))[:, None]
+
+    # unpack 2^16 patterns at a time to keep memory flat
+    words_per_step = 1 << 10
+    for start in range(0, rows.shape[1], words_per_step):
+        chunk = np.ascontiguousarray(rows[:, start : start + words_per_step])
+        bits = np.unpackbits(chunk.view(np.uint8), axis=1, bitorder="little")
+        n_valid = min(bits.shape[1], n_patterns - start * WORD_BITS)
+        codes = (bits[:, :n_valid].astype(np.int64) * weights).sum(axis=0)
+        seen[codes] = True
+
+    return np.flatnonzero(seen).tolist()
+
+
+# Zeroes the bits past `n_patterns` in the last word, otherwise inverters
+# would turn the padding into ones.
+def mask_tail(signatures, n_patterns):
+    tail = n_patterns % WORD_BITS
+    if tail != 0:
+        signatures[..., -1] &= np.uint64((1 << tail) - 1)
+    return signatures
+
+
+# Groups gates by depth: [(and_ids, left, right, not_ids, not_children)]
+def make_schedule(g):
+    g = CG.as_compact(g)
+    gate_ids = np.flatnonzero((g.node_type == CG.AND) | (g.node_type == CG.NOT))
+    gate_ids = gate_ids[np.argsort(g.depth[gate_ids], kind="stable")]
+    depths = g.depth[gate_ids]
+    bounds = np.flatnonzero(np.diff(depths)) + 1
+
+    schedule = list()
+    for ids in np.split(gate_ids, bounds):
+        first_child = g.fanin[g.fanin_offsets[ids]]
+        is_and = g.node_type[ids] == CG.AND
+        and_ids = ids[is_and]
+        schedule.append(
+            (
+                and_ids,
+                first_child[is_and],
+                g.fanin[g.fanin_offsets[and_ids] + 1],
+                ids[~is_and],
+                first_child[~is_and],
+            )
+        )
+    return schedule
+
+
+# Returns [n_nodes, n_words] signatures of `g` on `input_patterns`
+# ([n_inputs, n_words], e.g. from `pack_inputs` or `random_patterns`).
+def simulate(g, input_patterns, schedule=None):
+    g = CG.as_compact(g)
+    if schedule is None:
+        schedule = make_schedule(g)
+
+    n_words = input_patterns.shape[1]
+    signatures = np.empty((g.n_nodes, n_words), dtype=np.uint64)
+
+    input_ids = g.node_ids(CG.INPUT)
+    signatures[input_ids] = input_patterns[g.type_index[input_ids]]
+    signatures[g.node_ids(CG.CONST)] = 0
+
+    for and_ids, left, right, not_ids, not_children in schedule:
+        signatures[and_ids] = signatures[left] & signatures[right]
+        signatures[not_ids] = ~signatures[not_children]
+
+    return signatures
+
+
+# Both halves of a miter on the same inputs, plus the output xors:
+# a set bit in `output_xors` is a pattern the two schemas disagree on.
+def simulate_miter(g1, g2, input_patterns):
+    g1 = CG.as_compact(g1)
+    g2 = CG.as_compact(g2)
+    assert g1.n_inputs == g2.n_inputs
+    assert g1.n_outputs == g2.n_outputs
+
+    signatures_1 = simulate(g1, input_patterns)
+    signatures_2 = simulate(g2, input_patterns)
+    output_xors = signatures_1[g1.outputs] ^ signatures_2[g2.outputs]
+    return signatures_1, signatures_2, output_xors
+
+
+if hasattr(np, "bitwise_count"):
+
+    def popcounts(signatures):
+        return np.bitwise_count(signatures).sum(axis=-1, dtype=np.int64)
+
+else:
+    POPCOUNT_TABLE = np.array([bin(x).count("1") for x in range(256)], dtype=np.uint8)
+
+    def popcounts(signatures):
+        as_bytes = signatures.view(np.uint8)
+        return POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def patterns_per_pass(g):
+    words = max(1, PASS_MEMORY_BUDGET // (8 * max(1, g.n_nodes)))
+    return words * WORD_BITS
+
+
+# How many of the patterns made each node true, `inputs` are ints as in
+# `pack_inputs`.
+def count_true_on_inputs(g, inputs):
+    g = CG.as_compact(g)
+    schedule = make_schedule(g)
+    step = patterns_per_pass(g)
+
+    counts = np.zeros(g.n_nodes, dtype=np.int64)
+    for start in range(0, len(inputs), step):
+        chunk = inputs[start : start + step]
+        patterns = pack_inputs(chunk, g.n_inputs)
+        signatures = mask_tail(simulate(g, patterns, schedule), len(chunk))
+        counts += popcounts(signatures)
+    return counts
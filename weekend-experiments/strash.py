@@ -0,0 +1,152 @@
+import numpy as np
+
+import aig_parser as P
+import compact_graph as CG
+import graph as G
+
+# Structural hashing.
+#
+# One sweep over the nodes in topological order gives every node a
+# representative literal in the new graph: inputs map to themselves,
+# inverters flip the literal of their child (so double inverters vanish),
+# and gates are hash-consed by their normalized pair of child literals.
+# The representative array is a union-find with full path compression: when
+# a node is reached all its children already point to their final
+# representatives, so fanouts are redirected without any relinking.
+#
+# Trivial gates (x & x, x & !x, gates over constants) fold the same way the
+# parser folds them.
+
+
+def input_lit(input_id):
+    return 2 * (input_id + 1)
+
+
+# Returns (n_inputs, ands, output_lits); `ands` are (and_lit, left, right)
+# in AIGER numbering, topologically ordered.
+def hash_cons(cg):
+    representative = [0] * cg.n_nodes
+    node_type = cg.node_type.tolist()
+    type_index = cg.type_index.tolist()
+    fanin = cg.fanin.tolist()
+    offsets = cg.fanin_offsets.tolist()
+
+    table = dict()
+    ands = list()
+    next_lit = input_lit(cg.n_inputs)
+
+    for node_id in range(cg.n_nodes):
+        t = node_type[node_id]
+        if t == CG.INPUT:
+            representative[node_id] = input_lit(type_index[node_id])
+            continue
+        if t == CG.CONST:
+            representative[node_id] = P.CONST_LIT
+            continue
+
+        left = representative[fanin[offsets[node_id]]]
+        if t == CG.NOT:
+            representative[node_id] = left ^ 1
+            continue
+
+        right = representative[fanin[offsets[node_id] + 1]]
+        if left < right:
+            left, right = right, left
+        simplified = P.simplify_and(left, right)
+        if simplified is not None:
+            representative[node_id] = simplified
+            continue
+
+        key = (left, right)
+        if key not in table:
+            table[key] = next_lit
+            ands.append((next_lit, left, right))
+            next_lit += 2
+        representative[node_id] = table[key]
+
+    output_lits = [representative[node_id] for node_id in cg.outputs.tolist()]
+    return cg.n_inputs, ands, output_lits
+
+
+# Keeps only gates some output depends on, renumbered densely.
+def remove_dangling(n_inputs, ands, output_lits):
+    first_and_var = n_inputs + 1
+    used = [False] * len(ands)
+    for lit in output_lits:
+        if lit // 2 >= first_and_var:
+            used[lit // 2 - first_and_var] = True
+
+    for and_id in range(len(ands) - 1, -1, -1):
+        if not used[and_id]:
+            continue
+        _, left, right = ands[and_id]
+        for child in (left, right):
+            if child // 2 >= first_and_var:
+                used[child // 2 - first_and_var] = True
+
+    new_var = list(range(first_and_var)) + [0] * len(ands)
+    kept = list()
+    for and_id, (and_lit, left, right) in enumerate(ands):
+        if not used[and_id]:
+            continue
+        new_var[and_lit // 2] = first_and_var + len(kept)
+        kept.append((and_lit, left, right))
+
+    def rename(lit):
+        return 2 * new_var[lit // 2] + lit % 2
+
+    kept = [(rename(a), rename(l), rename(r)) for a, l, r in kept]
+    return kept, [rename(lit) for lit in output_lits]
+
+
+def compact_from_ands(n_inputs, ands, output_lits, tag, name):
+    parser = P.Parser()
+    parser.parse_inputs(input_lit(input_id) for input_id in range(n_inputs))
+    parser.parse_outputs(output_lits)
+    for and_lit, left, right in ands:
+        parser.add_and(and_lit, left, right)
+
+    return CG.CompactGraph.from_parsed(
+        parser.lit_parents,
+        parser.lit_children,
+        parser.input_to_lit,
+        parser.output_to_lit,
+        tag=tag,
+        name=name,
+    )
+
+
+def count_nodes(cg):
+    return {
+        "ands": int(np.count_nonzero(cg.node_type == CG.AND)),
+        "nots": int(np.count_nonzero(cg.node_type == CG.NOT)),
+        "nodes": cg.n_nodes,
+    }
+
+
+# Returns the reduced graph (same kind as `g`: `Graph` or `CompactGraph`)
+# and a dict with node counts before and after.
+def strash(g, keep_dangling=False):
+    cg = CG.as_compact(g)
+
+    n_inputs, ands, output_lits = hash_cons(cg)
+    if not keep_dangling:
+        ands, output_lits = remove_dangling(n_inputs, ands, output_lits)
+    reduced = compact_from_ands(n_inputs, ands, output_lits, cg.tag, cg.name)
+
+    before = count_nodes(cg)
+    after = count_nodes(reduced)
+    stats = dict()
+    for key in before:
+        stats[f"{key}_before"] = before[key]
+        stats[f"{key}_after"] = after[key]
+    stats["removed"] = before["nodes"] - after["nodes"]
+    print(
+        "Strash removed {} nodes: and gates {} -> {}, not gates {} -> {}".format(
+            stats["removed"], before["ands"], after["ands"], before["nots"], after["nots"]
+        )
+    )
+
+    if isinstance(g, CG.CompactGraph):
+        return reduced, stats
+    return G.Graph.from_compact(reduced), stats
@@ -0,0 +1,63 @@
+import sys
+import os
+
+import aiger
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+import aig_writer as W
+import compact_graph as CG
+import eq_checkers as EQ
+import strash as ST
+
+
+def test_written_aiger_equivalent_to_source(tmp_path):
+    for test in ["BubbleSort_4_3", "PancakeSort_4_3", "constants", "small-graph-2"]:
+        g = Graph(f"./tests/test-data/{test}.aag", "L")
+        for extension in ["aag", "aig"]:
+            out_file = str(tmp_path / f"{test}.{extension}")
+            g.to_file(out_file)
+
+            written = Graph(out_file, "R")
+            assert written.n_inputs == g.n_inputs
+            assert written.n_outputs == g.n_outputs
+            assert len(written.node_names) == len(g.node_names)
+            assert EQ.validate_exhaustively(g, written)
+
+        # ascii and binary describe the same gates
+        assert (
+            CG.CompactGraph.from_file(str(tmp_path / f"{test}.aag"), "L").fanin.tolist()
+            == CG.CompactGraph.from_file(str(tmp_path / f"{test}.aig"), "L").fanin.tolist()
+        )
+
+
+def test_written_aiger_accepted_by_aiger_library(tmp_path):
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    out_file = str(tmp_path / "pancake.aag")
+    W.write_aiger(g, out_file, comment="written by aig_writer")
+
+    circuit = aiger.load(out_file)
+    assert len(circuit.inputs) == g.n_inputs
+    assert set(circuit.outputs) == {f"o{k}" for k in range(g.n_outputs)}
+
+
+def test_write_strashed_cone(tmp_path):
+    g = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    reduced, _ = ST.strash(g)
+
+    out_file = str(tmp_path / "cone.aig")
+    W.write_aiger(reduced, out_file, output_ids=[3, 5])
+    cone = Graph(out_file, "R")
+    assert cone.n_inputs == g.n_inputs
+    assert cone.n_outputs == 2
+
+    for input in range(2 ** g.n_inputs):
+        values = g.calculate_schema_on_inputs(input)
+        cone_values = cone.calculate_schema_on_inputs(input)
+        for cone_output, output_id in enumerate([3, 5]):
+            expected = values[g.output_name_to_node_name[f"o{output_id}"]]
+            actual = cone_values[cone.output_name_to_node_name[f"o{cone_output}"]]
+            assert expected == actual
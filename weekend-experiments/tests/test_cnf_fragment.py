@@ -0,0 +1,65 @@
+import sys
+import os
+
+import numpy as np
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from miter_instance import MiterInstance
+import cnf_fragment as FR
+import eq_checkers as EQ
+import formula_builder as FB
+
+
+def test_fragment_same_clauses_as_encoding():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    for fold_inverters in [False, True]:
+        for order in ["topological", "dfs"]:
+            encoded_pool = FB.NodePool(fold_inverters=fold_inverters, order=order)
+            encoded = FB.make_flat_miter_from_two_graphs(g1, g2, encoded_pool)
+
+            pool = FB.NodePool(fold_inverters=fold_inverters, order=order)
+            placed = [FR.make_fragment_formula(g, pool) for g in [g1, g2]]
+            assert encoded.clauses() == sum([cnf.clauses() for cnf in placed], [])
+            for name in ["v3", "a200L", "i100R"]:
+                assert pool.v_to_id(name) == encoded_pool.v_to_id(name)
+
+
+def test_fragment_reused_across_tags_and_offsets():
+    bubble_left = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    bubble_right = Graph("./tests/test-data/BubbleSort_4_3.aag", "R")
+    pancake = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    assert FR.graph_fragment(bubble_left) is FR.graph_fragment(bubble_right)
+
+    # the same fragment on the left of one miter and on the right of another
+    assert EQ.validate_naively(
+        bubble_left, pancake, miter=MiterInstance(bubble_left, pancake)
+    )
+    pancake_left = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    assert EQ.validate_naively(
+        pancake_left, bubble_right, miter=MiterInstance(pancake_left, bubble_right)
+    )
+
+    pool = FB.NodePool(start_from=50)
+    cnf = FR.make_fragment_formula(bubble_right, pool)
+    assert np.abs(cnf.lits).min() >= 50
+    assert cnf.n_vars == pool.n_vars
+
+
+def test_fragment_disk_cache(tmp_path):
+    g = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    cache_dir = str(tmp_path / "cache")
+    FR.fragments.clear()
+    fresh = FR.graph_fragment(g, cache_dir=cache_dir)
+    FR.fragments.clear()
+    cached = FR.graph_fragment(g, cache_dir=cache_dir)
+
+    assert len(os.listdir(cache_dir)) == 1
+    assert cached is not fresh
+    assert cached.cnf.clauses() == fresh.cnf.clauses()
+    assert np.array_equal(cached.node_lits, fresh.node_lits)
+    assert np.array_equal(cached.output_lits, fresh.output_lits)
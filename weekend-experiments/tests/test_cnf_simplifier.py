@@ -0,0 +1,110 @@
+import sys
+import os
+import itertools
+import random
+
+from pycryptosat import Solver
+from pysat.solvers import Maplesat
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from miter_instance import MiterInstance
+import cnf_simplifier as CS
+import domain_preprocessing as DP
+import eq_checkers as EQ
+import hyperparameters as H
+import main as M
+
+
+def solve(clauses, assumptions):
+    with Maplesat(bootstrap_with=clauses) as solver:
+        if solver.solve(assumptions=assumptions):
+            return solver.get_model()
+        return None
+
+
+def test_simplify_random_formulas():
+    random.seed(42)
+    for _ in range(300):
+        n_vars = random.randint(5, 20)
+        clauses = [
+            [
+                random.choice([-1, 1]) * random.randint(1, n_vars)
+                for _ in range(random.choice([2, 2, 3, 4]))
+            ]
+            for _ in range(random.randint(5, 50))
+        ]
+        frozen = random.sample(range(1, n_vars + 1), 3)
+        simplified = CS.simplify(clauses, frozen)
+
+        for signs in itertools.product([1, -1], repeat=len(frozen)):
+            assumptions = [sign * var for sign, var in zip(signs, frozen)]
+            expected = solve(clauses, assumptions)
+            model = solve(
+                simplified.cnf.clauses(),
+                [simplified.literal(lit) for lit in assumptions],
+            )
+            assert (expected is None) == (model is None)
+            if model is None:
+                continue
+
+            # the model extends to one of the original formula
+            extended = set(simplified.extend_model(model))
+            assert all(any(lit in extended for lit in clause) for clause in clauses)
+            assert all(lit in extended for lit in assumptions)
+
+
+def test_simplified_miter_same_outcomes():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    for test, expected in [("PancakeSort_4_3", True), ("BubbleSort_4_3_faulty", False)]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        miter = MiterInstance(g1, g2, simplify=True)
+        assert len(miter.formula()[0]) < len(miter.cnf())
+        assert miter.formula()[0] is miter.formula()[0]
+        assert EQ.validate_naively(g1, g2, miter=miter) == expected
+        assert EQ.validate_with_native_xors(g1, g2, miter=miter) == expected
+        assert EQ.validate_with_open_xors(g1, g2, miter=miter) == expected
+
+
+def test_pipeline_on_simplified_miter(monkeypatch):
+    # domains through the solver, not enumerated by simulation
+    monkeypatch.setattr(H, "EXHAUSTIVE_MEMORY_BUDGET", 0)
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    buckets_left = DP.find_unbalanced_gates(g1)
+    buckets_right = DP.find_unbalanced_gates(g2)
+    gates = [gate for bucket in buckets_left + buckets_right for gate in bucket]
+    miter = MiterInstance(g1, g2, assumption_gates=gates, simplify=True)
+
+    for mode in [None, "or"]:
+        _, pool = miter.formula(mode)
+        assert all(pool.v_to_id(gate) != 0 for gate in gates)
+    assert M.post_sampling_calculations(
+        miter,
+        g1.name,
+        g2.name,
+        dict(),
+        buckets_left,
+        buckets_right,
+        "all-domains-at-once",
+        None,
+    )
+
+
+def test_refuted_miter_in_cryptominisat():
+    g1 = Graph("./tests/test-data/constants.aag", "L")
+    for test in ["constants", "constants_folded"]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        miter = MiterInstance(g1, g2, simplify=True)
+        # simplification alone refutes the miter, and the refutation
+        # survives a bare zero separated buffer
+        refuted = miter.formula("stairs")[0]
+        assert len(refuted) <= 2
+        solver = Solver()
+        solver.add_clauses(refuted.zero_separated())
+        assert not solver.solve()[0]
+        assert EQ.validate_naively_stairs(g1, g2, miter=miter)
+        assert EQ.validate_with_native_xors(g1, g2, miter=miter)
@@ -0,0 +1,51 @@
+import gzip
+import sys
+import os
+
+from pysat.formula import CNF
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from miter_instance import MiterInstance
+import cnf_writer as W
+import flat_cnf as F
+
+
+def test_dimacs_round_trip(tmp_path):
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    cnf = MiterInstance(g1, g2).miter_cnf()
+
+    for name in ["miter.cnf", "miter.cnf.gz", "miter.cnf.xz"]:
+        filename = str(tmp_path / name)
+        W.write_dimacs(cnf, filename)
+        loaded = CNF(from_file=filename)
+        assert loaded.clauses == cnf.clauses()
+        assert loaded.nv == cnf.n_vars
+
+
+def test_icnf_streams_cubes_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(W, "CHUNK_LITS", 4)
+    monkeypatch.setattr(W, "CHUNK_CUBES", 2)
+    cnf = F.FlatCNF.from_clauses([[1, -2], [-10, 2, 3], [123456], [-1]])
+    cubes = [[1, -3], [-1, 2, 3], [-100], [7, 8]]
+
+    filename = str(tmp_path / "test.icnf.gz")
+    W.write_icnf(cnf, (cube for cube in cubes), filename)
+
+    with gzip.open(filename, "rt") as f:
+        lines = f.read().splitlines()
+    assert lines == [
+        "p inccnf",
+        "1 -2 0",
+        "-10 2 3 0",
+        "123456 0",
+        "-1 0",
+        "a 1 -3 0",
+        "a -1 2 3 0",
+        "a -100 0",
+        "a 7 8 0",
+    ]
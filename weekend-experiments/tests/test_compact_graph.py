@@ -0,0 +1,82 @@
+import sys
+import os
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from compact_graph import CompactGraph, as_compact
+import formula_builder as FB
+import domain_preprocessing as DP
+
+
+AIG_FILES = [
+    "./tests/test-data/small-graph-1.aag",
+    "./tests/test-data/small-graph-2.aag",
+    "./tests/test-data/BubbleSort_4_3.aag",
+    "./tests/test-data/PancakeSort_4_3.aag",
+]
+
+
+def test_compact_graph_mirrors_graph():
+    for aig_file in AIG_FILES:
+        g = Graph(aig_file, "L")
+        for cg in [CompactGraph.from_file(aig_file, "L"), as_compact(g)]:
+            assert cg.node_names == g.node_names
+            assert cg.n_inputs == g.n_inputs
+            assert cg.n_outputs == g.n_outputs
+            assert cg.output_name_to_node_name == g.output_name_to_node_name
+
+            for node_id, name in enumerate(g.node_names):
+                assert cg.node_id(name) == node_id
+                assert cg.children[name] == g.children[name]
+                assert cg.parents[name] == g.parents[name]
+                assert cg.depth[node_id] == g.node_to_depth[name]
+                assert cg.level[node_id] == g.node_to_level[name]
+
+
+def test_name_views_built_once():
+    cg = CompactGraph.from_file("./tests/test-data/BubbleSort_4_3.aag", "L")
+    assert cg.node_names is cg.node_names
+    assert cg.children is cg.children
+    assert cg.output_name_to_node_name is cg.output_name_to_node_name
+    assert cg.source_name_to_lit is cg.source_name_to_lit
+
+
+def test_node_id_without_tag():
+    cg = CompactGraph.from_file("./tests/test-data/BubbleSort_4_3.aag", "")
+    for node_id, name in enumerate(cg.node_names):
+        assert cg.node_id(name) == node_id
+
+
+def test_compact_graph_encodes_same_formula():
+    for aig_file in AIG_FILES:
+        g = Graph(aig_file, "L")
+        cg = CompactGraph.from_file(aig_file, "L")
+
+        pool, compact_pool = FB.TPoolHolder(), FB.TPoolHolder()
+        formula = FB.make_formula_from_my_graph(g, pool)
+        compact_formula = FB.make_formula_from_my_graph(cg, compact_pool)
+        assert formula.clauses == compact_formula.clauses
+
+        for input in range(0, 2 ** g.n_inputs, 97):
+            assert cg.calculate_schema_on_inputs(input) == g.calculate_schema_on_inputs(
+                input
+            )
+
+
+def test_compact_graph_same_domains():
+    aig_file = "./tests/test-data/BubbleSort_4_3.aag"
+    g = Graph(aig_file, "L")
+    cg = CompactGraph.from_file(aig_file, "L")
+
+    buckets = DP.find_unbalanced_gates(g)
+    assert DP.find_unbalanced_gates(cg) == buckets
+
+    domains, shift = DP.calculate_domain_saturations(g, buckets[:3], "L", 1)
+    compact_domains, compact_shift = DP.calculate_domain_saturations(
+        cg, buckets[:3], "L", 1
+    )
+    assert domains == compact_domains
+    assert shift == compact_shift
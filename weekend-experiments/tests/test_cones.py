@@ -0,0 +1,62 @@
+import sys
+import os
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+import cones as C
+import eq_checkers as EQ
+import formula_builder as FB
+
+
+def naive_cone(g, names):
+    cone = set()
+    stack = list(names)
+    while len(stack) > 0:
+        name = stack.pop()
+        if name in cone:
+            continue
+        cone.add(name)
+        stack += g.children[name]
+    return cone
+
+
+def test_cones_same_as_naive_traversal():
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+
+    for output_id in range(g.n_outputs):
+        output_name = g.output_name_to_node_name[f"o{output_id}"]
+        expected = naive_cone(g, [output_name])
+        cone = C.output_cone_ids(g, [output_id])
+        assert set(g.node_names[node_id] for node_id in cone) == expected
+
+    gates = [g.node_names[-1], g.node_names[len(g.node_names) // 2]]
+    mask = C.cone_mask(g, gates)
+    assert mask.sum() == len(naive_cone(g, gates))
+    assert all(mask[C.to_node_ids(g, gates)])
+
+
+def test_sub_miters_smaller_than_full_miter():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+
+    full_cnf = FB.make_united_miter_from_two_graphs(g1, g2, FB.PicklablePool())
+    sub_cnf = FB.generate_sub_miter(g1, g2, [0], FB.NodePool())
+    assert len(sub_cnf) < len(full_cnf.clauses)
+
+
+def test_output_cones_equivalence():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    assert EQ.validate_by_output_cones(g1, g2, workers=1)
+    assert EQ.validate_by_output_cones(g1, g2, group_size=5, workers=2)
+
+    for test in ["BubbleSort_4_3", "PancakeSort_4_3"]:
+        g1 = Graph(f"./tests/test-data/{test}.aag", "L")
+        g2 = Graph(f"./tests/test-data/{test}_faulty.aag", "R")
+        metainfo = dict()
+        assert not EQ.validate_by_output_cones(g1, g2, metainfo, workers=1)
+        assert len(metainfo["non_equivalent_outputs"]) == 1
+        assert not EQ.validate_by_output_cones(g1, g2, workers=2)
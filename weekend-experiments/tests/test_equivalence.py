@@ -25,6 +25,7 @@ def test_two_schemas_equivalent_naively():
         assert EQ.validate_naively(g1, g2)
         assert EQ.validate_with_open_xors(g1, g2)
         assert EQ.validate_naively_stairs(g1, g2)
+        assert EQ.validate_with_native_xors(g1, g2)
 
 
 def test_schema_not_equivalent_to_faulty_variant():
@@ -43,3 +44,15 @@ def test_schema_not_equivalent_to_faulty_variant():
         assert not EQ.validate_naively(g1, g2)
         assert not EQ.validate_with_open_xors(g1, g2)
         assert not EQ.validate_naively_stairs(g1, g2)
+        assert not EQ.validate_with_native_xors(g1, g2)
+
+
+def test_exhaustive_equivalence():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    assert EQ.validate_exhaustively(g1, g2)
+
+    for test in ["BubbleSort_4_3", "PancakeSort_4_3"]:
+        g1 = Graph(f"./tests/test-data/{test}.aag", "L")
+        g2 = Graph(f"./tests/test-data/{test}_faulty.aag", "R")
+        assert not EQ.validate_exhaustively(g1, g2)
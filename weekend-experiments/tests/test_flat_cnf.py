@@ -0,0 +1,113 @@
+import sys
+import os
+
+from pycryptosat import Solver
+from pysat.solvers import Maplesat as PysatSolver
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from flat_cnf import FlatCNF
+import formula_builder as FB
+import utils as U
+import domain_preprocessing as DP
+
+
+# Looks names up in a `NodePool`, so the name-based encoder numbers
+# variables the same way as the flat one
+class NamesThroughPool:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def v_to_id(self, name):
+        return self.pool.v_to_id(name)
+
+
+def test_flat_encoding_same_as_name_based():
+    for test in ["small-graph-2", "BubbleSort_4_3", "PancakeSort_4_3", "constants"]:
+        g = Graph(f"./tests/test-data/{test}.aag", "L")
+        pool = FB.NodePool(start_from=5, fold_inverters=False)
+        flat = FB.make_flat_formula(g, pool)
+
+        formula = FB.make_formula_from_my_graph(g, NamesThroughPool(pool))
+        assert flat.clauses() == formula.clauses
+
+        for var in range(5, pool.n_vars + 1):
+            assert pool.v_to_id(pool.id_to_v(var)) == var
+
+
+def test_flat_cnf_layout():
+    clauses = [[1, -2], [3], [-1, 2, -3]]
+    cnf = FlatCNF.from_clauses(clauses[:2])
+    cnf.append(clauses[2])
+
+    assert len(cnf) == 3
+    assert cnf.n_vars == 3
+    assert cnf.clauses() == clauses
+    assert cnf.zero_separated().tolist() == [1, -2, 0, 3, 0, -1, 2, -3, 0]
+    assert FlatCNF.concatenate([cnf, FlatCNF.from_clauses([[4]])]).clauses() == (
+        clauses + [[4]]
+    )
+
+
+def test_empty_clause_loads_into_both_solvers():
+    cnf = FlatCNF.from_clauses([[1, 2], [], [-1]])
+
+    solver = Solver()
+    cnf.add_to_solver(solver)
+    assert not solver.solve()[0]
+
+    with PysatSolver() as solver:
+        cnf.add_to_solver(solver)
+        assert not solver.solve()
+
+
+def test_flat_miter_loads_into_both_solvers():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    for test, expected in [("PancakeSort_4_3", False), ("BubbleSort_4_3_faulty", True)]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        shared_cnf, pool = U.prepare_flat_miter_from_two_graphs(g1, g2)
+        final_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
+
+        solver = Solver()
+        final_cnf.add_to_solver(solver)
+        assert solver.solve()[0] == expected
+
+        with PysatSolver() as solver:
+            final_cnf.add_to_solver(solver)
+            assert solver.solve() == expected
+
+
+def test_folded_inverters_keep_domains():
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    not_names = [name for name in g.node_names if name.startswith("i")]
+    and_names = [name for name in g.node_names if name.startswith("a")]
+    buckets = [not_names[:4] + and_names[-4:], not_names[-6:]]
+
+    pool = FB.NodePool(fold_inverters=False)
+    formula = FB.make_flat_formula(g, pool)
+    folded_pool = FB.NodePool(fold_inverters=True)
+    folded_formula = FB.make_flat_formula(g, folded_pool)
+
+    assert folded_pool.n_vars == pool.n_vars - len(not_names)
+    for name in not_names:
+        child = g.children[name][0]
+        assert folded_pool.v_to_id(name) == -folded_pool.v_to_id(child)
+
+    assert DP.calculate_domains_with_solver(
+        formula, pool, buckets
+    ) == DP.calculate_domains_with_solver(folded_formula, folded_pool, buckets)
+
+
+def test_folded_miter_same_outcome():
+    g1 = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    for test, expected in [("BubbleSort_4_3", False), ("PancakeSort_4_3_faulty", True)]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        pool = FB.NodePool(fold_inverters=True)
+        shared_cnf = FB.make_flat_miter_from_two_graphs(g1, g2, pool)
+        final_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
+
+        with PysatSolver(bootstrap_with=final_cnf) as solver:
+            assert solver.solve() == expected
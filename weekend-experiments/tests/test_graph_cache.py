@@ -0,0 +1,45 @@
+import sys
+import os
+import shutil
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+import graph_cache as GC
+
+
+def test_cached_graph_same_as_parsed(tmp_path):
+    aig_file = "./tests/test-data/PancakeSort_4_3.aag"
+    cache_dir = str(tmp_path / "cache")
+
+    g = Graph(aig_file, "L")
+    for _ in range(2):  # first call fills the cache, second one reads it
+        cached = GC.load_graph(aig_file, "L", cache_dir)
+
+        assert cached.node_names == g.node_names
+        for name in g.node_names:
+            assert cached.children[name] == g.children[name]
+            assert cached.parents[name] == g.parents[name]
+        assert dict(zip(cached.node_names, cached.depth.tolist())) == g.node_to_depth
+        assert dict(zip(cached.node_names, cached.level.tolist())) == g.node_to_level
+        assert cached.output_name_to_node_name == g.output_name_to_node_name
+        assert cached.source_name_to_lit == g.source_name_to_lit
+
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_cache_invalidated_on_change(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    aig_file = str(tmp_path / "schema.aag")
+
+    shutil.copy("./tests/test-data/BubbleSort_4_3.aag", aig_file)
+    assert GC.load_graph(aig_file, "L", cache_dir).n_outputs == 12
+    assert GC.load_graph(aig_file, "R", cache_dir).n_outputs == 12
+
+    shutil.copy("./tests/test-data/small-graph-1.aag", aig_file)
+    g = GC.load_graph(aig_file, "L", cache_dir)
+    assert g.node_names == Graph(aig_file, "L").node_names
+
+    assert len(os.listdir(cache_dir)) == 3
@@ -0,0 +1,69 @@
+import sys
+import os
+import random
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from miter_instance import MiterInstance
+import domain_preprocessing as DP
+import eq_checkers as EQ
+import formula_builder as FB
+import lut_mapping as LM
+
+
+# every assignment satisfies the clauses iff root == f(leaves)
+def template_is_exact(m, tt):
+    template, lengths = LM.lut_clause_template(m, tt)
+    for pattern in range(1 << m):
+        for root in [0, 1]:
+            values = [root] + [pattern >> i & 1 for i in range(m)]
+            satisfied = True
+            start = 0
+            for length in lengths:
+                clause = template[start : start + length]
+                start += length
+                satisfied &= any(values[src] == (sign > 0) for src, sign in clause)
+            if satisfied != (root == (tt >> pattern & 1)):
+                return False
+    return True
+
+
+def test_lut_clause_templates():
+    random.seed(42)
+    for tt in range(16):
+        assert template_is_exact(2, tt)
+    for m in [0, 1, 4, 6]:
+        for _ in range(20):
+            assert template_is_exact(m, random.getrandbits(1 << m))
+
+    # and gate: the usual three clauses
+    assert LM.lut_clause_template(2, 0b1000)[1] == [2, 2, 3]
+
+
+def test_lut_miter_same_outcomes():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    for test, expected in [("PancakeSort_4_3", True), ("BubbleSort_4_3_faulty", False)]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        full = MiterInstance(g1, g2, encoding="tseitin")
+        for fold_inverters in [False, True]:
+            pool = FB.NodePool(fold_inverters=fold_inverters)
+            miter = MiterInstance(g1, g2, pool, encoding="lut")
+            assert miter.pool.n_vars < full.pool.n_vars
+            assert len(miter.miter_cnf("or")) < len(full.miter_cnf("or"))
+            assert EQ.validate_naively(g1, g2, miter=miter) == expected
+            assert EQ.validate_with_native_xors(g1, g2, miter=miter) == expected
+
+
+def test_lut_domains_keep_bucket_gates():
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    buckets = DP.find_unbalanced_gates(g)
+    gates = [gate for bucket in buckets for gate in bucket]
+
+    pool = FB.NodePool()
+    formula = LM.make_lut_formula(g, pool, gates, include_outputs=False, k=6)
+    assert DP.calculate_domains_with_solver(
+        formula, pool, buckets
+    ) == DP.calculate_exhaustive_domains(g, buckets)
@@ -0,0 +1,90 @@
+import sys
+import os
+
+import pysat.formula
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from miter_instance import MiterInstance
+import domain_preprocessing as DP
+import eq_checkers as EQ
+import formula_builder as FB
+import main as M
+import utils as U
+
+
+def test_miter_instance_reused_across_checks():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    miter = MiterInstance(g1, g2)
+    n_shared_clauses = len(miter.shared_cnf)
+
+    assert EQ.validate_naively(g1, g2, miter=miter)
+    assert EQ.validate_naively_stairs(g1, g2, miter=miter)
+    assert EQ.validate_with_open_xors(g1, g2, miter=miter)
+    assert EQ.validate_with_native_xors(g1, g2, miter=miter)
+
+    assert len(miter.shared_cnf) == n_shared_clauses
+    assert miter.miter_cnf("or") is miter.miter_cnf("or")
+    assert len(miter.miter_cnf("or")) == n_shared_clauses + 4 * g1.n_outputs + 1
+    assert len(set(miter.xor_vars())) == g1.n_outputs
+
+    faulty = Graph("./tests/test-data/PancakeSort_4_3_faulty.aag", "R")
+    assert not EQ.validate_naively(g2, faulty, miter=MiterInstance(g2, faulty))
+
+
+def test_native_xors_with_folded_inverters():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    for test, expected in [("PancakeSort_4_3", True), ("BubbleSort_4_3_faulty", False)]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        miter = MiterInstance(g1, g2, FB.NodePool(fold_inverters=True))
+        assert any(left < 0 or right < 0 for left, right in miter.output_lits)
+        assert EQ.validate_with_native_xors(g1, g2, miter=miter) == expected
+        assert EQ.validate_naively(g1, g2, miter=miter) == expected
+
+
+def test_miter_scheme_leaves_shared_cnf_alone():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+
+    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
+    n_clauses = len(shared_cnf)
+    or_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2, mode="or")
+    stairs_cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2, mode="stairs")
+    assert len(shared_cnf) == n_clauses
+    assert len(or_cnf) == n_clauses + 4 * g1.n_outputs + 1
+    assert len(stairs_cnf) == n_clauses + 4 * g1.n_outputs + 3 * (g1.n_outputs - 1) + 1
+
+    # the formula comes back as the kind it was passed in
+    assert isinstance(or_cnf, list)
+    pysat_cnf = pysat.formula.CNF(from_clauses=shared_cnf)
+    or_pysat_cnf = FB.generate_miter_scheme(pysat_cnf, pool, g1, g2, mode="or")
+    assert isinstance(or_pysat_cnf, pysat.formula.CNF)
+    assert or_pysat_cnf.clauses == or_cnf
+
+    # no pool shared between calls through a default argument
+    first = FB.make_united_miter_from_two_graphs(g1, g2)
+    second = FB.make_united_miter_from_two_graphs(g1, g2)
+    assert first.clauses == second.clauses
+
+
+def test_pipeline_on_one_miter_instance():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    miter = MiterInstance(g1, g2)
+
+    metainfo = dict()
+    assert M.post_sampling_calculations(
+        miter,
+        g1.name,
+        g2.name,
+        metainfo,
+        DP.find_unbalanced_gates(g1),
+        DP.find_unbalanced_gates(g2),
+        "all-domains-at-once",
+        None,
+    )
+    assert metainfo["outcome"]
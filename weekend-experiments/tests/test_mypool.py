@@ -6,7 +6,8 @@ parent = os.path.dirname(current)
 sys.path.append(parent)
 
 from graph import Graph
-from formula_builder import PicklablePool, TPoolHolder
+from formula_builder import NodePool, PicklablePool, TPoolHolder
+import compact_graph as CG
 
 
 def test_my_pool_same_as_pysat_pool():
@@ -26,3 +27,13 @@ def test_my_pool_same_as_pysat_pool():
         assert my_pool.id_to_v(id) == pysat_pool.id_to_v(id)
 
 
+def test_node_pool_names_without_tag():
+    cg = CG.CompactGraph.from_file("./tests/test-data/BubbleSort_4_3.aag", "")
+    pool = NodePool()
+    node_vars = pool.add_graph(cg)
+    n_vars = pool.n_vars
+
+    for node_id, name in enumerate(cg.node_names):
+        assert pool.v_to_id(name) == node_vars[node_id]
+    # names of encoded gates never allocate fresh variables
+    assert pool.n_vars == n_vars
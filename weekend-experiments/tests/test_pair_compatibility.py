@@ -0,0 +1,77 @@
+import sys
+import os
+
+import numpy as np
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+import compact_graph as CG
+import pair_compatibility as PC
+import simulation as S
+
+
+def test_pairs_match_brute_force():
+    g1 = CG.as_compact(Graph("./tests/test-data/BubbleSort_4_3.aag", "L"))
+    g2 = CG.as_compact(Graph("./tests/test-data/PancakeSort_4_3.aag", "R"))
+    n_patterns = 300
+    compat = PC.find_pair_compatibility(g1, g2, n_patterns)
+
+    patterns = S.random_patterns(g1.n_inputs, n_patterns)
+    bits = [
+        np.unpackbits(
+            S.simulate(cg, patterns)[ids].view(np.uint8), axis=1, bitorder="little"
+        )[:, :n_patterns].astype(bool)
+        for cg, ids in [(g1, compat.left_ids), (g2, compat.right_ids)]
+    ]
+    n_constant_pairs = 0
+    for left_value in [0, 1]:
+        for right_value in [0, 1]:
+            left = bits[0] == left_value
+            right = bits[1] == right_value
+            seen = (left.astype(np.int64) @ right.T.astype(np.int64)) > 0
+            # values a node never takes alone are not paired
+            expected = ~seen & left.any(axis=1)[:, None] & right.any(axis=1)[None, :]
+            rows, columns = np.nonzero(expected)
+
+            left_ids, right_ids = compat.pairs(left_value, right_value)
+            assert np.array_equal(left_ids, compat.left_ids[rows])
+            assert np.array_equal(right_ids, compat.right_ids[columns])
+            for l, r in zip(left_ids[:50].tolist(), right_ids[:50].tolist()):
+                assert compat.never_seen(l, left_value, r, right_value)
+
+            # with the pairs of nodes that never took their value, every
+            # combination never seen comes out exactly once
+            constant_left, constant_right = compat.constant_pairs(
+                left_value, right_value
+            )
+            n_constant_pairs += len(constant_left)
+            candidates = list(zip(left_ids.tolist(), right_ids.tolist()))
+            candidates += list(zip(constant_left.tolist(), constant_right.tolist()))
+            rows, columns = np.nonzero(~seen)
+            all_unseen = zip(compat.left_ids[rows].tolist(), compat.right_ids[columns])
+            assert len(candidates) == len(set(candidates))
+            assert set(candidates) == set(all_unseen)
+    assert n_constant_pairs > 0
+
+
+def test_equivalent_outputs_never_differ():
+    g1 = CG.as_compact(Graph("./tests/test-data/BubbleSort_4_3.aag", "L"))
+    g2 = CG.as_compact(Graph("./tests/test-data/PancakeSort_4_3.aag", "R"))
+    compat = PC.find_pair_compatibility(
+        g1, g2, 1024, left_ids=g1.outputs, right_ids=g2.outputs
+    )
+    for l, r in zip(g1.outputs.tolist(), g2.outputs.tolist()):
+        assert compat.never_seen(l, 1, r, 0)
+        assert compat.never_seen(l, 0, r, 1)
+        assert not compat.never_seen(l, 1, r, 1)
+
+    values = np.ones(len(g1.outputs), dtype=np.int64)
+    left_ids, right_ids = compat.cube_conflicts(
+        g1.outputs, values, g2.outputs, 1 - values
+    )
+    assert set(zip(g1.outputs.tolist(), g2.outputs.tolist())) <= set(
+        zip(left_ids.tolist(), right_ids.tolist())
+    )
@@ -1,11 +1,16 @@
 import sys
 import os
+
+import numpy as np
   
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
 
 from graph import Graph
+from aig_parser import Parser
+import aig_writer as W
+import eq_checkers as EQ
 
 
 def test_graphs_equal_after_reading_and_dumping():
@@ -31,3 +36,118 @@ def test_graphs_equal_after_reading_and_dumping():
             name_1 = g1.output_name_to_node_name[f"o{output_id}"]
             name_2 = g2.output_name_to_node_name[f"o{output_id}"]
             assert outputs_1[name_1] == outputs_2[name_2]
+
+
+def test_binary_aig_parsed_same_as_ascii():
+    lit_parents, lit_children, inputs, outputs = Parser().parse(
+        "./tests/test-data/small-graph-1.aag"
+    )
+    lit_parents_b, lit_children_b, inputs_b, outputs_b = Parser().parse(
+        "./tests/test-data/small-graph-1.aig"
+    )
+    assert inputs == inputs_b
+    assert outputs == outputs_b
+    # binary AIGER forces the larger child first, so only compare edge sets
+    for lit in lit_children:
+        assert set(lit_children[lit]) == set(lit_children_b[lit])
+        assert set(lit_parents[lit]) == set(lit_parents_b[lit])
+
+
+def test_binary_aig_graph_computes_same_outputs():
+    for test in ["BubbleSort_4_3", "PancakeSort_4_3", "small-graph-2"]:
+        g1 = Graph(f"./tests/test-data/{test}.aag", "L")
+        g2 = Graph(f"./tests/test-data/{test}.aig", "R")
+
+        assert g1.n_inputs == g2.n_inputs
+        assert g1.n_outputs == g2.n_outputs
+        for input in range(2 ** g1.n_inputs):
+            outputs_1 = g1.calculate_schema_on_inputs(input)
+            outputs_2 = g2.calculate_schema_on_inputs(input)
+            for output_id in range(g1.n_outputs):
+                name_1 = g1.output_name_to_node_name[f"o{output_id}"]
+                name_2 = g2.output_name_to_node_name[f"o{output_id}"]
+                assert outputs_1[name_1] == outputs_2[name_2]
+
+
+def test_unordered_file_same_outputs(tmp_path):
+    aig_file = "./tests/test-data/BubbleSort_4_3.aag"
+    with open(aig_file, "r") as f:
+        lines = f.readlines()
+
+    # inputs and outputs take 24 lines after the header, shuffle the and gates
+    reversed_file = tmp_path / "reversed.aag"
+    with open(reversed_file, "w") as f:
+        f.writelines(lines[:25] + list(reversed(lines[25:])))
+
+    g1 = Graph(aig_file, "L")
+    g2 = Graph(str(reversed_file), "R")
+
+    assert len(g1.node_names) == len(g2.node_names)
+    for input in range(0, 2 ** g1.n_inputs, 7):
+        outputs_1 = g1.calculate_schema_on_inputs(input)
+        outputs_2 = g2.calculate_schema_on_inputs(input)
+        for output_id in range(g1.n_outputs):
+            name_1 = g1.output_name_to_node_name[f"o{output_id}"]
+            name_2 = g2.output_name_to_node_name[f"o{output_id}"]
+            assert outputs_1[name_1] == outputs_2[name_2]
+
+
+def test_gate_names_match_original_numbering():
+    g = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    # names given by the breadth-first sort gates have always been dumped with
+    expected = {"a0L": 50, "a1L": 30, "a2L": 42, "a50L": 108, "a209L": 444}
+    expected.update({"i0L": 5, "i178L": 445})
+    for name, lit in expected.items():
+        assert g.source_name_to_lit[name] == lit
+
+
+def test_constants_are_folded():
+    g = Graph("./tests/test-data/constants.aag", "L")
+
+    # x & 0, x & 1, x & !x and everything fed by them are gone,
+    # one and gate and a constant for the tied outputs are left
+    assert len([name for name in g.node_names if name.startswith("a")]) == 1
+    assert len([name for name in g.node_names if name.startswith("c")]) == 1
+
+    for input in range(2 ** g.n_inputs):
+        a, b = input & 1, (input >> 1) & 1
+        values = g.calculate_schema_on_inputs(input)
+        outputs = [
+            values[g.output_name_to_node_name[f"o{output_id}"]]
+            for output_id in range(g.n_outputs)
+        ]
+        assert outputs == [False, True, not (a and b), not a, False]
+
+
+def test_constants_folded_while_streaming_binary(tmp_path):
+    # constants.aag is numbered like a binary file, only the children of two
+    # gates have to be swapped into (larger, smaller)
+    ands = [(6, 2, 0), (8, 2, 1), (10, 5, 4), (12, 8, 4), (14, 13, 10)]
+    deltas = [[lit - left, left - right] for lit, left, right in ands]
+    binary_file = tmp_path / "constants.aig"
+    with open(binary_file, "wb") as f:
+        f.write(b"aig 7 2 0 5 5\n6\n1\n13\n9\n0\n")
+        f.write(W.encode_varints(np.array(deltas).reshape(-1)))
+
+    ascii_parser = Parser()
+    ascii_parsed = ascii_parser.parse("./tests/test-data/constants.aag")
+    binary_parser = Parser()
+    binary_parsed = binary_parser.parse(str(binary_file))
+    assert binary_parser.n_folded_ands == ascii_parser.n_folded_ands == 4
+    assert binary_parsed[2:] == ascii_parsed[2:]
+
+    g1 = Graph("./tests/test-data/constants.aag", "L")
+    g2 = Graph(str(binary_file), "L")
+    assert g2.node_names == g1.node_names
+    assert g2.source_name_to_lit == g1.source_name_to_lit
+
+
+def test_constant_outputs_in_miter():
+    g1 = Graph("./tests/test-data/constants.aag", "L")
+    g2 = Graph("./tests/test-data/constants_folded.aag", "R")
+    assert EQ.validate_naively(g1, g2)
+    assert EQ.validate_exhaustively(g1, g2)
+
+    g3 = Graph("./tests/test-data/constants_faulty.aag", "R")
+    assert not EQ.validate_naively(g1, g3)
+    assert not EQ.validate_exhaustively(g1, g3)
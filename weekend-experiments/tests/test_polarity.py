@@ -0,0 +1,57 @@
+import sys
+import os
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from miter_instance import MiterInstance
+import domain_preprocessing as DP
+import eq_checkers as EQ
+import formula_builder as FB
+import polarity as PG
+
+
+def test_polarities_of_outputs_cover_all_gates():
+    g = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    polarity = PG.node_polarities(g, [])
+    counts = PG.count_polarities(polarity)
+    assert counts["both"] >= g.n_outputs
+    assert sum(counts.values()) == len(polarity)
+
+    # without outputs and roots nothing is needed
+    assert PG.count_polarities(PG.node_polarities(g, [], False))["unused"] == len(
+        polarity
+    )
+
+
+def test_polarity_aware_miter_same_outcomes():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    for test, expected in [("PancakeSort_4_3", True), ("BubbleSort_4_3_faulty", False)]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        full = MiterInstance(g1, g2, polarity_aware=False)
+        for pool in [None, FB.NodePool(fold_inverters=True)]:
+            miter = MiterInstance(g1, g2, pool, polarity_aware=True)
+            assert len(miter.miter_cnf("or")) < len(full.miter_cnf("or"))
+            assert len(miter.miter_cnf("stairs")) < len(full.miter_cnf("stairs"))
+            assert EQ.validate_naively(g1, g2, miter=miter) == expected
+            assert EQ.validate_naively_stairs(g1, g2, miter=miter) == expected
+            assert EQ.validate_with_native_xors(g1, g2, miter=miter) == expected
+
+
+def test_polarity_aware_domains_unchanged():
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    buckets = DP.find_unbalanced_gates(g)
+    gates = [gate for bucket in buckets for gate in bucket]
+    expected = DP.calculate_exhaustive_domains(g, buckets)
+
+    full_pool = FB.NodePool()
+    full = FB.make_flat_formula(g, full_pool)
+    pool = FB.NodePool()
+    polarity = PG.node_polarities(g, gates, include_outputs=False)
+    reduced = FB.make_flat_formula(g, pool, polarity=polarity)
+    assert len(reduced) < len(full)
+
+    assert DP.calculate_domains_with_solver(full, full_pool, buckets) == expected
+    assert DP.calculate_domains_with_solver(reduced, pool, buckets) == expected
@@ -0,0 +1,175 @@
+import sys
+import os
+import random
+
+import numpy as np
+from pysat.solvers import Maplesat as PysatSolver
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+import formula_builder as FB
+import simulation as S
+import domain_preprocessing as DP
+import hyperparameters as H
+
+
+def test_packed_simulation_same_as_single_input():
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+
+    random.seed(1)
+    inputs = random.sample(range(2 ** g.n_inputs), 300)
+    signatures = S.simulate(g, S.pack_inputs(inputs, g.n_inputs))
+
+    for pattern_id, input in enumerate(inputs):
+        values = g.calculate_schema_on_inputs(input)
+        word, bit = divmod(pattern_id, S.WORD_BITS)
+        for node_id, name in enumerate(g.node_names):
+            assert values[name] == bool((int(signatures[node_id][word]) >> bit) & 1)
+
+
+def test_popcounts_same_as_counting():
+    g = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+
+    inputs = list(range(0, 2 ** g.n_inputs, 3))
+    counts = S.count_true_on_inputs(g, inputs)
+
+    expected = [0] * len(g.node_names)
+    for input in inputs:
+        values = g.calculate_schema_on_inputs(input)
+        for node_id, name in enumerate(g.node_names):
+            expected[node_id] += values[name]
+
+    assert counts.tolist() == expected
+
+
+def test_miter_simulation_finds_faulty_outputs():
+    for test in ["BubbleSort_4_3", "PancakeSort_4_3"]:
+        g1 = Graph(f"./tests/test-data/{test}.aag", "L")
+        g2 = Graph(f"./tests/test-data/{test}_faulty.aag", "R")
+        patterns = S.pack_inputs(list(range(2 ** g1.n_inputs)), g1.n_inputs)
+
+        _, _, output_xors = S.simulate_miter(g1, g2, patterns)
+        assert S.popcounts(output_xors).sum() > 0
+
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    patterns = S.random_patterns(g1.n_inputs, 10000)
+    _, _, output_xors = S.simulate_miter(g1, g2, patterns)
+    assert S.popcounts(output_xors).sum() == 0
+
+
+def test_exhaustive_domains_same_as_solver(monkeypatch):
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    buckets = DP.find_unbalanced_gates(g)[:4]
+
+    exact_domains, exact_shift = DP.calculate_domain_saturations(g, buckets, "L", 1)
+
+    monkeypatch.setattr(H, "EXHAUSTIVE_MEMORY_BUDGET", 0)
+    assert not S.fits_exhaustive(g)
+    sat_domains, sat_shift = DP.calculate_domain_saturations(g, buckets, "L", 1)
+
+    assert exact_domains == sat_domains
+    assert exact_shift == sat_shift
+
+
+def test_simulation_prefiltered_domains_same_as_solver():
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    buckets = DP.find_unbalanced_gates(g)[:4]
+    pool = FB.NodePool()
+    formula = FB.make_flat_formula(g, pool)
+
+    expected = DP.calculate_domains_with_solver(formula, pool, buckets)
+    for n_patterns in [0, 64, 1000]:
+        assert (
+            DP.calculate_domains_with_simulation(g, formula, pool, buckets, n_patterns)
+            == expected
+        )
+
+
+def test_domain_strategies_same_domains(monkeypatch):
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    buckets = DP.find_unbalanced_gates(g)[:4]
+    monkeypatch.setattr(H, "EXHAUSTIVE_MEMORY_BUDGET", 0)
+
+    results = dict()
+    for strategy in DP.DOMAIN_STRATEGIES:
+        monkeypatch.setattr(H, "DOMAIN_STRATEGY", strategy)
+        stats = list()
+        domains, _ = DP.calculate_domain_saturations(g, buckets, "L", 1, stats=stats)
+        results[strategy] = (domains, stats)
+
+    expected, _ = results["assumptions"]
+    for strategy, (domains, stats) in results.items():
+        assert domains == expected
+        assert [record["domain_size"] for record in stats] == [
+            len(domain) for _, _, domain, _ in expected
+        ]
+        assert all(record["tag"] == "L" for record in stats)
+
+    # enumeration costs one call per bitvector of the domain and one more
+    _, allsat_stats = results["allsat"]
+    for record in allsat_stats:
+        assert record["solver_calls"] <= record["domain_size"] + 1
+        assert record["solver_calls"] < 2 ** record["bucket_size"]
+
+
+def test_allsat_skips_buckets_missing_from_model():
+    # variable 5 is in no clause, models of the first solver stop at guard 3
+    later_found = set()
+    later = [(np.array([5]), np.array([1]), later_found)]
+    with PysatSolver(bootstrap_with=[[1, 2]]) as solver:
+        found = set()
+        DP.allsat_domain(solver, np.array([1, 2]), np.array([1, 2]), 3, found, later)
+    assert found == {1, 2, 3}
+    assert later_found == set()
+
+    with PysatSolver(bootstrap_with=[[4, 5]]) as solver:
+        DP.allsat_domain(solver, np.array([5]), np.array([1]), 6, later_found)
+    assert later_found == {0, 1}
+
+
+def test_parallel_domains_same_as_serial():
+    g = Graph("./tests/test-data/PancakeSort_4_3.aag", "L")
+    buckets = DP.find_unbalanced_gates(g)[:5]
+    pool = FB.NodePool()
+    formula = FB.make_flat_formula(g, pool)
+
+    for strategy in DP.DOMAIN_STRATEGIES:
+        serial = DP.calculate_domains(g, formula, pool, buckets, strategy, workers=1)
+        for workers in [2, 3]:
+            stats = list()
+            assert (
+                DP.calculate_domains(
+                    g, formula, pool, buckets, strategy, stats, workers
+                )
+                == serial
+            )
+            assert [record["domain_size"] for record in stats] == [
+                len(domain) for _, domain in serial
+            ]
+
+
+def test_correlated_buckets_have_smaller_domains(monkeypatch):
+    g = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    sorted_buckets = DP.find_unbalanced_gates(g)
+    monkeypatch.setattr(H, "BUCKET_FORMATION", "correlated")
+    correlated = DP.find_unbalanced_gates(g)
+
+    assert all(len(bucket) <= H.BUCKET_SIZE for bucket in correlated)
+    assert sorted(gate for bucket in correlated for gate in bucket) == sorted(
+        gate for bucket in sorted_buckets for gate in bucket
+    )
+
+    def total_domain_size(buckets):
+        domains = DP.calculate_exhaustive_domains(g, buckets)
+        return sum(len(domain) for _, domain in domains)
+
+    assert total_domain_size(correlated) < total_domain_size(sorted_buckets)
+
+    # a gate and a copy of it form a bucket with the domain of the gate alone
+    gates = correlated[0][:3]
+    buckets = DP.correlated_buckets(g, gates + gates, bucket_size=2)
+    assert [len(set(bucket)) for bucket in buckets] == [1, 1, 1]
@@ -0,0 +1,37 @@
+import sys
+import os
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from compact_graph import CompactGraph
+import eq_checkers as EQ
+import strash as ST
+
+
+def test_strash_keeps_function_and_shrinks():
+    for test in ["BubbleSort_4_3", "PancakeSort_4_3", "small-graph-2"]:
+        g = Graph(f"./tests/test-data/{test}.aag", "L")
+        reduced, stats = ST.strash(g)
+
+        assert isinstance(reduced, Graph)
+        assert stats["removed"] > 0
+        assert len(reduced.node_names) == stats["nodes_after"]
+        assert EQ.validate_exhaustively(g, reduced)
+
+        # nothing left to merge the second time
+        _, stats = ST.strash(reduced)
+        assert stats["removed"] == 0
+
+
+def test_strashed_miter_still_solves():
+    g1, _ = ST.strash(CompactGraph.from_file("./tests/test-data/BubbleSort_4_3.aag", "L"))
+    g2, _ = ST.strash(CompactGraph.from_file("./tests/test-data/PancakeSort_4_3.aag", "R"))
+    assert EQ.validate_naively(g1, g2)
+
+    g3, _ = ST.strash(
+        CompactGraph.from_file("./tests/test-data/BubbleSort_4_3_faulty.aag", "R")
+    )
+    assert not EQ.validate_naively(g1, g3)
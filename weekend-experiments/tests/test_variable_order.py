@@ -0,0 +1,75 @@
+import sys
+import os
+
+import numpy as np
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from graph import Graph
+from miter_instance import MiterInstance
+import compact_graph as CG
+import eq_checkers as EQ
+import formula_builder as FB
+import simulation as S
+import variable_order as VO
+
+
+def test_every_order_same_miter_outcomes():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    for test, expected in [("PancakeSort_4_3", True), ("BubbleSort_4_3_faulty", False)]:
+        g2 = Graph(f"./tests/test-data/{test}.aag", "R")
+        for order in VO.ORDERS:
+            for fold_inverters in [False, True]:
+                pool = FB.NodePool(fold_inverters=fold_inverters, order=order)
+                miter = MiterInstance(g1, g2, pool)
+                assert EQ.validate_naively(g1, g2, miter=miter) == expected
+            miter = MiterInstance(g1, g2, FB.NodePool(order=order), encoding="lut")
+            assert EQ.validate_naively(g1, g2, miter=miter) == expected
+
+
+def test_orders_number_every_gate_once():
+    g1 = Graph("./tests/test-data/BubbleSort_4_3.aag", "L")
+    g2 = Graph("./tests/test-data/PancakeSort_4_3.aag", "R")
+    for order in VO.ORDERS:
+        pool = FB.NodePool(order=order)
+        MiterInstance(g1, g2, pool)
+        names = [pool.id_to_v(var) for var in range(1, pool.n_vars + 1)]
+        assert len(set(names)) == pool.n_vars
+        assert all(pool.v_to_id(name) == var for var, name in enumerate(names, 1))
+
+
+def test_interleaved_order_follows_depth():
+    g1 = CG.as_compact(Graph("./tests/test-data/BubbleSort_4_3.aag", "L"))
+    g2 = CG.as_compact(Graph("./tests/test-data/PancakeSort_4_3.aag", "R"))
+    pool = FB.NodePool(order="interleaved")
+    left_vars, right_vars = pool.add_graphs([g1, g2])
+    gates = [
+        (var, cg.depth[node])
+        for cg, node_vars in [(g1, left_vars), (g2, right_vars)]
+        for node, var in enumerate(node_vars)
+        if cg.node_type[node] != CG.INPUT
+    ]
+    depths = [depth for _, depth in sorted(gates)]
+    assert depths == sorted(depths)
+
+
+def test_paired_order_puts_equivalent_gates_together():
+    g1 = CG.as_compact(Graph("./tests/test-data/BubbleSort_4_3.aag", "L"))
+    g2 = CG.as_compact(Graph("./tests/test-data/PancakeSort_4_3.aag", "R"))
+    pool = FB.NodePool(order="paired")
+    left_vars, right_vars = pool.add_graphs([g1, g2])
+
+    # every right output sits right after a left gate with the same
+    # signature up to negation
+    patterns = S.random_patterns(g1.n_inputs, VO.PAIRING_PATTERNS)
+    left = VO.normalized_signatures(g1, patterns, VO.PAIRING_PATTERNS)
+    right = VO.normalized_signatures(g2, patterns, VO.PAIRING_PATTERNS)
+    left_by_var = {int(var): node for node, var in enumerate(left_vars)}
+    for output in g2.outputs:
+        var = int(right_vars[output])
+        previous = var - 1
+        while pool.id_to_v(previous).endswith("R"):
+            previous -= 1
+        assert np.array_equal(right[output], left[left_by_var[previous]])
@@ -1,17 +1,11 @@
 from tqdm import tqdm
-import sys
-import os
 import math
 import time
 
 import utils as U
-import formula_builder as FB
+import cnf_writer as W
 import hyperparameters as H
 
-import pysat
-import pysat.formula
-from pysat.solvers import Maplesat as PysatSolver
-
 
 def prepare_first_layer_of_baskets(domains):
     for domain, _, _ in domains:
@@ -100,51 +94,33 @@ class Basket:
         )
 
 
-def generate_inccnf(
-    g1, g2, basket_left, basket_right, metainfo, file_name, d_left, d_right
-):
-    t1 = time.time()
-    tmp_file = f"{file_name}.tmp"
-    cubes = list()
-    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
-    cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
+# Every (left, right) pair of basket bitvectors as one cube of assumptions
+def basket_cubes(pool, basket_left, basket_right):
     for bitvector_left in tqdm(basket_left.bitvectors, desc="Left bucket"):
+        assumptions_left = bitvector_to_assumptions(
+            bitvector_left, basket_left.gate_names_for_bitvectors, pool
+        )
         for bitvector_right in tqdm(
             basket_right.bitvectors, desc="Right bucket", leave=False
         ):
-            assumptions_left = bitvector_to_assumptions(
-                bitvector_left, basket_left.gate_names_for_bitvectors, pool
-            )
             assumptions_right = bitvector_to_assumptions(
                 bitvector_right, basket_right.gate_names_for_bitvectors, pool
             )
-            cubes.append(
-                "a "
-                + " ".join([str(a) for a in assumptions_left])
-                + " "
-                + " ".join([str(a) for a in assumptions_right])
-                + " 0\n"
-            )
-
-    pysat.formula.CNF(from_clauses=cnf).to_file(tmp_file)
+            yield assumptions_left + assumptions_right
 
-    lines = list()
-    with open(tmp_file, "r") as tmp:
-        for line in tmp.readlines():
-            if line.startswith("p cnf"):
-                lines.append("p inccnf\n")
-            else:
-                lines.append(line)
 
-    with open(file_name, "w") as f:
-        f.writelines(lines)
-        f.writelines(cubes)
+# Streamed to `file_name`, compressed if it ends in `.gz` or `.xz`
+def generate_inccnf(
+    miter, basket_left, basket_right, metainfo, file_name, d_left, d_right
+):
+    t1 = time.time()
+    cnf, pool = miter.formula()
+    W.write_icnf(cnf, basket_cubes(pool, basket_left, basket_right), file_name)
     t2 = time.time()
     metainfo["dumping_icnf"] = t2 - t1
     U.dump_dict(
         metainfo, file_name.replace("icnfs", "icnf_generation_metadata") + ".meta"
     )
-    os.system(f"rm {tmp_file}")
 
     # unbalancedness_order_filename = f"${file_name}.order"
 
@@ -156,10 +132,9 @@ def generate_inccnf(
     #         print(f"${elem=} ${pool.v_to_id(elem)}")
 
 
-def iterate_over_two_megabackets(g1, g2, basket_left, basket_right):
-    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
-    cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
-    with PysatSolver(bootstrap_with=cnf) as solver:
+def iterate_over_two_megabackets(miter, basket_left, basket_right):
+    _, pool = miter.formula()
+    with miter.solver() as solver:
         for bitvector_left in tqdm(basket_left.bitvectors, desc="Left bucket"):
             for bitvector_right in tqdm(
                 basket_right.bitvectors, desc="Right bucket", leave=False
@@ -178,13 +153,12 @@ def iterate_over_two_megabackets(g1, g2, basket_left, basket_right):
     return True
 
 
-def filter_complex_cubes(g1, g2, basket_left, basket_right, complex_cubes_filename):
+def filter_complex_cubes(miter, basket_left, basket_right, complex_cubes_filename):
     print(complex_cubes_filename)
-    shared_cnf, pool = U.prepare_shared_cnf_from_two_graphs(g1, g2)
-    cnf = FB.generate_miter_scheme(shared_cnf, pool, g1, g2)
+    _, pool = miter.formula()
 
     with open(complex_cubes_filename, "w") as f:
-        with PysatSolver(bootstrap_with=cnf) as solver:
+        with miter.solver() as solver:
             for bitvector_left in tqdm(basket_left.bitvectors, desc="Left bucket"):
                 for bitvector_right in tqdm(
                     basket_right.bitvectors, desc="Right bucket", leave=False
@@ -48,6 +48,14 @@ def prepare_shared_cnf_from_two_graphs(g1, g2):
     return shared_cnf.clauses, pool
 
 
+# Same miter, encoded in bulk by `FB.make_flat_miter_from_two_graphs`.
+# Returns a `flat_cnf.FlatCNF` and the `FB.NodePool` it was numbered with.
+def prepare_flat_miter_from_two_graphs(g1, g2):
+    pool = FB.NodePool()
+    shared_cnf = FB.make_flat_miter_from_two_graphs(g1, g2, pool)
+    return shared_cnf, pool
+
+
 def dump_dict(data, file):
     with open(file, "a+") as f:
         f.write(json.dumps(data, indent=4))
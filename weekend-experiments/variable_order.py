@@ -0,0 +1,140 @@
+import numpy as np
+
+import simulation as S
+
+# Orders in which a `formula_builder.NodePool` numbers the gates of the
+# graphs it encodes together (inputs always come first, in input order).
+#
+# "topological": node id order, one graph after the other
+# "dfs": post-order of a depth-first walk from the outputs, one graph after
+#     the other, so every output cone is mostly contiguous
+# "interleaved": all graphs by depth, gates of the same depth side by side
+# "paired": gates of the first graph in node id order, every gate of the
+#     other graphs right after a first-graph gate with the same simulation
+#     signature (up to negation), unmatched gates near their matched
+#     predecessors
+#
+# Every order gets `graphs` (compact graphs) and `gate_ids` (node ids of
+# every graph that need a variable) and returns (graph index, node id)
+# arrays, one entry per variable, in variable order.
+
+ORDERS = ["topological", "dfs", "interleaved", "paired"]
+# Orders that number every graph on its own, see `cnf_fragment`
+PER_GRAPH_ORDERS = ["topological", "dfs"]
+
+# Random patterns simulated to pair gates up
+PAIRING_PATTERNS = 1024
+
+
+def order_gates(graphs, gate_ids, order):
+    assert order in ORDERS, f"Unknown variable order {order}"
+    if order == "topological":
+        return topological_order(graphs, gate_ids)
+    if order == "dfs":
+        return dfs_order(graphs, gate_ids)
+    if order == "interleaved":
+        return interleaved_order(graphs, gate_ids)
+    return paired_order(graphs, gate_ids)
+
+
+def graph_indices(gate_ids):
+    return np.concatenate(
+        [np.full(len(ids), k, dtype=np.int64) for k, ids in enumerate(gate_ids)]
+    )
+
+
+def topological_order(graphs, gate_ids):
+    return graph_indices(gate_ids), np.concatenate(gate_ids)
+
+
+# Position of every node in a depth-first post-order from the outputs,
+# nodes no output reaches come last in node id order
+def dfs_ranks(cg):
+    fanin = cg.fanin.tolist()
+    offsets = cg.fanin_offsets.tolist()
+    visited = bytearray(cg.n_nodes)
+    order = list()
+    for root in cg.outputs.tolist():
+        if visited[root]:
+            continue
+        visited[root] = 1
+        stack = [[root, offsets[root]]]
+        while stack:
+            frame = stack[-1]
+            node, position = frame
+            if position < offsets[node + 1]:
+                frame[1] += 1
+                child = fanin[position]
+                if not visited[child]:
+                    visited[child] = 1
+                    stack.append([child, offsets[child]])
+            else:
+                stack.pop()
+                order.append(node)
+
+    order += [node for node in range(cg.n_nodes) if not visited[node]]
+    ranks = np.empty(cg.n_nodes, dtype=np.int64)
+    ranks[order] = np.arange(cg.n_nodes)
+    return ranks
+
+
+def dfs_order(graphs, gate_ids):
+    ordered = [
+        ids[np.argsort(dfs_ranks(cg)[ids], kind="stable")]
+        for cg, ids in zip(graphs, gate_ids)
+    ]
+    return graph_indices(gate_ids), np.concatenate(ordered)
+
+
+def interleaved_order(graphs, gate_ids):
+    graph_index = graph_indices(gate_ids)
+    ids = np.concatenate(gate_ids)
+    depth = np.concatenate([cg.depth[ids] for cg, ids in zip(graphs, gate_ids)])
+    order = np.lexsort((ids, graph_index, depth))
+    return graph_index[order], ids[order]
+
+
+# Simulation signatures with the first bit cleared by negation, so a gate
+# and its complement get the same row
+def normalized_signatures(cg, patterns, n_patterns):
+    signatures = S.simulate(cg, patterns)
+    flip = (signatures[:, 0] & np.uint64(1)) == 1
+    signatures[flip] = ~signatures[flip]
+    return S.mask_tail(signatures, n_patterns)
+
+
+def paired_order(graphs, gate_ids):
+    n_inputs = graphs[0].n_inputs
+    assert all(cg.n_inputs == n_inputs for cg in graphs)
+    patterns = S.random_patterns(n_inputs, PAIRING_PATTERNS)
+
+    rows = np.concatenate(
+        [
+            normalized_signatures(cg, patterns, PAIRING_PATTERNS)[ids]
+            for cg, ids in zip(graphs, gate_ids)
+        ]
+    )
+    _, classes = np.unique(
+        np.ascontiguousarray(rows).view(f"V{rows.shape[1] * 8}").reshape(-1),
+        return_inverse=True,
+    )
+    classes = classes.reshape(-1)
+
+    # every class sits at the first gate of the first graph that has it
+    graph_index = graph_indices(gate_ids)
+    n_first = len(gate_ids[0])
+    class_rank = np.full(classes.max() + 1 if len(classes) > 0 else 0, -1)
+    class_rank[classes[:n_first][::-1]] = np.arange(n_first)[::-1]
+
+    rank = class_rank[classes]
+    start = n_first
+    for ids in gate_ids[1:]:
+        # unmatched gates follow the last matched gate before them
+        own = rank[start : start + len(ids)]
+        matched_before = np.maximum.accumulate(np.maximum(own, 0))
+        rank[start : start + len(ids)] = np.where(own < 0, matched_before, own)
+        start += len(ids)
+
+    ids = np.concatenate(gate_ids)
+    order = np.lexsort((ids, graph_index, rank))
+    return graph_index[order], ids[order]